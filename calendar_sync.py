@@ -1,11 +1,13 @@
 
 import datetime
 import os.path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 import json
+from core.lazy_import import module_available
+
+# The Google client libraries are imported in get_calendar_service(), not here:
+# they are slow to import and most callers (CLI, scheduler) may never need them.
+CALENDAR_LIBS_AVAILABLE = all(module_available(name) for name in (
+    "google.auth", "google.oauth2", "google_auth_oauthlib", "googleapiclient"))
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
@@ -15,6 +17,11 @@ CREDENTIALS_FILE = os.path.join(BASE_DIR, 'credentials.json')
 TOKEN_FILE = os.path.join(BASE_DIR, 'token.json')
 
 def get_calendar_service():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -65,8 +72,11 @@ def get_calendar_service():
     service = build('calendar', 'v3', credentials=creds)
     return service
 
-def get_busy_slots():
-    """Fetches events for the current day (or next available workday) and returns busy time slots."""
+def get_busy_slots(day=None):
+    """
+    Fetches events for the current day (or next available workday) and returns busy time slots.
+    With `day` (a datetime.date), fetches that whole day instead.
+    """
     service = get_calendar_service()
 
     # Define time range: Now to End of Day
@@ -96,6 +106,9 @@ def get_busy_slots():
     # We need to construct the query window
     start_dt = start_time
     end_dt = start_time.replace(hour=23, minute=59)
+    if day is not None:
+        start_dt = datetime.datetime.combine(day, datetime.time.min)
+        end_dt = start_dt.replace(hour=23, minute=59)
     
     print(f"Fetching calendar events for {start_dt.date()}...")
     
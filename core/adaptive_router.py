@@ -0,0 +1,176 @@
+import time
+import random
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger("adaptive_router")
+
+# Objective name -> sort key over a ModelStats (lower is better)
+OBJECTIVES = {
+    "p95_latency": lambda s: (s.p95_latency, s.avg_cost),
+    "cost": lambda s: (s.avg_cost, s.p95_latency),
+    "success_rate": lambda s: (-s.success_rate, s.p95_latency),
+}
+
+DEFAULT_POLICY = {"objective": "p95_latency", "max_cost": None, "min_success_rate": 0.9}
+
+
+class ModelStats:
+    """Aggregated outcomes for one (provider, model) over the stats window."""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.calls = 0
+        self.successes = 0
+        self.latencies: List[float] = []
+        self.total_cost = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.calls if self.calls else 0.0
+
+    @property
+    def avg_cost(self) -> float:
+        return self.total_cost / self.successes if self.successes else 0.0
+
+    @property
+    def p95_latency(self) -> float:
+        if not self.latencies:
+            return float("inf")
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "calls": self.calls,
+            "success_rate": round(self.success_rate, 4),
+            "p95_latency": round(self.p95_latency, 3) if self.latencies else None,
+            "avg_cost": round(self.avg_cost, 6),
+        }
+
+
+class RoutingDecision:
+    def __init__(self, provider: str, config: Dict[str, Any], reason: str):
+        self.provider = provider
+        self.config = config
+        self.reason = reason
+
+
+class AdaptiveRouter:
+    """
+    Chooses a model per tier from a list of candidates, using recent traffic stats.
+
+    Candidates are {"provider": ..., "config": {...}} dicts; the first one is the
+    default used until every contender has `min_samples` calls. Per-tier policies
+    pick an objective (see OBJECTIVES) plus an optional cost ceiling (USD per call)
+    and minimum success rate. With probability `exploration` a non-best candidate
+    is tried instead, so stats for the others don't go stale.
+
+    `stats_source` returns outcome rows (provider, model, status, latency, cost);
+    it is re-read at most every `refresh_interval` seconds.
+    """
+
+    def __init__(self, candidates: Dict[Hashable, List[Dict[str, Any]]],
+                 stats_source: Callable[[], Iterable[Dict[str, Any]]],
+                 policies: Optional[Dict[Hashable, Dict[str, Any]]] = None,
+                 refresh_interval: float = 60.0, exploration: float = 0.05, min_samples: int = 10,
+                 rng: Optional[random.Random] = None):
+        self.candidates = candidates
+        self.stats_source = stats_source
+        self.policies = policies or {}
+        self.refresh_interval = refresh_interval
+        self.exploration = exploration
+        self.min_samples = min_samples
+        self.rng = rng or random.Random()
+        self.lock = Lock()
+        self._stats: Dict[tuple, ModelStats] = {}
+        self._refreshed_at = 0.0
+        self._decisions = {"default": 0, "objective": 0, "explore": 0}
+
+    def refresh(self):
+        """Rebuilds per-model stats from the stats source."""
+        stats: Dict[tuple, ModelStats] = {}
+        for row in self.stats_source():
+            key = (row["provider"], row["model"])
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = ModelStats(*key)
+            entry.calls += 1
+            if row["status"] == "success":
+                entry.successes += 1
+                entry.total_cost += row.get("cost") or 0.0
+                if row.get("latency") is not None:
+                    entry.latencies.append(row["latency"])
+        with self.lock:
+            self._stats = stats
+            self._refreshed_at = time.time()
+
+    def _maybe_refresh(self):
+        if time.time() - self._refreshed_at >= self.refresh_interval:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh routing stats: {e}")
+                self._refreshed_at = time.time()  # don't retry on every request
+
+    def choose(self, tier: Hashable) -> Optional[RoutingDecision]:
+        """Returns the RoutingDecision for a tier, or None if it has no candidates."""
+        candidates = self.candidates.get(tier)
+        if not candidates:
+            return None
+        default = candidates[0]
+        if len(candidates) == 1:
+            return RoutingDecision(default["provider"], default["config"], "static: single candidate")
+
+        self._maybe_refresh()
+        policy = {**DEFAULT_POLICY, **self.policies.get(tier, {})}
+        objective = policy["objective"]
+        key_fn = OBJECTIVES[objective]
+
+        eligible, untested = [], []
+        for candidate in candidates:
+            stats = self._stats.get((candidate["provider"], candidate["config"].get("model")))
+            if stats is None or stats.calls < self.min_samples:
+                untested.append(candidate)
+            elif stats.success_rate < policy["min_success_rate"]:
+                continue
+            elif policy["max_cost"] is not None and stats.avg_cost > policy["max_cost"]:
+                continue
+            else:
+                eligible.append((key_fn(stats), candidate, stats))
+
+        best = min(eligible, key=lambda e: e[0]) if eligible else None
+        others = untested + [c for _, c, _ in eligible if best is None or c is not best[1]]
+
+        if others and self.rng.random() < self.exploration:
+            candidate = self.rng.choice(others)
+            self._decisions["explore"] += 1
+            status = "untested" if candidate in untested else "non-best"
+            return RoutingDecision(candidate["provider"], candidate["config"],
+                                   f"explore: {candidate['config'].get('model')} ({status})")
+
+        if best is None:
+            self._decisions["default"] += 1
+            return RoutingDecision(default["provider"], default["config"],
+                                   f"default: {default['config'].get('model')} (not enough eligible traffic data)")
+
+        _, candidate, stats = best
+        self._decisions["objective"] += 1
+        return RoutingDecision(
+            candidate["provider"], candidate["config"],
+            f"{objective}: {stats.model} p95={stats.p95_latency:.2f}s cost=${stats.avg_cost:.5f} "
+            f"success={stats.success_rate:.0%} n={stats.calls} ({len(eligible)} eligible)"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            models = [s.to_dict() for s in self._stats.values()]
+        return {
+            "decisions": dict(self._decisions),
+            "refreshed_at": self._refreshed_at,
+            "models": sorted(models, key=lambda m: (m["provider"], m["model"] or "")),
+        }
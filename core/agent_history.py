@@ -0,0 +1,85 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.context_profiles import estimate_tokens
+
+logger = logging.getLogger("agent_history")
+
+USER = "user"
+ASSISTANT = "assistant"
+
+Message = Dict[str, str]
+
+# (summary so far or None, turns to fold in) -> new summary, or None on failure
+Summarizer = Callable[[Optional[str], List[Message]], Optional[str]]
+
+# Per-turn clip used when no summary can be generated
+FALLBACK_TURN_CHARS = 300
+
+
+class AgentHistory:
+    """
+    Role/content turns of one AgentLoop run, sent to providers as native
+    multi-turn messages instead of one re-joined transcript.
+
+    The first user message (the goal) is always kept. Once the history is over
+    `token_budget` estimated tokens, the oldest turns are folded into a running
+    summary appended to the goal, keeping at least the last `keep_recent` turns
+    verbatim. Turns are folded in assistant/user pairs, so the messages still
+    start with the user and alternate.
+    """
+
+    def __init__(self, goal: str, token_budget: Optional[int] = 3000, keep_recent: int = 4,
+                 summarize: Optional[Summarizer] = None):
+        self.goal = goal
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+        self.summary: Optional[str] = None
+        self.turns: List[Message] = []  # after the goal
+        self.summarized_turns = 0
+
+    def add(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+
+    @property
+    def messages(self) -> List[Message]:
+        head = self.goal if not self.summary else f"{self.goal}\n\nSummary of earlier steps:\n{self.summary}"
+        return [{"role": USER, "content": head}] + self.turns
+
+    def tokens(self) -> int:
+        return sum(estimate_tokens(m["content"]) for m in self.messages)
+
+    def request(self) -> Tuple[List[Message], str]:
+        """(earlier messages, latest user message) for the next generate_text call."""
+        messages = self.messages
+        if messages[-1]["role"] != USER:
+            raise ValueError("the next call needs a user message last")
+        return messages[:-1], messages[-1]["content"]
+
+    def compact(self) -> int:
+        """Folds the oldest turns into the summary if over budget; returns how many were folded."""
+        if self.token_budget is None or self.tokens() <= self.token_budget:
+            return 0
+        foldable = len(self.turns) - self.keep_recent
+        foldable -= foldable % 2
+        if foldable <= 0:
+            return 0
+
+        old = self.turns[:foldable]
+        summary = None
+        if self.summarize is not None:
+            try:
+                summary = self.summarize(self.summary, old)
+            except Exception as e:
+                logger.warning(f"Summarizing agent history failed, clipping instead: {e}")
+        if not summary:
+            clipped = [f"{m['role']}: {m['content'][:FALLBACK_TURN_CHARS]}" for m in old]
+            summary = "\n".join(([self.summary] if self.summary else []) + clipped)
+
+        before = self.tokens()
+        self.summary = summary.strip()
+        self.turns = self.turns[foldable:]
+        self.summarized_turns += foldable
+        logger.info(f"Agent history: folded {foldable} turns into the summary (~{before} -> ~{self.tokens()} tokens)")
+        return foldable
@@ -0,0 +1,72 @@
+import logging
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("agent_services")
+
+
+class AgentServices:
+    """
+    The memory service and tool registry shared by every AgentLoop in the process.
+
+    Built once, thread-safely, on first use or by warm() at startup, instead of per
+    request (MemoryManager reads its JSON files on construction and reloads them
+    when they change; the registry's tools may import heavy clients, but are
+    themselves built on first execution). Records what building them cost, i.e.
+    the setup each request no longer pays.
+    """
+
+    def __init__(self, memory_factory: Callable[[], Any], registry_factory: Callable[[], Any]):
+        self.memory_factory = memory_factory
+        self.registry_factory = registry_factory
+        self.lock = Lock()
+        self._services: Optional[Tuple[Any, Any]] = None
+        self._build_seconds: Dict[str, float] = {}
+        self._warmed = False
+        self._uses = 0
+
+    def get(self, count: bool = True) -> Tuple[Any, Any]:
+        """
+        (memory, registry), building them on first call. Callers that are not agent
+        runs (the intent fast path) pass count=False, so `uses` and the setup saved
+        only reflect agent runs.
+        """
+        with self.lock:
+            if self._services is None:
+                self._services = self._build()
+            if count:
+                self._uses += 1
+            return self._services
+
+    def _build(self) -> Tuple[Any, Any]:
+        start = time.perf_counter()
+        memory = self.memory_factory()
+        built = time.perf_counter()
+        registry = self.registry_factory()
+        self._build_seconds = {"memory": built - start, "registry": time.perf_counter() - built}
+        logger.info(f"Agent services built in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return memory, registry
+
+    def warm(self):
+        """Builds the services ahead of the first request (call at startup)."""
+        with self.lock:
+            if self._services is None:
+                self._services = self._build()
+            self._warmed = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        build = dict(self._build_seconds)
+        if self._services is not None and hasattr(self._services[1], "build_seconds"):
+            build.update({f"tool:{name}": s for name, s in self._services[1].build_seconds.items()})
+        # What every request used to pay: a fresh MemoryManager and registry with every tool built
+        per_request = sum(build.values())
+        reused = max(0, self._uses - (0 if self._warmed else 1))
+        return {
+            "built": self._services is not None,
+            "warmed": self._warmed,
+            "uses": self._uses,
+            "build_seconds": {name: round(seconds, 4) for name, seconds in build.items()},
+            "setup_seconds_per_request": round(per_request, 4),
+            "setup_seconds_saved": round(per_request * reused, 3),
+        }
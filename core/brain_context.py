@@ -0,0 +1,238 @@
+import os
+import time
+import logging
+import datetime
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from core.context_profiles import ContextProfile, compact_sections, estimate_tokens
+
+logger = logging.getLogger("brain_context")
+
+# Separates the brain context from a caller's task instruction in assembled instructions
+TASK_INSTRUCTION_MARKER = "\n\n--- TASK INSTRUCTION ---\n"
+
+# Priority order for context
+# SOUL -> USER -> IDENTITY -> AGENTS -> daily_schedule -> memory
+BRAIN_FILES = [
+    "SOUL.md",
+    "USER.md",
+    "IDENTITY.md",
+    "AGENTS.md",
+    "daily_schedule.md"
+]
+
+
+def split_system_instruction(instruction: Optional[str]) -> Tuple[str, str]:
+    """Splits an assembled instruction into (brain context, task instruction part)."""
+    if not instruction:
+        return "", ""
+    context, marker, task = instruction.partition(TASK_INSTRUCTION_MARKER)
+    return context, (marker.lstrip("\n") + task) if marker else ""
+
+
+class BrainContextCache:
+    """
+    Process-wide cache for the brain markdown files.
+
+    Each file is tracked by its (mtime, size) signature and only re-read when the
+    signature changes. Signature checks are throttled to one pass every
+    `check_interval` seconds, so most calls do no file I/O at all.
+    Assembled system instructions are memoized per (version, task instruction),
+    and per context profile for the trimmed variants.
+    """
+
+    def __init__(self, brain_dir: str, files: Optional[List[str]] = None,
+                 check_interval: float = 1.0, max_instructions: int = 64):
+        self.brain_dir = brain_dir
+        self.files = list(files) if files is not None else list(BRAIN_FILES)
+        self.check_interval = check_interval
+        self.max_instructions = max_instructions
+        self.lock = Lock()
+
+        # label -> (signature, rendered section)
+        self._sections: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._context = ""
+        self._ordered: List[Tuple[str, str]] = []  # (label, rendered section) in priority order
+        self._version = 0
+        self._last_check = None
+        self._instructions: "OrderedDict[Optional[str], str]" = OrderedDict()
+        self._profiled: "OrderedDict[Tuple[str, Optional[str]], Tuple[str, int]]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "checks": 0,
+            "rebuilds": 0,
+            "section_reloads": 0,
+            "instruction_hits": 0,
+            "instruction_builds": 0,
+            "profiled_builds": 0,
+        }
+
+    # --- Internals ---
+
+    def _section_paths(self) -> List[Tuple[str, str]]:
+        paths = [(name, os.path.join(self.brain_dir, name)) for name in self.files]
+
+        # Today's memory file (the label changes at midnight)
+        today_str = datetime.date.today().strftime("%Y-%m-%d")
+        paths.append((f"memory/{today_str}.md", os.path.join(self.brain_dir, "memory", f"{today_str}.md")))
+        return paths
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read_section(self, label: str, path: str) -> str:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+        except Exception as e:
+            logger.error(f"Failed to read brain file {label}: {e}")
+            return ""
+        return f"\n\n--- {label} ---\n{content}" if content else ""
+
+    def _refresh(self):
+        """Re-stats every section and rebuilds the context if anything changed."""
+        self._stats["checks"] += 1
+        changed = False
+        seen = []
+        parts = []
+
+        for label, path in self._section_paths():
+            seen.append(label)
+            signature = self._signature(path)
+            cached = self._sections.get(label)
+
+            if signature is None:
+                if cached is not None:
+                    del self._sections[label]
+                    changed = True
+                continue
+
+            if cached is None or cached[0] != signature:
+                self._sections[label] = (signature, self._read_section(label, path))
+                self._stats["section_reloads"] += 1
+                changed = True
+
+            section = self._sections[label][1]
+            if section:
+                parts.append((label, section))
+
+        for label in list(self._sections):
+            if label not in seen:
+                del self._sections[label]
+                changed = True
+
+        if changed or self._version == 0:
+            self._ordered = parts
+            self._context = "\n".join(section for _, section in parts)
+            self._version += 1
+            self._instructions.clear()
+            self._profiled.clear()
+            self._stats["rebuilds"] += 1
+            logger.info(f"Brain context rebuilt (version {self._version}, {len(self._context)} chars)")
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_interval:
+            self._stats["hits"] += 1
+            return
+        with self.lock:
+            # Another thread may have refreshed while we waited
+            if self._last_check is not None and time.monotonic() - self._last_check < self.check_interval:
+                self._stats["hits"] += 1
+                return
+            rebuilds = self._stats["rebuilds"]
+            self._refresh()
+            self._last_check = time.monotonic()
+            if self._stats["rebuilds"] == rebuilds:
+                self._stats["hits"] += 1
+
+    # --- Public API ---
+
+    @property
+    def version(self) -> int:
+        """Monotonic version number, bumped whenever the context changes."""
+        self._ensure_fresh()
+        return self._version
+
+    def get_context(self) -> str:
+        """Returns the combined brain context."""
+        self._ensure_fresh()
+        return self._context
+
+    def get_system_instruction(self, task_instruction: Optional[str] = None) -> str:
+        """
+        Returns the brain context with an optional task instruction appended.
+        The assembled string is cached until the brain context changes.
+        """
+        self._ensure_fresh()
+        with self.lock:
+            instruction = self._instructions.get(task_instruction)
+            if instruction is not None:
+                self._instructions.move_to_end(task_instruction)
+                self._stats["instruction_hits"] += 1
+                return instruction
+
+            if task_instruction:
+                instruction = f"{self._context}{TASK_INSTRUCTION_MARKER}{task_instruction}"
+            else:
+                instruction = self._context
+
+            self._instructions[task_instruction] = instruction
+            if len(self._instructions) > self.max_instructions:
+                self._instructions.popitem(last=False)
+            self._stats["instruction_builds"] += 1
+            return instruction
+
+    def get_profiled_instruction(self, task_instruction: Optional[str],
+                                 profile: Optional[ContextProfile]) -> Tuple[str, int]:
+        """
+        Like get_system_instruction, but with only the profile's sections, compacted
+        to its token budget. Returns (instruction, estimated tokens saved vs. the full context).
+        """
+        if profile is None:
+            return self.get_system_instruction(task_instruction), 0
+
+        self._ensure_fresh()
+        key = (profile.name, task_instruction)
+        with self.lock:
+            cached = self._profiled.get(key)
+            if cached is not None:
+                self._profiled.move_to_end(key)
+                self._stats["instruction_hits"] += 1
+                return cached
+
+            texts, actions = compact_sections(profile.select(self._ordered), profile.token_budget)
+            context = "\n".join(texts)
+            saved = max(0, estimate_tokens(self._context) - estimate_tokens(context))
+            compacted = {label: action for label, action in actions.items() if action != "full"}
+            if compacted:
+                logger.info(f"Context profile {profile.name}: {compacted}")
+
+            if task_instruction:
+                instruction = f"{context}{TASK_INSTRUCTION_MARKER}{task_instruction}"
+            else:
+                instruction = context
+
+            self._profiled[key] = (instruction, saved)
+            if len(self._profiled) > self.max_instructions:
+                self._profiled.popitem(last=False)
+            self._stats["profiled_builds"] += 1
+            return instruction, saved
+
+    def invalidate(self):
+        """Forces a signature check on the next access."""
+        self._last_check = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns cache counters plus the current context version."""
+        stats = dict(self._stats)
+        stats["version"] = self._version
+        stats["sections"] = len(self._sections)
+        return stats
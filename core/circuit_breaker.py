@@ -0,0 +1,169 @@
+import time
+import logging
+from collections import deque
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _ProviderState:
+    def __init__(self, window: int):
+        self.outcomes = deque(maxlen=window)  # (ok, latency)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_probe = 0.0
+        self.trips = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+
+    def avg_latency(self) -> Optional[float]:
+        latencies = [latency for ok, latency in self.outcomes if ok and latency is not None]
+        return sum(latencies) / len(latencies) if latencies else None
+
+
+class CircuitBreaker:
+    """
+    Per (provider, model) circuit breaker with rolling error rate and latency.
+
+    A circuit opens after `failure_threshold` consecutive failures, or once the
+    error rate over the last `window` calls reaches `error_rate_threshold`
+    (with at least `min_calls` calls). After `cooldown` seconds it goes half-open:
+    one probe is let through every `probe_interval` seconds until a probe succeeds
+    (closed again) or fails (open again).
+    """
+
+    def __init__(self, window: int = 50, failure_threshold: int = 5, error_rate_threshold: float = 0.5,
+                 min_calls: int = 10, cooldown: float = 30.0, probe_interval: float = 5.0,
+                 degraded_error_rate: float = 0.2):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.degraded_error_rate = degraded_error_rate
+        self.lock = Lock()
+        self._states: Dict[Tuple[str, str], _ProviderState] = {}
+
+    def _get(self, provider: str, model: Optional[str]) -> _ProviderState:
+        key = (provider, model or "default")
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _ProviderState(self.window)
+        return state
+
+    def _advance(self, state: _ProviderState, now: float):
+        if state.state == OPEN and now - state.opened_at >= self.cooldown:
+            state.state = HALF_OPEN
+            state.last_probe = 0.0
+
+    def _trip(self, provider: str, model: Optional[str], state: _ProviderState, now: float):
+        if state.state != OPEN:
+            logger.warning(f"Circuit opened for {provider}/{model} "
+                           f"({state.consecutive_failures} consecutive failures, error rate {state.error_rate():.0%})")
+            state.trips += 1
+        state.state = OPEN
+        state.opened_at = now
+
+    def allow(self, provider: str, model: Optional[str] = None) -> bool:
+        """True if a call may be made now. Half-open circuits let one probe through per probe_interval."""
+        now = time.time()
+        with self.lock:
+            state = self._get(provider, model)
+            self._advance(state, now)
+            if state.state == CLOSED:
+                return True
+            if state.state == HALF_OPEN and now - state.last_probe >= self.probe_interval:
+                state.last_probe = now
+                logger.info(f"Circuit half-open for {provider}/{model}, sending probe")
+                return True
+            return False
+
+    def record_success(self, provider: str, model: Optional[str] = None, latency: Optional[float] = None):
+        with self.lock:
+            state = self._get(provider, model)
+            state.outcomes.append((True, latency))
+            state.consecutive_failures = 0
+            if state.state != CLOSED:
+                logger.info(f"Circuit closed for {provider}/{model}")
+                state.state = CLOSED
+                # Start the error rate over; the failures that tripped it are history
+                state.outcomes.clear()
+                state.outcomes.append((True, latency))
+
+    def record_failure(self, provider: str, model: Optional[str] = None, latency: Optional[float] = None,
+                       now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        with self.lock:
+            state = self._get(provider, model)
+            state.outcomes.append((False, latency))
+            state.consecutive_failures += 1
+            if state.state == HALF_OPEN:
+                self._trip(provider, model, state, now)  # failed probe
+            elif (state.consecutive_failures >= self.failure_threshold
+                  or (len(state.outcomes) >= self.min_calls and state.error_rate() >= self.error_rate_threshold)):
+                self._trip(provider, model, state, now)
+
+    def seed(self, outcomes: Iterable[Tuple[str, Optional[str], bool, Optional[float], float]]) -> int:
+        """Replays (provider, model, ok, latency, timestamp) outcomes, oldest first. Returns the count."""
+        count = 0
+        for provider, model, ok, latency, timestamp in outcomes:
+            if ok:
+                self.record_success(provider, model, latency)
+            else:
+                self.record_failure(provider, model, latency, now=timestamp)
+            count += 1
+        return count
+
+    def _rank(self, provider: str, model: Optional[str], now: float) -> int:
+        state = self._states.get((provider, model or "default"))
+        if state is None:
+            return 0
+        self._advance(state, now)
+        if state.state == OPEN:
+            return 3
+        if state.state == HALF_OPEN:
+            return 2
+        if len(state.outcomes) >= self.min_calls and state.error_rate() >= self.degraded_error_rate:
+            return 1
+        return 0
+
+    def order(self, providers: List[Tuple[Any, ...]]) -> List[Tuple[Any, ...]]:
+        """
+        Reorders a provider chain [(name, key, lib_ok, config), ...] so healthy
+        providers come first: closed, then degraded, half-open, open.
+        The original order is kept within each group.
+        """
+        now = time.time()
+        with self.lock:
+            ranks = [self._rank(p[0], p[3].get("model"), now) for p in providers]
+        return [p for _, _, p in sorted(zip(ranks, range(len(providers)), providers), key=lambda x: x[:2])]
+
+    def get_health(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        health = []
+        with self.lock:
+            for (provider, model), state in sorted(self._states.items()):
+                self._advance(state, now)
+                avg_latency = state.avg_latency()
+                health.append({
+                    "provider": provider,
+                    "model": model,
+                    "state": state.state,
+                    "calls": len(state.outcomes),
+                    "error_rate": round(state.error_rate(), 4),
+                    "avg_latency": round(avg_latency, 3) if avg_latency is not None else None,
+                    "consecutive_failures": state.consecutive_failures,
+                    "trips": state.trips,
+                    "retry_in": round(max(0.0, state.opened_at + self.cooldown - now), 1) if state.state == OPEN else 0.0,
+                })
+        return health
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("client_pool")
+
+# factory(api_key, registry) -> client
+ClientFactory = Callable[[str, "ProviderClientRegistry"], Any]
+
+
+class ProviderClientRegistry:
+    """
+    Keeps one long-lived client per (provider, api key) so calls reuse
+    keep-alive connection pools instead of paying for client setup and a
+    TLS handshake on every message.
+
+    Factories are registered per provider; the registry only owns lifecycle
+    (creation, reuse, refresh on key change, close). Async clients are bound to
+    the event loop that created them, so callers pass the loop as `scope`.
+    """
+
+    def __init__(self, max_connections: int = 10, max_keepalive_connections: int = 5,
+                 keepalive_expiry: float = 30.0):
+        # Per-host connection limits, read by the factories
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+
+        self.lock = Lock()
+        self._factories: Dict[str, ClientFactory] = {}
+        self._clients: Dict[Tuple[str, str, Any], Any] = {}
+        self._stats = {"created": 0, "reused": 0, "closed": 0}
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        # Never keep raw keys as dict keys (they end up in debug dumps)
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    def register_factory(self, provider: str, factory: ClientFactory):
+        with self.lock:
+            self._factories[provider] = factory
+        self.refresh(provider)
+
+    def get(self, provider: str, api_key: str, scope: Any = None) -> Any:
+        """Returns the pooled client for this provider/key (and scope), creating it on first use."""
+        fingerprint = self._fingerprint(api_key)
+        key = (provider, fingerprint, scope)
+        client = self._clients.get(key)
+        if client is not None:
+            self._stats["reused"] += 1
+            return client
+
+        with self.lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats["reused"] += 1
+                return client
+
+            factory = self._factories.get(provider)
+            if factory is None:
+                raise KeyError(f"No client factory registered for provider '{provider}'")
+
+            # A new key for a provider means the old one was rotated out
+            for stale in [k for k in self._clients if k[0] == provider and k[1] != fingerprint]:
+                self._close(self._clients.pop(stale), is_async=stale[2] is not None)
+                logger.info(f"API key for {provider} changed, dropped stale client")
+
+            # Clients of finished event loops can no longer be used (or closed)
+            for dead in [k for k in self._clients if isinstance(k[2], asyncio.AbstractEventLoop) and k[2].is_closed()]:
+                del self._clients[dead]
+
+            client = factory(api_key, self)
+            self._clients[key] = client
+            self._stats["created"] += 1
+            logger.info(f"Created pooled client for {provider}")
+            return client
+
+    def get_async(self, provider: str, api_key: str) -> Any:
+        """Returns the pooled async client for the running event loop."""
+        return self.get(provider, api_key, scope=asyncio.get_running_loop())
+
+    def refresh(self, provider: Optional[str] = None):
+        """Closes cached clients (for one provider, or all) so the next call rebuilds them."""
+        with self.lock:
+            for key in [k for k in self._clients if provider is None or k[0] == provider]:
+                self._close(self._clients.pop(key), is_async=key[2] is not None)
+
+    def close_all(self):
+        self.refresh()
+
+    def _close(self, client: Any, is_async: bool = False):
+        close = getattr(client, "close", None)
+        if is_async:
+            close = getattr(client, "aclose", None) or close
+        if callable(close):
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    # Async clients: close on their loop if it is ours, otherwise just drop them
+                    try:
+                        asyncio.get_running_loop().create_task(result)
+                    except RuntimeError:
+                        result.close()
+            except Exception as e:
+                logger.warning(f"Failed to close pooled client: {e}")
+        self._stats["closed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["open_clients"] = sorted(k[0] for k in self._clients)
+        return stats
@@ -0,0 +1,130 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("context_profiles")
+
+# Rough chars-per-token for English markdown; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+# Sections left with less room than this are dropped rather than cut to a stub
+MIN_SECTION_TOKENS = 32
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ContextProfile:
+    """
+    Which brain sections a request gets and how much room they may take.
+
+    sections: section labels in priority order ("SOUL.md", "USER.md", ...; "memory"
+        matches today's memory file). None means every section, in brain order.
+    token_budget: max estimated tokens for the brain context (None = unlimited).
+    max_output_tokens: cap passed to the provider for the reply (None = provider default).
+    """
+
+    def __init__(self, name: str, sections: Optional[List[str]] = None,
+                 token_budget: Optional[int] = None, max_output_tokens: Optional[int] = None):
+        self.name = name
+        self.sections = list(sections) if sections is not None else None
+        self.token_budget = token_budget
+        self.max_output_tokens = max_output_tokens
+
+    def with_overrides(self, name: str, sections: Optional[List[str]] = None,
+                       token_budget: Optional[int] = None, max_output_tokens: Optional[int] = None) -> "ContextProfile":
+        """Returns a narrowed copy: overrides replace sections and can only lower the limits."""
+        def tighter(current, override):
+            if override is None:
+                return current
+            return override if current is None else min(current, override)
+
+        return ContextProfile(
+            f"{self.name}+{name}",
+            sections=sections if sections is not None else self.sections,
+            token_budget=tighter(self.token_budget, token_budget),
+            max_output_tokens=tighter(self.max_output_tokens, max_output_tokens),
+        )
+
+    def select(self, sections: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Picks this profile's sections from [(label, text), ...] in profile order."""
+        if self.sections is None:
+            return list(sections)
+        selected = []
+        for wanted in self.sections:
+            for label, text in sections:
+                if label == wanted or (wanted == "memory" and label.startswith("memory/")):
+                    selected.append((label, text))
+        return selected
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "sections": self.sections,
+            "token_budget": self.token_budget,
+            "max_output_tokens": self.max_output_tokens,
+        }
+
+
+def outline(text: str) -> str:
+    """
+    Condenses a markdown section to its headings plus the first line under each,
+    which keeps the section's shape (and most of its meaning) at a fraction of the size.
+    """
+    kept = []
+    take_next = True
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("#") or stripped.startswith("--- "):
+            kept.append(line)
+            take_next = True
+        elif take_next:
+            kept.append(line)
+            take_next = False
+    return "\n".join(kept)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly max_tokens at a line boundary."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind("\n", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + "\n[...]"
+
+
+def compact_sections(sections: List[Tuple[str, str]], token_budget: Optional[int]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Fits sections into a token budget, in priority order. Each section is kept as is
+    if it fits, else reduced to its outline, else truncated; once the remaining room
+    drops below MIN_SECTION_TOKENS the rest are dropped.
+
+    Returns (texts, actions) where actions maps label -> "full"/"outline"/"truncated"/"dropped".
+    """
+    texts, actions = [], {}
+    remaining = token_budget
+    for label, text in sections:
+        if remaining is None:
+            texts.append(text)
+            actions[label] = "full"
+            continue
+
+        if remaining < MIN_SECTION_TOKENS:
+            actions[label] = "dropped"
+            continue
+
+        if estimate_tokens(text) <= remaining:
+            action = "full"
+        else:
+            text = outline(text)
+            action = "outline"
+            if estimate_tokens(text) > remaining:
+                text = truncate(text, remaining)
+                action = "truncated"
+
+        texts.append(text)
+        actions[label] = action
+        remaining -= estimate_tokens(text)
+    return texts, actions
@@ -0,0 +1,55 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is no time budget left for an operation."""
+
+
+class Deadline:
+    """
+    Absolute time budget for one request.
+
+    Created at the edge (/api/chat, the CLI) and passed down through
+    generate_text, AgentLoop steps and tool execution; each layer asks for
+    what is left instead of using its own fixed timeout. A Deadline with no
+    budget never expires.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    @classmethod
+    def resolve(cls, deadline: Optional["Deadline"] = None, timeout: Optional[float] = None) -> "Deadline":
+        """Returns `deadline` if given, else a new Deadline from `timeout` seconds."""
+        return deadline if deadline is not None else cls(timeout)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None if unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def allows(self, seconds: float) -> bool:
+        """True if at least `seconds` of budget are left."""
+        remaining = self.remaining()
+        return remaining is None or remaining >= seconds
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout for the next blocking step: the remaining budget, capped at `cap`."""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(remaining, cap)
+
+    def check(self, what: str = "request"):
+        if self.expired():
+            raise DeadlineExceeded(f"{what}: deadline of {self.budget}s exceeded")
+
+    def __repr__(self):
+        remaining = self.remaining()
+        return f"Deadline(budget={self.budget}, remaining={remaining:.2f})" if remaining is not None else "Deadline(unbounded)"
@@ -0,0 +1,185 @@
+import json
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, List, Optional, Union
+
+logger = logging.getLogger("intent_router")
+
+# Anything asking for a change, a decision or a second task is left to AgentLoop
+NOT_A_LOOKUP_RE = re.compile(
+    r"\b(?:add|book|cancel|move|reschedule|create|delete|remove|send(?! me\b)|write|reply|respond|tell|draft|"
+    r"remind|plan|set up|arrange|schedule (?:a|an|my|the|it)|summari[sz]e|should|why|compare|and|also)\b"
+)
+CALENDAR_RE = re.compile(r"\b(?:calendar|schedule|agenda|events?|meetings?|appointments?|"
+                         r"what do i have(?! to\b)|what'?s on (?:today|tonight|tomorrow))\b")
+CALENDAR_QUERY_RE = re.compile(r"\b(?:what'?s|what is|what do i have|whats|show|list|check|any|do i have)\b")
+# Only the user's own calendar: "any events in Boston?" is a question for the agent
+PERSONAL_RE = re.compile(r"\b(?:my|i|me)\b")
+# Any other day, date or range ("on Friday", "next week", "March 3", "the day after
+# tomorrow"): only today and tomorrow are answered here
+OTHER_DAY_RE = re.compile(
+    r"\d|\b(?:yesterday|(?:mon|tues|wednes|thurs|fri|satur|sun)days?|weekends?|weekdays?|weeks?|months?|years?|"
+    r"fortnight|next|coming|upcoming|later|after|before|until|till|through|since|past|"
+    r"jan(?:uary)?|feb(?:ruary)?|march|april|june|july|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|"
+    r"nov(?:ember)?|dec(?:ember)?|(?:in|for|during) may)\b"
+)
+# "am I free at 3pm?" needs reasoning over the events, not just the list
+SPECIFIC_TIME_RE = re.compile(r"\b(?:free|busy|available|\d{1,2}(?::\d\d)?\s*(?:am|pm)|at \d)\b")
+WHATSAPP_RE = re.compile(r"\bwhats ?app\b")
+HISTORY_RE = re.compile(r"\b(?:read|show|check|get|history|last|latest|recent|what did|what has|messages?|chat)\b")
+PHONE_RE = re.compile(r"\+?\d[\d\s\-()]{6,}\d")
+MESSAGE_LIMIT_RE = re.compile(r"\b(?:last|latest|recent)\s+(\d{1,2})\b")
+MAX_MESSAGE_LIMIT = 50
+
+# {name: phone number}, or a function returning it
+Contacts = Optional[Union[Dict[str, str], Callable[[], Optional[Dict[str, str]]]]]
+
+
+class IntentMatch:
+    def __init__(self, intent: str, tool: str, args: Dict[str, Any], formatter: Callable[[str], str]):
+        self.intent = intent
+        self.tool = tool
+        self.args = args
+        self.formatter = formatter
+
+    def format(self, result: str) -> str:
+        """The tool result phrased with the intent's local template."""
+        try:
+            return self.formatter(result)
+        except Exception as e:
+            logger.warning(f"Template for {self.intent} failed, returning the raw result: {e}")
+            return result
+
+
+def _format_calendar(label: str) -> Callable[[str], str]:
+    def format_calendar(result: str) -> str:
+        if result.startswith("No upcoming events"):
+            return f"You have nothing on your calendar {label}."
+        events = [line for line in result.splitlines() if line.startswith("- ")]
+        return f"Here's your calendar {label}:\n" + "\n".join(events or [result])
+    return format_calendar
+
+
+def _format_whatsapp(contact: str, number: str) -> Callable[[str], str]:
+    digits = re.sub(r"\D", "", number)
+
+    def format_whatsapp(result: str) -> str:
+        messages = json.loads(result)
+        if not messages:
+            return f"No WhatsApp messages with {contact}."
+        lines = []
+        for message in messages:
+            sender = contact if str(message.get("from", "")).split("@")[0] == digits else "You"
+            when = datetime.fromtimestamp(message["timestamp"]).strftime("%a %H:%M ") if message.get("timestamp") else ""
+            lines.append(f"- {when}{sender}: {message.get('body', '')}")
+        return f"Latest WhatsApp messages with {contact}:\n" + "\n".join(lines)
+    return format_whatsapp
+
+
+class IntentRouter:
+    """
+    Deterministic fast path in front of AgentLoop: a short prompt that is plainly
+    one lookup (today's or tomorrow's calendar, a contact's WhatsApp history) is
+    mapped straight to a tool call with its arguments, skipping the agent's LLM
+    planning step. Anything ambiguous (two intents, extra requests, a contact that
+    can't be resolved) returns None and goes through the agent as before.
+
+    Keeps its own hit rate and latency, separate from the agent path.
+    """
+
+    def __init__(self, max_words: int = 14, window: int = 200):
+        self.max_words = max_words
+        self.lock = Lock()
+        self.checked = 0
+        self._intents: Dict[str, Dict[str, Any]] = {}
+        self._window = window
+
+    def match(self, prompt: str, contacts: Contacts = None) -> Optional[IntentMatch]:
+        """
+        The single intent the prompt asks for, or None. `contacts` maps names to
+        phone numbers, so "messages from Sam" can be resolved; it may be a function
+        returning that map, called only when a WhatsApp lookup names a contact.
+        """
+        text = " ".join(prompt.lower().replace("’", "'").split())
+        with self.lock:
+            self.checked += 1
+        if len(text.split()) > self.max_words or NOT_A_LOOKUP_RE.search(text):
+            return None
+        matches = [m for m in (self._match_calendar(text), self._match_whatsapp(text, contacts)) if m]
+        return matches[0] if len(matches) == 1 else None
+
+    @staticmethod
+    def _match_calendar(text: str) -> Optional[IntentMatch]:
+        if not (CALENDAR_RE.search(text) and CALENDAR_QUERY_RE.search(text) and PERSONAL_RE.search(text)):
+            return None
+        if SPECIFIC_TIME_RE.search(text) or OTHER_DAY_RE.search(text):
+            return None
+        today = re.search(r"\b(?:today|tonight)\b", text)
+        tomorrow = re.search(r"\btomorrow\b", text)
+        if today and tomorrow:
+            return None
+        if tomorrow:
+            return IntentMatch("calendar_tomorrow", "get_calendar_events", {"day": "tomorrow"},
+                               _format_calendar("tomorrow"))
+        # No day named means today. Not the tool's default window: get_busy_slots
+        # moves that to tomorrow as soon as it is past 09:00.
+        return IntentMatch("calendar_today", "get_calendar_events", {"day": "today"}, _format_calendar("today"))
+
+    @staticmethod
+    def _match_whatsapp(text: str, contacts: Contacts) -> Optional[IntentMatch]:
+        if not WHATSAPP_RE.search(text) or not HISTORY_RE.search(text):
+            return None
+        phone = PHONE_RE.search(text)
+        if phone:
+            contact = number = re.sub(r"[\s\-()]", "", phone.group(0))
+        else:
+            contacts = (contacts() if callable(contacts) else contacts) or {}
+            names = [name for name in contacts if re.search(rf"\b{re.escape(name.lower())}\b", text)]
+            if len(names) != 1:
+                return None
+            contact, number = names[0], str(contacts[names[0]])
+        args: Dict[str, Any] = {"to": number}
+        limit = MESSAGE_LIMIT_RE.search(PHONE_RE.sub(" ", text))
+        if limit:
+            args["limit"] = min(int(limit.group(1)), MAX_MESSAGE_LIMIT)
+        return IntentMatch("whatsapp_history", "read_whatsapp", args, _format_whatsapp(contact, number))
+
+    def record(self, intent: str, latency: float, ok: bool = True):
+        """Records a fast-path attempt: answered (ok) or handed back to the agent."""
+        with self.lock:
+            stats = self._intents.setdefault(intent, {"hits": 0, "fallbacks": 0,
+                                                      "latencies": deque(maxlen=self._window)})
+            if ok:
+                stats["hits"] += 1
+                stats["latencies"].append(latency)
+            else:
+                stats["fallbacks"] += 1
+
+    @staticmethod
+    def _percentile(latencies: List[float], percentile: float) -> Optional[float]:
+        if not latencies:
+            return None
+        ordered = sorted(latencies)
+        return round(ordered[min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))], 4)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            hits = sum(s["hits"] for s in self._intents.values())
+            intents = {}
+            for name, stats in self._intents.items():
+                latencies: Deque[float] = stats["latencies"]
+                intents[name] = {
+                    "hits": stats["hits"],
+                    "fallbacks": stats["fallbacks"],
+                    "avg_latency": round(sum(latencies) / len(latencies), 4) if latencies else None,
+                    "p95_latency": self._percentile(list(latencies), 0.95),
+                }
+            return {
+                "checked": self.checked,
+                "hits": hits,
+                "hit_rate": round(hits / self.checked, 4) if self.checked else 0.0,
+                "intents": intents,
+            }
@@ -0,0 +1,155 @@
+import re
+import json
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("keyword_engine")
+
+# Keyword groups used for tier routing and the AgentLoop auto-upgrade.
+# Matching is case-insensitive and on whole words ("api" does not match "rapid").
+# A trailing "*" matches any word with that prefix ("debug*" matches "debugging");
+# multi-word phrases match with any whitespace between the words.
+DEFAULT_KEYWORD_TABLES = {
+    "greeting": ["hi", "hey", "ping", "status", "hello"],
+    "visuals": ["create image", "generate photo", "realistic photo", "draw", "make an image"],
+    "coding": ["debug*", "code", "coding", "implement*", "refactor*", "fix bug", "git", "github", "deploy*",
+               "api", "apis", "function*", "class", "classes"],
+    "apex": ["analy*", "compare*", "strategy", "strategies", "evaluate options", "research*", "investigat*"],
+    "brain": ["calendar*", "schedul*", "appointment*", "file", "files", "folder*", "photo*", "image*",
+              "video*", "busy", "free"],
+    "agent": ["calendar*", "schedul*", "appointment*", "busy", "free", "project*", "file", "files"],
+}
+
+WORD_RE = re.compile(r"\w+")
+# Longer texts are sampled: if under REPETITIVE_RATIO of the sample's words are distinct, the
+# locator runs over the text's distinct words instead of all of it
+SAMPLE_CHARS = 4096
+REPETITIVE_RATIO = 0.5
+
+
+def load_keyword_tables(path: str, base: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[str]]:
+    """
+    Reads {"group": ["keyword", ...], ...} from a JSON file. Groups in the file
+    replace the same groups in `base` (default: DEFAULT_KEYWORD_TABLES).
+    """
+    with open(path, "r") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict) or not all(isinstance(v, list) for v in overrides.values()):
+        raise ValueError(f"{path}: expected an object mapping group names to keyword lists")
+    tables = dict(base if base is not None else DEFAULT_KEYWORD_TABLES)
+    tables.update(overrides)
+    return tables
+
+
+class KeywordEngine:
+    """
+    Matches every keyword group against a text in a single pass.
+
+    All keywords are compiled into one regular expression (a trie of their
+    spellings), so picking out the words that may start a keyword is a single scan
+    in C. Only those words are then resolved to their groups: a hash lookup for
+    whole words, a match against the trie of "prefix*" keywords, and one search
+    for each phrase whose first word is present. For repetitive texts (logs) the regex only sees their distinct
+    words.
+
+    The result of the last scan is kept, so classify_tier and the agent check can
+    both ask about the same prompt without rescanning it.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, Iterable[str]]] = None):
+        self.tables = {group: list(keywords) for group, keywords in (tables or DEFAULT_KEYWORD_TABLES).items()}
+
+        self._words: Dict[str, Set[str]] = {}      # word -> groups
+        self._prefixes: Dict[str, Set[str]] = {}   # prefix -> groups
+        phrases: Dict[str, Set[str]] = {}          # phrase keyword -> groups
+        for group, keywords in self.tables.items():
+            for keyword in keywords:
+                keyword = " ".join(keyword.lower().split())
+                words = WORD_RE.findall(keyword.rstrip("*"))
+                if not words:
+                    continue
+                if len(words) > 1 or words[0] != keyword.rstrip("*"):
+                    phrases.setdefault(keyword, set()).add(group)
+                elif keyword.endswith("*"):
+                    self._prefixes.setdefault(words[0], set()).add(group)
+                else:
+                    self._words.setdefault(words[0], set()).add(group)
+
+        # The longest prefix keyword a word starts with, and the groups of every prefix keyword it implies
+        self._prefix_re = re.compile(self._trie(self._prefixes)) if self._prefixes else None
+        self._prefix_groups = {p: set().union(*(g for q, g in self._prefixes.items() if p.startswith(q)))
+                               for p in self._prefixes}
+        # first word -> [(compiled phrase, groups)]
+        self._phrases: Dict[str, List[Tuple["re.Pattern", FrozenSet[str]]]] = {}
+        for keyword, groups in phrases.items():
+            first = WORD_RE.findall(keyword)[0]
+            self._phrases.setdefault(first, []).append((re.compile(self._pattern(keyword)), frozenset(groups)))
+
+        # Words starting with any keyword spelling (a phrase is found through its first word)
+        spellings = set(self._words) | set(self._prefixes) | set(self._phrases)
+        self._locator = re.compile(rf"\W(?={self._trie(spellings)})(\w+)") if spellings else None
+        self._last = (None, frozenset())
+
+    @staticmethod
+    def _pattern(keyword: str) -> str:
+        body = r"\s+".join(re.escape(w) for w in keyword.rstrip("*").split())
+        return rf"\b{body}\w*" if keyword.endswith("*") else rf"\b{body}\b"
+
+    @classmethod
+    def _trie(cls, words: Iterable[str]) -> str:
+        """Regex alternation of `words` factored by common prefix, so each character is tried once."""
+        branches: Dict[str, Set[str]] = {}
+        for word in words:
+            branches.setdefault(word[0], set()).add(word[1:])
+        alternatives = []
+        for char in sorted(branches):
+            rest = branches[char]
+            optional = "" in rest
+            rest.discard("")
+            tail = cls._trie(rest) if rest else ""
+            if tail and optional:
+                tail = f"(?:{tail})?"
+            alternatives.append(re.escape(char) + tail)
+        return alternatives[0] if len(alternatives) == 1 else f"(?:{'|'.join(alternatives)})"
+
+    @classmethod
+    def from_file(cls, path: str) -> "KeywordEngine":
+        return cls(load_keyword_tables(path))
+
+    def _vocabulary(self, lowered: str) -> Set[str]:
+        """The text's words that start with a keyword spelling."""
+        if len(lowered) > SAMPLE_CHARS:
+            sample = lowered[:SAMPLE_CHARS].split()
+            if len(set(sample)) < len(sample) * REPETITIVE_RATIO:
+                # Repetitive text (logs, data): only its distinct words need to go through the regex
+                lowered = "\n".join(set(lowered.split()))
+        return set(self._locator.findall(" " + lowered))
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Returns the groups with at least one keyword in text."""
+        last_text, last_groups = self._last
+        if text is last_text:
+            return last_groups
+
+        found = set()
+        if text and self._locator is not None:
+            lowered = text.lower()
+            vocabulary = self._vocabulary(lowered)
+            for word in vocabulary & self._words.keys():
+                found |= self._words[word]
+            if self._prefix_re is not None:
+                for word in vocabulary:
+                    prefix = self._prefix_re.match(word)
+                    if prefix:
+                        found |= self._prefix_groups[prefix.group()]
+            for first in vocabulary & self._phrases.keys():
+                for pattern, groups in self._phrases[first]:
+                    if not groups <= found and pattern.search(lowered):
+                        found |= groups
+
+        groups = frozenset(found)
+        self._last = (text, groups)
+        return groups
+
+    def matches(self, text: str, group: str) -> bool:
+        return group in self.scan(text)
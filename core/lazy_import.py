@@ -0,0 +1,44 @@
+import importlib
+import importlib.util
+from threading import Lock
+
+
+def module_available(name: str) -> bool:
+    """True if `name` is installed, checked without importing it (only its parent packages)."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access.
+
+    Heavy SDKs (google.genai, anthropic, ...) cost seconds to import; code that
+    only needs them on a provider call can hold a LazyModule instead and keep
+    `module.attr` call sites unchanged.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
@@ -1,17 +1,32 @@
 import json
 import os
+import time
 import logging
-from typing import Dict, List, Any, Optional
+from threading import RLock
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 logger = logging.getLogger("memory_manager")
 
 class MemoryManager:
-    def __init__(self, memory_dir: str = "memory"):
+    """
+    User context and interaction log, persisted as JSON under memory_dir. One
+    instance can be shared across request threads: updates are serialized.
+
+    Like BrainContextCache, each file is tracked by its (mtime, size) signature and
+    re-read when it changes on disk (checked at most every `check_interval`
+    seconds), so edits made outside the process are picked up without a restart.
+    """
+
+    def __init__(self, memory_dir: str = "memory", check_interval: float = 1.0):
         self.memory_dir = memory_dir
+        self.check_interval = check_interval
+        self._lock = RLock()
         self.user_context_file = os.path.join(memory_dir, "user_context.json")
         self.interaction_log_file = os.path.join(memory_dir, "interaction_log.json")
-        
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._last_check = time.monotonic()
+
         self._ensure_memory_dir()
         self._load_memory()
 
@@ -20,15 +35,43 @@ class MemoryManager:
             os.makedirs(self.memory_dir)
             
     def _load_memory(self):
+        self._load_user_context()
+        self._load_interaction_log()
+
+    def _load_user_context(self):
         self.user_context = self._load_json(self.user_context_file, default={
             "name": "Chris",
             "preferences": {},
             "bio": "Entrepreneur and operator of CT Realty Media and R & B Apparel Plus.",
             "facts": []
         })
+
+    def _load_interaction_log(self):
         self.interaction_log = self._load_json(self.interaction_log_file, default=[])
 
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Re-reads the files changed on disk since they were last loaded or saved."""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            for path, load in ((self.user_context_file, self._load_user_context),
+                               (self.interaction_log_file, self._load_interaction_log)):
+                if self._signature(path) != self._signatures.get(path):
+                    logger.info(f"{path} changed on disk, reloading")
+                    load()
+
     def _load_json(self, filepath: str, default: Any) -> Any:
+        self._signatures[filepath] = self._signature(filepath)
         if not os.path.exists(filepath):
             return default
         try:
@@ -42,6 +85,7 @@ class MemoryManager:
         try:
             with open(filepath, 'w') as f:
                 json.dump(data, f, indent=4)
+            self._signatures[filepath] = self._signature(filepath)
         except Exception as e:
             logger.error(f"Failed to save {filepath}: {e}")
 
@@ -49,18 +93,23 @@ class MemoryManager:
 
     def get_context(self) -> Dict[str, Any]:
         """Returns the full user context."""
+        self._refresh()
         return self.user_context
 
     def update_preference(self, key: str, value: Any):
         """Updates a specific preference."""
-        self.user_context["preferences"][key] = value
-        self._save_json(self.user_context_file, self.user_context)
+        self._refresh()
+        with self._lock:
+            self.user_context["preferences"][key] = value
+            self._save_json(self.user_context_file, self.user_context)
 
     def add_fact(self, fact: str):
         """Adds a fact to the user knowledge base."""
-        if fact not in self.user_context["facts"]:
-            self.user_context["facts"].append(fact)
-            self._save_json(self.user_context_file, self.user_context)
+        self._refresh()
+        with self._lock:
+            if fact not in self.user_context["facts"]:
+                self.user_context["facts"].append(fact)
+                self._save_json(self.user_context_file, self.user_context)
 
     # --- Interaction Log Methods ---
 
@@ -72,15 +121,18 @@ class MemoryManager:
             "content": content,
             "metadata": metadata or {}
         }
-        self.interaction_log.append(entry)
-        # Keep log manageable - keep last 100 interactions for now
-        if len(self.interaction_log) > 100:
-            self.interaction_log = self.interaction_log[-100:]
-            
-        self._save_json(self.interaction_log_file, self.interaction_log)
+        self._refresh()
+        with self._lock:
+            self.interaction_log.append(entry)
+            # Keep log manageable - keep last 100 interactions for now
+            if len(self.interaction_log) > 100:
+                self.interaction_log = self.interaction_log[-100:]
+                
+            self._save_json(self.interaction_log_file, self.interaction_log)
 
     def get_recent_interactions(self, limit: int = 5) -> List[Dict]:
         """Returns the last N interactions."""
+        self._refresh()
         return self.interaction_log[-limit:]
 
     def search_memory(self, query: str) -> List[str]:
@@ -88,6 +140,7 @@ class MemoryManager:
         Simple keyword search implementation. 
         TODO: Upgrade to vector search in future.
         """
+        self._refresh()
         results = []
         query_lower = query.lower()
         
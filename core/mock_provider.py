@@ -0,0 +1,637 @@
+"""
+Local stand-in for the LLM providers, for offline load and fault-injection tests.
+
+Speaks the subset of the three wire protocols llm_brain uses:
+  - OpenRouter / OpenAI chat completions  POST /api/v1/chat/completions
+  - Gemini generateContent                POST /v1beta/models/<model>:generateContent
+                                          POST /v1beta/models/<model>:streamGenerateContent
+                                          POST|PATCH|DELETE /v1beta/cachedContents[/<id>]
+  - Anthropic messages                    POST /v1/messages
+all with streaming (SSE), max-token and stop-sequence handling, sampled
+latency, random 5xx errors, 429s with Retry-After, and a script of canned responses (text, AgentLoop tool calls or
+errors) consumed in order.
+
+Point llm_brain at it with CLAWBRAIN_MOCK_PROVIDER_URL=http://127.0.0.1:8808.
+
+Usage: python -m core.mock_provider [--port 8808] [--config mock.json]
+           [--latency lognormal:0.3,0.4] [--error-rate 0.05] [--rate-limit-rate 0.02]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("mock_provider")
+
+PROVIDERS = ("openrouter", "gemini", "claude")
+
+# Per-provider behaviour; the "default" section of a config applies to all
+# providers, the "providers" section overrides it per provider.
+DEFAULT_BEHAVIOR = {
+    "latency": "lognormal:0.3,0.4",   # full response time (non-streaming)
+    "ttft": None,                     # streaming: time to first chunk (default: latency)
+    "chunk_delay": "fixed:0.02",      # streaming: time between chunks
+    "chunk_words": 3,                 # streaming: words per chunk
+    "error_rate": 0.0,                # share of calls answered with error_status
+    "error_status": 503,
+    "rate_limit_rate": 0.0,           # share of calls answered 429
+    "retry_after": 1,                 # Retry-After seconds sent with 429s
+    "reply": "Mock {provider} reply to: {prompt}",
+}
+
+GEMINI_PATH_RE = re.compile(r"/models/([^/:]+):(generateContent|streamGenerateContent)$")
+CACHED_CONTENT_PATH_RE = re.compile(r"/cachedContents(?:/([^/]+))?$")
+
+
+class LatencyDistribution:
+    """
+    Seconds to wait, from a spec string "<dist>:<params>":
+      fixed:S  uniform:LO,HI  normal:MEAN,SD  lognormal:MEDIAN,SIGMA  exponential:MEAN
+    A bare number is fixed. Samples are never negative.
+    """
+
+    SHAPES = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, lo, hi: rng.uniform(lo, hi)),
+        "normal": (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1.0 / mean) if mean > 0 else 0.0),
+    }
+
+    def __init__(self, spec: Any):
+        if isinstance(spec, (int, float)):
+            spec = f"fixed:{spec}"
+        self.spec = str(spec)
+        name, _, params = self.spec.partition(":")
+        if name not in self.SHAPES:
+            raise ValueError(f"unknown latency distribution '{name}' (expected one of {', '.join(self.SHAPES)})")
+        arity, self._sample = self.SHAPES[name]
+        try:
+            self.params = [float(p) for p in params.split(",")] if params else []
+        except ValueError:
+            raise ValueError(f"latency '{self.spec}': parameters must be numbers")
+        if len(self.params) != arity:
+            raise ValueError(f"latency '{self.spec}': {name} takes {arity} parameter(s)")
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self._sample(rng, *self.params))
+
+    def __repr__(self):
+        return f"LatencyDistribution({self.spec!r})"
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough provider-agnostic count (~4 chars per token), enough for cost/budget metrics
+    return max(1, len(text) // 4) if text else 0
+
+
+def tool_call_text(tool: str, args: Optional[Dict[str, Any]] = None) -> str:
+    """A tool call in the JSON block format AgentLoop parses from model output."""
+    return json.dumps({"tool": tool, "args": args or {}})
+
+
+class MockProviderServer:
+    """
+    Threaded HTTP server answering as OpenRouter, Gemini and Anthropic.
+
+    config = {
+        "seed": 0,
+        "default": {...DEFAULT_BEHAVIOR overrides...},
+        "providers": {"gemini": {"error_rate": 0.2}, ...},
+        "script": [
+            {"text": "Final Answer: done"},
+            {"provider": "claude", "tool": "get_calendar_events", "args": {}},
+            {"status": 429, "retry_after": 2},
+            {"status": 503, "latency": 0.5},
+        ],
+    }
+
+    Script entries are consumed first, in order (an entry with "provider" only
+    by that provider); once none applies, behaviour is sampled from the config.
+    Behaviour and script can be changed while running, over HTTP
+    (POST /mock/config, /mock/script, /mock/reset; GET /mock/stats) or by
+    calling configure()/enqueue()/reset().
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 0):
+        self._lock = Lock()
+        self._config: Dict[str, Any] = {"default": {}, "providers": {}}
+        self._behaviors: Dict[str, Dict[str, Any]] = {}
+        self._script: deque = deque()
+        self._caches: Dict[str, int] = {}            # cached content name -> tokens
+        self._claude_prefixes: set = set()           # system prefixes Anthropic would have cached
+        self._rng = random.Random((config or {}).get("seed"))
+        self._thread: Optional[threading.Thread] = None
+        self.reset_stats()
+        self.configure(config or {})
+
+        self.httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+
+    # --- Lifecycle ---
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockProviderServer":
+        """Serves in a background thread (for tests and benchmarks)."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- Configuration ---
+
+    def configure(self, config: Dict[str, Any]):
+        """Merges config (same shape as the constructor's) into the running server."""
+        with self._lock:
+            merged = {"default": dict(self._config["default"], **config.get("default", {})),
+                      "providers": {p: dict(o) for p, o in self._config["providers"].items()}}
+            for provider, overrides in config.get("providers", {}).items():
+                if provider not in PROVIDERS:
+                    raise ValueError(f"unknown provider '{provider}' (expected one of {', '.join(PROVIDERS)})")
+                merged["providers"].setdefault(provider, {}).update(overrides)
+            behaviors = {}
+            for provider in PROVIDERS:
+                behavior = dict(DEFAULT_BEHAVIOR)
+                behavior.update(merged["default"])
+                behavior.update(merged["providers"].get(provider, {}))
+                for key in ("latency", "ttft", "chunk_delay"):
+                    if behavior[key] is not None:
+                        behavior[key] = LatencyDistribution(behavior[key])
+                behaviors[provider] = behavior
+            # Only applied once every value parsed
+            self._config, self._behaviors = merged, behaviors
+        self.enqueue(*config.get("script", []))
+
+    def enqueue(self, *entries: Dict[str, Any]):
+        """Appends canned responses to the script."""
+        for entry in entries:
+            if entry.get("provider") not in (None,) + PROVIDERS:
+                raise ValueError(f"script entry for unknown provider: {entry}")
+        with self._lock:
+            self._script.extend(entries)
+
+    def reset(self):
+        """Clears the script, behaviour overrides and stats."""
+        with self._lock:
+            self._script.clear()
+            self._config = {"default": {}, "providers": {}}
+        self.configure({})
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "streamed": 0, "in_flight": 0, "max_in_flight": 0,
+                           "by_provider": {p: 0 for p in PROVIDERS}, "by_status": {}}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+            stats["script_remaining"] = len(self._script)
+        return stats
+
+    # --- Per-request decisions ---
+
+    def _begin(self, provider: str, stream: bool):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["streamed"] += int(stream)
+            self._stats["by_provider"][provider] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+
+    def _end(self, status: int):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._stats["by_status"][str(status)] = self._stats["by_status"].get(str(status), 0) + 1
+
+    def _next_script_entry(self, provider: str) -> Optional[Dict[str, Any]]:
+        for i, entry in enumerate(self._script):
+            if entry.get("provider") in (None, provider):
+                del self._script[i]
+                return entry
+        return None
+
+    def decide(self, provider: str, prompt: str, model: str) -> Dict[str, Any]:
+        """
+        Outcome of one call: {"status", "text", "latency", "ttft", "chunk_delay",
+        "chunk_words", "retry_after"}.
+        """
+        with self._lock:
+            behavior = self._behaviors[provider]
+            entry = self._next_script_entry(provider) or {}
+            roll = self._rng.random()
+            latency = entry.get("latency")
+            if latency is None:
+                latency = behavior["latency"].sample(self._rng)
+            ttft = behavior["ttft"].sample(self._rng) if behavior["ttft"] is not None else latency
+            chunk_delay = behavior["chunk_delay"].sample(self._rng) if behavior["chunk_delay"] is not None else 0.0
+
+        status = entry.get("status")
+        if status is None and not entry:
+            if roll < behavior["rate_limit_rate"]:
+                status = 429
+            elif roll < behavior["rate_limit_rate"] + behavior["error_rate"]:
+                status = behavior["error_status"]
+        status = status or 200
+
+        if "tool" in entry:
+            text = tool_call_text(entry["tool"], entry.get("args"))
+        elif "text" in entry:
+            text = entry["text"]
+        else:
+            text = behavior["reply"].format(provider=provider, model=model, prompt=prompt[:80])
+
+        return {
+            "status": status,
+            "text": text,
+            "latency": latency,
+            "ttft": ttft if "latency" not in entry else latency,
+            "chunk_delay": chunk_delay,
+            "chunk_words": max(1, int(behavior["chunk_words"])),
+            "retry_after": entry.get("retry_after", behavior["retry_after"]),
+        }
+
+    def create_cache(self, tokens: int) -> str:
+        with self._lock:
+            name = f"cachedContents/mock-{len(self._caches) + 1}"
+            self._caches[name] = tokens
+        return name
+
+    def cached_tokens(self, name: Optional[str]) -> Optional[int]:
+        with self._lock:
+            return self._caches.get(name)
+
+    def delete_cache(self, name: str) -> bool:
+        with self._lock:
+            return self._caches.pop(name, None) is not None
+
+    def claude_prefix_seen(self, prefix: str) -> bool:
+        """True if this cache_control prefix was sent before (a cache read), else records it (a write)."""
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            if digest in self._claude_prefixes:
+                return True
+            self._claude_prefixes.add(digest)
+            return False
+
+
+def _chunks(text: str, words_per_chunk: int) -> List[str]:
+    words = re.findall(r"\S+\s*", text)
+    return ["".join(words[i:i + words_per_chunk]) for i in range(0, len(words), words_per_chunk)] or [""]
+
+
+def _stop(text: str, stop_sequences: Any) -> Tuple[str, Optional[str]]:
+    """Cuts text before the earliest stop sequence; returns (text, matched sequence or None)."""
+    if isinstance(stop_sequences, str):
+        stop_sequences = [stop_sequences]
+    hits = [(text.find(seq), seq) for seq in stop_sequences or [] if seq and seq in text]
+    if not hits:
+        return text, None
+    index, seq = min(hits)
+    return text[:index], seq
+
+
+def _truncate(text: str, max_tokens: Optional[int]) -> Tuple[str, bool]:
+    if max_tokens and estimate_tokens(text) > max_tokens:
+        return text[:max_tokens * 4], True
+    return text, False
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs (the pooled clients rely on it)
+
+    @property
+    def mock(self) -> MockProviderServer:
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # --- Plumbing ---
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, events: Iterable[str], first_delay: float, delay: float):
+        """Writes SSE events with chunked transfer encoding, sleeping before each one."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        wait = first_delay
+        for event in events:
+            if wait:
+                time.sleep(wait)
+            data = event.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            wait = delay
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _fail(self, provider: str, outcome: Dict[str, Any]):
+        status = outcome["status"]
+        time.sleep(outcome["latency"] if status != 429 else 0)
+        headers = {"Retry-After": str(outcome["retry_after"])} if status == 429 else None
+        message = "Rate limit exceeded (mock)" if status == 429 else "Service unavailable (mock)"
+        if provider == "claude":
+            kind = "rate_limit_error" if status == 429 else "overloaded_error" if status == 529 else "api_error"
+            payload = {"type": "error", "error": {"type": kind, "message": message}}
+        elif provider == "gemini":
+            reason = "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"
+            payload = {"error": {"code": status, "message": message, "status": reason}}
+        else:
+            payload = {"error": {"code": status, "message": message}}
+        self._send_json(status, payload, headers)
+
+    # --- Routing ---
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/mock/stats":
+            return self._send_json(200, self.mock.get_stats())
+        if self.path.rstrip("/") in ("", "/health"):
+            return self._send_json(200, {"status": "ok", "providers": list(PROVIDERS)})
+        self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self._body()
+        try:
+            if path == "/mock/config":
+                self.mock.configure(body)
+                return self._send_json(200, {"ok": True})
+            if path == "/mock/script":
+                self.mock.enqueue(*(body if isinstance(body, list) else [body]))
+                return self._send_json(200, {"ok": True})
+            if path == "/mock/reset":
+                self.mock.reset()
+                return self._send_json(200, {"ok": True})
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {"error": {"message": str(e)}})
+
+        if path.endswith("/chat/completions"):
+            return self._openrouter(body)
+        if path.endswith("/v1/messages"):
+            return self._claude(body)
+        match = GEMINI_PATH_RE.search(path)
+        if match:
+            return self._gemini(body, match.group(1), stream=match.group(2) == "streamGenerateContent")
+        if CACHED_CONTENT_PATH_RE.search(path):
+            return self._create_cached_content(body)
+        self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_PATCH(self):
+        match = CACHED_CONTENT_PATH_RE.search(self.path.split("?")[0])
+        self._body()
+        if match and self.mock.cached_tokens(f"cachedContents/{match.group(1)}") is not None:
+            return self._send_json(200, self._cache_resource(f"cachedContents/{match.group(1)}"))
+        self._send_json(404, {"error": {"code": 404, "message": "cached content not found", "status": "NOT_FOUND"}})
+
+    def do_DELETE(self):
+        match = CACHED_CONTENT_PATH_RE.search(self.path.split("?")[0])
+        if match and self.mock.delete_cache(f"cachedContents/{match.group(1)}"):
+            return self._send_json(200, {})
+        self._send_json(404, {"error": {"code": 404, "message": "cached content not found", "status": "NOT_FOUND"}})
+
+    # --- OpenRouter (OpenAI chat completions) ---
+
+    def _openrouter(self, body: Dict[str, Any]):
+        messages = body.get("messages") or []
+        prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        model = body.get("model", "mock")
+        stream = bool(body.get("stream"))
+        self.mock._begin("openrouter", stream)
+        outcome = self.mock.decide("openrouter", str(prompt), model)
+        try:
+            if outcome["status"] != 200:
+                return self._fail("openrouter", outcome)
+
+            text, _ = _stop(outcome["text"], body.get("stop"))
+            text, truncated = _truncate(text, body.get("max_tokens"))
+            usage = {"prompt_tokens": sum(estimate_tokens(str(m.get("content") or "")) for m in messages),
+                     "completion_tokens": estimate_tokens(text)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            finish = "length" if truncated else "stop"
+            base = {"id": f"gen-mock-{time.time_ns()}", "model": model, "created": int(time.time())}
+
+            if not stream:
+                time.sleep(outcome["latency"])
+                return self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[
+                    {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish}]))
+
+            def events():
+                for piece in _chunks(text, outcome["chunk_words"]):
+                    chunk = dict(base, object="chat.completion.chunk", choices=[
+                        {"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}])
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                done = dict(base, object="chat.completion.chunk", choices=[
+                    {"index": 0, "delta": {}, "finish_reason": finish}])
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    done["usage"] = usage
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+            self._send_stream(events(), outcome["ttft"], outcome["chunk_delay"])
+        finally:
+            self.mock._end(outcome["status"])
+
+    # --- Gemini (generateContent) ---
+
+    def _cache_resource(self, name: str) -> Dict[str, Any]:
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        return {"name": name, "model": "models/mock", "expireTime": expires,
+                "usageMetadata": {"totalTokenCount": self.mock.cached_tokens(name) or 0}}
+
+    def _create_cached_content(self, body: Dict[str, Any]):
+        text = json.dumps(body.get("systemInstruction") or body.get("contents") or "")
+        name = self.mock.create_cache(estimate_tokens(text))
+        self._send_json(200, self._cache_resource(name))
+
+    def _gemini(self, body: Dict[str, Any], model: str, stream: bool):
+        texts = [part.get("text", "") for content in body.get("contents") or []
+                 for part in content.get("parts") or [] if isinstance(part, dict)]
+        prompt = texts[-1] if texts else ""
+        self.mock._begin("gemini", stream)
+        outcome = self.mock.decide("gemini", prompt, model)
+        try:
+            if outcome["status"] != 200:
+                return self._fail("gemini", outcome)
+
+            cached_name = body.get("cachedContent")
+            cached = self.mock.cached_tokens(cached_name) if cached_name else 0
+            if cached is None:
+                return self._send_json(404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                       "message": f"cache {cached_name} not found"}})
+            config = body.get("generationConfig") or {}
+            text, _ = _stop(outcome["text"], config.get("stopSequences"))
+            text, truncated = _truncate(text, config.get("maxOutputTokens"))
+            system = json.dumps(body.get("systemInstruction") or "")
+            prompt_tokens = sum(estimate_tokens(t) for t in texts) + (estimate_tokens(system) if body.get("systemInstruction") else 0) + cached
+            usage = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": estimate_tokens(text),
+                     "totalTokenCount": prompt_tokens + estimate_tokens(text)}
+            if cached:
+                usage["cachedContentTokenCount"] = cached
+            finish = "MAX_TOKENS" if truncated else "STOP"
+
+            def candidate(piece, finish_reason=None):
+                result = {"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}
+                if finish_reason:
+                    result["finishReason"] = finish_reason
+                return result
+
+            if not stream:
+                time.sleep(outcome["latency"])
+                return self._send_json(200, {"candidates": [candidate(text, finish)], "usageMetadata": usage,
+                                             "modelVersion": model})
+
+            def events():
+                pieces = _chunks(text, outcome["chunk_words"])
+                for i, piece in enumerate(pieces):
+                    last = i == len(pieces) - 1
+                    chunk = {"candidates": [candidate(piece, finish if last else None)], "modelVersion": model}
+                    if last:
+                        chunk["usageMetadata"] = usage
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+            self._send_stream(events(), outcome["ttft"], outcome["chunk_delay"])
+        finally:
+            self.mock._end(outcome["status"])
+
+    # --- Anthropic (messages) ---
+
+    def _claude(self, body: Dict[str, Any]):
+        messages = body.get("messages") or []
+        content = messages[-1].get("content", "") if messages else ""
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        model = body.get("model", "mock")
+        stream = bool(body.get("stream"))
+        self.mock._begin("claude", stream)
+        outcome = self.mock.decide("claude", content, model)
+        try:
+            if outcome["status"] != 200:
+                return self._fail("claude", outcome)
+
+            # Prompt caching: everything up to the last cache_control block is the cached prefix
+            system = body.get("system") or ""
+            blocks = system if isinstance(system, list) else [{"type": "text", "text": system}]
+            cut = max((i + 1 for i, b in enumerate(blocks) if b.get("cache_control")), default=0)
+            prefix = "".join(b.get("text", "") for b in blocks[:cut])
+            rest = "".join(b.get("text", "") for b in blocks[cut:])
+            cache_read = cache_write = 0
+            if prefix:
+                if self.mock.claude_prefix_seen(prefix):
+                    cache_read = estimate_tokens(prefix)
+                else:
+                    cache_write = estimate_tokens(prefix)
+
+            text, stop_sequence = _stop(outcome["text"], body.get("stop_sequences"))
+            text, truncated = _truncate(text, body.get("max_tokens"))
+            usage = {"input_tokens": estimate_tokens(rest) + sum(estimate_tokens(json.dumps(m.get("content"))) for m in messages),
+                     "output_tokens": estimate_tokens(text),
+                     "cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_write}
+            stop_reason = "max_tokens" if truncated else "stop_sequence" if stop_sequence else "end_turn"
+            message = {"id": f"msg_mock_{time.time_ns()}", "type": "message", "role": "assistant", "model": model}
+
+            if not stream:
+                time.sleep(outcome["latency"])
+                return self._send_json(200, dict(message, content=[{"type": "text", "text": text}],
+                                                 stop_reason=stop_reason, stop_sequence=stop_sequence, usage=usage))
+
+            def event(name, payload):
+                return f"event: {name}\ndata: {json.dumps(dict(payload, type=name))}\n\n"
+
+            def events():
+                yield event("message_start", {"message": dict(message, content=[], stop_reason=None,
+                                                              stop_sequence=None, usage=dict(usage, output_tokens=1))})
+                yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+                for piece in _chunks(text, outcome["chunk_words"]):
+                    yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": piece}})
+                yield event("content_block_stop", {"index": 0})
+                yield event("message_delta", {"delta": {"stop_reason": stop_reason, "stop_sequence": stop_sequence},
+                                              "usage": {"output_tokens": usage["output_tokens"]}})
+                yield event("message_stop", {})
+            self._send_stream(events(), outcome["ttft"], outcome["chunk_delay"])
+        finally:
+            self.mock._end(outcome["status"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the OpenRouter, Gemini and Anthropic APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--config", help="JSON file with default/providers/script sections")
+    parser.add_argument("--latency", help="e.g. fixed:0.2, uniform:0.1,0.5, lognormal:0.3,0.4")
+    parser.add_argument("--error-rate", type=float)
+    parser.add_argument("--rate-limit-rate", type=float)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    config: Dict[str, Any] = {}
+    if args.config:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    overrides = {"latency": args.latency, "error_rate": args.error_rate,
+                 "rate_limit_rate": args.rate_limit_rate, "retry_after": args.retry_after}
+    config.setdefault("default", {}).update({k: v for k, v in overrides.items() if v is not None})
+    if args.seed is not None:
+        config["seed"] = args.seed
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockProviderServer(config, host=args.host, port=args.port)
+    print(f"Mock providers on {server.url}")
+    print(f"  export CLAWBRAIN_MOCK_PROVIDER_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
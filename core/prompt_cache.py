@@ -0,0 +1,153 @@
+import time
+import hashlib
+import logging
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.context_profiles import estimate_tokens
+
+logger = logging.getLogger("prompt_cache")
+
+
+class GeminiPromptCache:
+    """
+    Gemini cached contents holding the (static) system instruction.
+
+    One cached content per (api key, model, instruction). Entries are tagged with
+    the brain context version they were built from; when the brain files change,
+    entries from older versions are deleted on the next call and new ones created
+    on demand. TTLs are extended shortly before they run out.
+
+    Creation can fail (instruction under the model's minimum cacheable size, model
+    without caching support); such keys are not retried for `retry_after` seconds
+    and the caller simply sends the instruction inline. So do callers that arrive
+    while another one is creating the same entry.
+    """
+
+    def __init__(self, ttl: int = 3600, refresh_margin: int = 300, min_tokens: int = 1024,
+                 retry_after: float = 3600.0):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+        self.lock = Lock()
+        # key -> {"name", "expires_at", "version", "client", "model", "instruction", "tools"}
+        self._entries: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._failed: Dict[Tuple[str, str, str], float] = {}
+        # Keys whose create/update call is in flight (one caller per key talks to the API)
+        self._pending: Set[Tuple[str, str, str]] = set()
+        self._stats = {"hits": 0, "created": 0, "refreshed": 0, "deleted": 0, "failures": 0, "skipped": 0,
+                       "in_flight": 0}
+
+    @staticmethod
+    def _key(api_key: str, model: str, system_instruction: str) -> Tuple[str, str, str]:
+        fingerprint = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        digest = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        return (fingerprint, model, digest)
+
+    def _pop_stale(self, version: int) -> List[Dict[str, Any]]:
+        """Removes entries from other brain versions; the caller deletes them outside the lock."""
+        return [self._entries.pop(k) for k in [k for k, e in self._entries.items() if e["version"] != version]]
+
+    def _delete(self, entries: List[Dict[str, Any]]):
+        for entry in entries:
+            try:
+                entry["client"].caches.delete(name=entry["name"])
+            except Exception as e:
+                logger.warning(f"Failed to delete stale Gemini cache {entry['name']}: {e}")
+        if entries:
+            with self.lock:
+                self._stats["deleted"] += len(entries)
+
+    def get(self, client: Any, api_key: str, model: str, system_instruction: str,
+            tools: Optional[List[Any]] = None, version: int = 0) -> Optional[str]:
+        """Returns the cached content name to use for this instruction, or None to send it inline."""
+        if not system_instruction:
+            return None
+        if estimate_tokens(system_instruction) < self.min_tokens:
+            self._stats["skipped"] += 1
+            return None
+
+        key = self._key(api_key, model, system_instruction)
+        now = time.time()
+        # The lock only guards the bookkeeping: the API calls below run outside it, and
+        # one caller per key (the one that reserved it in _pending) makes them.
+        reserved = False
+        name = None
+        with self.lock:
+            stale = self._pop_stale(version)
+            entry = self._entries.get(key)
+            if entry is not None and (entry["expires_at"] - now > self.refresh_margin
+                                      or (key in self._pending and entry["expires_at"] > now)):
+                # Fresh, or still valid while another caller extends it
+                self._stats["hits"] += 1
+                name = entry["name"]
+            elif key in self._pending:
+                # Being created by another caller: send the instruction inline this once
+                self._stats["in_flight"] += 1
+            else:
+                failed_at = self._failed.get(key)
+                if entry is not None or failed_at is None or now - failed_at >= self.retry_after:
+                    self._pending.add(key)
+                    reserved = True
+        self._delete(stale)
+        if not reserved:
+            return name
+
+        try:
+            return self._refresh(client, key, entry, now) if entry is not None else \
+                self._create(client, key, model, system_instruction, tools, version, now)
+        finally:
+            with self.lock:
+                self._pending.discard(key)
+
+    def _refresh(self, client: Any, key: Tuple[str, str, str], entry: Dict[str, Any], now: float) -> Optional[str]:
+        try:
+            client.caches.update(name=entry["name"], config={"ttl": f"{self.ttl}s"})
+        except Exception as e:
+            logger.warning(f"Failed to extend Gemini cache {entry['name']}, recreating: {e}")
+            with self.lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return self._create(client, key, entry["model"], entry["instruction"], entry["tools"],
+                                entry["version"], now)
+        with self.lock:
+            entry["expires_at"] = now + self.ttl
+            self._stats["refreshed"] += 1
+        return entry["name"]
+
+    def _create(self, client: Any, key: Tuple[str, str, str], model: str, system_instruction: str,
+                tools: Optional[List[Any]], version: int, now: float) -> Optional[str]:
+        try:
+            cached = client.caches.create(model=model, config={
+                "system_instruction": system_instruction,
+                "tools": tools or None,
+                "ttl": f"{self.ttl}s",
+                "display_name": f"clawbrain-context-v{version}",
+            })
+        except Exception as e:
+            logger.warning(f"Gemini context caching unavailable for {model}: {e}")
+            with self.lock:
+                self._failed[key] = now
+                self._stats["failures"] += 1
+            return None
+
+        with self.lock:
+            self._failed.pop(key, None)
+            self._entries[key] = {"name": cached.name, "expires_at": now + self.ttl, "version": version,
+                                  "client": client, "model": model, "instruction": system_instruction,
+                                  "tools": tools}
+            self._stats["created"] += 1
+        logger.info(f"Created Gemini cached content {cached.name} for {model} (brain v{version})")
+        return cached.name
+
+    def invalidate(self, name: str):
+        """Forgets an entry the API no longer knows (expired or deleted elsewhere)."""
+        with self.lock:
+            for key in [k for k, e in self._entries.items() if e["name"] == name]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["entries"] = len(self._entries)
+        return stats
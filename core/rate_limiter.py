@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("rate_limiter")
+
+# Gemini reports its back-off in the error body (RetryInfo) rather than a header
+RETRY_DELAY_RE = re.compile(r"""retryDelay['"]?\s*:\s*['"]?(\d+(?:\.\d+)?)s""")
+
+
+class RateLimited(Exception):
+    """A provider answered 429 Too Many Requests; `retry_after` is its Retry-After in seconds, if sent."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(Exception):
+    """The wait for a rate-limit slot would outlast the caller's deadline (nothing was reserved)."""
+
+    def __init__(self, message: str, wait: float):
+        super().__init__(message)
+        self.wait = wait
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Seconds from a Retry-After header (delay-seconds or an HTTP date), or None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def rate_limit_info(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    (is a 429, Retry-After seconds or None) for an exception from any provider call:
+    RateLimited, SDK errors carrying an HTTP status (anthropic: status_code,
+    google-genai: code) and their response headers.
+    """
+    if isinstance(error, RateLimited):
+        return True, error.retry_after
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status != 429:
+        return False, None
+
+    retry_after = None
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is None and headers.get("retry-after-ms") is not None:
+            retry_after = (parse_retry_after(headers.get("retry-after-ms")) or 0.0) / 1000
+    if retry_after is None:
+        m = RETRY_DELAY_RE.search(str(error))
+        if m:
+            retry_after = float(m.group(1))
+    return True, retry_after
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 20.0, retry_after: Optional[float] = None,
+                  rng: random.Random = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0 = first retry). Without a
+    Retry-After this is full-jitter exponential backoff, uniform in
+    [0, min(cap, base * 2**attempt)]; with one, the server's delay plus up to 10%
+    (at most 1s) so clients told the same delay don't retry in lockstep.
+    """
+    rng = rng or random
+    if retry_after is not None:
+        return retry_after + rng.uniform(0, min(1.0, retry_after * 0.1))
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Refills at `rate` units per second up to `capacity`. Reservations are taken at
+    once and may drive the level negative; the caller then waits until the bucket
+    would have refilled, so queued callers are spaced out in arrival order.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` (at most the capacity) is available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self, now: float, until: float, keep: float = 0.0):
+        """
+        Empties the bucket as of `until` (except `keep` units), so callers after a 429
+        are paced at the refill rate instead of bursting when the pause ends.
+        """
+        self._refill(now)
+        self.level = min(self.level, keep - (until - now) * self.rate)
+
+
+class _KeyLimits:
+    def __init__(self, rpm: Optional[float], tpm: Optional[float], now: float):
+        self.requests = TokenBucket(rpm / 60.0, rpm, now) if rpm else None
+        self.tokens = TokenBucket(tpm / 60.0, tpm, now) if tpm else None
+        self.blocked_until = 0.0  # set from a provider's 429 / Retry-After
+        self.calls = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.rejected = 0
+        self.throttled = 0
+
+
+class RateLimiter:
+    """
+    Client-side request (RPM) and token (TPM) budgets per (provider, model, API key).
+
+    `limits` maps a provider to {"rpm", "tpm"} (None = unlimited); `model_limits`
+    overrides them for one model. Callers reserve a slot before each call and wait
+    the returned time; a 429 from the provider pauses the key for every caller
+    (penalize). Keys are stored by fingerprint, never in clear.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Optional[float]]],
+                 model_limits: Optional[Dict[str, Dict[str, Optional[float]]]] = None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.limits = limits
+        self.model_limits = model_limits or {}
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = Lock()
+        self._keys: Dict[Tuple[str, Optional[str], str], _KeyLimits] = {}
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+    def _get(self, provider: str, model: Optional[str], api_key: str, now: float) -> _KeyLimits:
+        key = (provider, model, self._fingerprint(api_key))
+        state = self._keys.get(key)
+        if state is None:
+            limits = self.model_limits.get(model) or self.limits.get(provider) or {}
+            state = self._keys[key] = _KeyLimits(limits.get("rpm"), limits.get("tpm"), now)
+        return state
+
+    def reserve(self, provider: str, model: Optional[str], api_key: str, tokens: int = 0,
+                max_wait: Optional[float] = None) -> float:
+        """
+        Reserves one request and `tokens` tokens; returns the seconds the caller must
+        wait before sending. Raises RateLimitExceeded (reserving nothing) if that is
+        longer than `max_wait`.
+        """
+        with self.lock:
+            now = self.clock()
+            state = self._get(provider, model, api_key, now)
+            wait = max(0.0, state.blocked_until - now)
+            if state.requests:
+                wait = max(wait, state.requests.wait_time(1, now))
+            if state.tokens and tokens:
+                wait = max(wait, state.tokens.wait_time(tokens, now))
+
+            if max_wait is not None and wait > max_wait:
+                state.rejected += 1
+                raise RateLimitExceeded(f"{provider} rate limit: next slot in {wait:.1f}s, "
+                                        f"only {max_wait:.1f}s of budget left", wait)
+
+            if state.requests:
+                state.requests.take(1, now)
+            if state.tokens and tokens:
+                state.tokens.take(tokens, now)
+            state.calls += 1
+            if wait > 0:
+                state.waits += 1
+                state.wait_seconds += wait
+            return wait
+
+    def acquire(self, provider: str, model: Optional[str], api_key: str, tokens: int = 0,
+                max_wait: Optional[float] = None) -> float:
+        """reserve() and sleep until the slot comes up; returns the seconds waited."""
+        wait = self.reserve(provider, model, api_key, tokens, max_wait)
+        if wait > 0:
+            logger.info(f"Rate limit: waiting {wait:.2f}s for {provider}")
+            self.sleep(wait)
+        return wait
+
+    def settle(self, provider: str, model: Optional[str], api_key: str, tokens: int):
+        """Corrects the token budget once a call's real usage is known (tokens = actual - reserved)."""
+        with self.lock:
+            now = self.clock()
+            state = self._get(provider, model, api_key, now)
+            if not state.tokens or not tokens:
+                return
+            if tokens > 0:
+                state.tokens.take(tokens, now)
+            else:
+                state.tokens.give_back(-tokens, now)
+
+    def penalize(self, provider: str, model: Optional[str], api_key: str, seconds: float):
+        """The provider said 429: no calls on this key for `seconds`, then paced at the refill rate."""
+        with self.lock:
+            now = self.clock()
+            state = self._get(provider, model, api_key, now)
+            state.blocked_until = max(state.blocked_until, now + seconds)
+            state.throttled += 1
+            if state.requests:
+                state.requests.drain(now, state.blocked_until, keep=1)
+            if state.tokens:
+                state.tokens.drain(now, state.blocked_until)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            now = self.clock()
+            return {
+                f"{provider}:{model or 'default'}:{fingerprint[:8]}": {
+                    "rpm": state.requests.capacity if state.requests else None,
+                    "tpm": state.tokens.capacity if state.tokens else None,
+                    "calls": state.calls,
+                    "waits": state.waits,
+                    "wait_seconds": round(state.wait_seconds, 3),
+                    "rejected": state.rejected,
+                    "throttled": state.throttled,
+                    "blocked_for": round(max(0.0, state.blocked_until - now), 3),
+                }
+                for (provider, model, fingerprint), state in self._keys.items()
+            }
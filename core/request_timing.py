@@ -0,0 +1,85 @@
+import re
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# Phases reported for a request, in the order they usually happen
+PHASES = ("classify", "context", "cache", "provider", "tool", "logging")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+SERVER_TIMING_RE = re.compile(r"\s*([\w-]+)\s*;\s*dur=([\d.]+)")
+
+
+class RequestTimings:
+    """
+    Wall time spent in each phase of one request.
+
+    Phases nest (provider -> logging of the attempt); a phase's time excludes the
+    phases nested in it, so the phases plus "other" add up to the total. Only
+    used from the request's own thread.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self._stack: List[list] = []  # [phase, start, time spent in nested phases]
+
+    @contextmanager
+    def phase(self, name: str):
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        """{phase: ms} for every phase, plus "other" (unattributed) and "total"."""
+        result = {phase: round(self.phases.get(phase, 0.0) * 1000, 3) for phase in PHASES}
+        for phase, seconds in self.phases.items():
+            result.setdefault(phase, round(seconds * 1000, 3))
+        total = self.total
+        result["other"] = round(max(0.0, total - sum(self.phases.values())) * 1000, 3)
+        result["total"] = round(total * 1000, 3)
+        return result
+
+    def server_timing(self) -> str:
+        """Server-Timing header value ("classify;dur=0.412, ..."), durations in ms."""
+        return ", ".join(f"{phase};dur={ms}" for phase, ms in self.as_ms().items())
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """{phase: ms} from a Server-Timing header (entries without a duration are skipped)."""
+    return {m.group(1): float(m.group(2)) for m in SERVER_TIMING_RE.finditer(header or "")}
+
+
+@contextmanager
+def track_request():
+    """Collects phase timings for the code run inside (in this thread/context)."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        timings.finish()
+        _current.reset(token)
+
+
+def timed(phase: str):
+    """Attributes the enclosed block to `phase` of the current request; no-op outside track_request()."""
+    timings = _current.get()
+    return timings.phase(phase) if timings is not None else nullcontext()
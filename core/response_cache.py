@@ -0,0 +1,174 @@
+import sqlite3
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("response_cache")
+
+
+class ResponseCache:
+    """
+    Exact-match LLM response cache.
+
+    Two tiers: a bounded in-memory LRU in front of an SQLite table that survives
+    restarts. Every entry carries its own expiry, so TTLs can differ per call
+    (llm_brain picks them per CapabilityTier).
+    """
+
+    def __init__(self, db_path: Optional[str] = "response_cache.db", max_entries: int = 512):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "expired": 0}
+        # The SQLite file is only created on first use, not when the module is imported
+        self._db_ready = False
+
+    def _init_db(self):
+        """Initialize the SQLite database and create the table if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    model TEXT,
+                    cost REAL DEFAULT 0.0,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires_at)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Failed to initialize response cache database: {e}")
+            self.db_path = None
+
+    def _disk(self) -> bool:
+        """Whether the SQLite tier is usable, creating it on first call. Call with the lock held."""
+        if self.db_path and not self._db_ready:
+            self._init_db()
+            self._db_ready = True
+        return bool(self.db_path)
+
+    @staticmethod
+    def make_key(model: str, system_instruction: Optional[str], prompt: str) -> str:
+        """Stable hash of (model, system instruction, prompt)."""
+        h = hashlib.sha256()
+        for part in (model or "", system_instruction or "", prompt or ""):
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns {"response", "model", "cost"} for a live entry, or None."""
+        now = time.time()
+        expired = False
+        with self.lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry
+                del self._memory[key]
+                expired = True
+
+            if self._disk():
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    conn.row_factory = sqlite3.Row
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT response, model, cost, expires_at FROM response_cache WHERE key = ?
+                    ''', (key,))
+                    row = cursor.fetchone()
+                    if row is not None and row["expires_at"] <= now:
+                        cursor.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+                        conn.commit()
+                        expired = True
+                        row = None
+                    conn.close()
+                    if row is not None:
+                        entry = dict(row)
+                        self._remember(key, entry)
+                        self._stats["disk_hits"] += 1
+                        return entry
+                except Exception as e:
+                    logger.error(f"Response cache read failed: {e}")
+
+            if expired:
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: str, ttl: float, model: Optional[str] = None, cost: float = 0.0):
+        """Stores a response for `ttl` seconds (no-op for ttl <= 0)."""
+        if ttl <= 0:
+            return
+        now = time.time()
+        entry = {"response": response, "model": model, "cost": cost, "expires_at": now + ttl}
+        with self.lock:
+            self._remember(key, entry)
+            self._stats["stores"] += 1
+            if self._disk():
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO response_cache (key, response, model, cost, created_at, expires_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (key, response, model, cost, now, now + ttl))
+                    conn.commit()
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"Response cache write failed: {e}")
+
+    def purge_expired(self) -> int:
+        """Drops expired entries from both tiers. Returns the number of disk rows removed."""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for key in [k for k, v in self._memory.items() if v["expires_at"] <= now]:
+                del self._memory[key]
+            if self._disk():
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    cursor = conn.cursor()
+                    cursor.execute('DELETE FROM response_cache WHERE expires_at <= ?', (now,))
+                    removed = cursor.rowcount
+                    conn.commit()
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"Response cache purge failed: {e}")
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self._memory.clear()
+            if self._disk():
+                try:
+                    conn = sqlite3.connect(self.db_path)
+                    conn.execute('DELETE FROM response_cache')
+                    conn.commit()
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"Response cache clear failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
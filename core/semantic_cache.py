@@ -0,0 +1,172 @@
+import re
+import time
+import zlib
+import logging
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("semantic_cache")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no intent; dropping them keeps paraphrases close together.
+# Deictic words ("this", "next", ...) are kept: "this afternoon" != "tomorrow afternoon".
+STOPWORDS = frozenset("""
+a an the and or but if then so of to in on at for from by with about as into
+is are was were be been being am do does did have has had i me my we our you your
+it its what whats which who whom please can could would should will just any
+anything some something
+""".split())
+
+
+class HashingVectorizer:
+    """
+    Local, dependency-light text embedding: signed feature hashing of word
+    unigrams, word bigrams and character trigrams, with sublinear TF and L2
+    normalization. No vocabulary to fit, no network model.
+    """
+
+    def __init__(self, dim: int = 256, char_ngram: int = 3):
+        self.dim = dim
+        self.char_ngram = char_ngram
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        # "what's" -> "whats" so contractions match their stopword form
+        words = [w for w in TOKEN_RE.findall(text.lower().replace("'", "")) if w not in STOPWORDS]
+        features = [(f"w:{w}", 1.0) for w in words]
+        features += [(f"b:{a}_{b}", 0.7) for a, b in zip(words, words[1:])]
+        n = self.char_ngram
+        for w in words:
+            padded = f"<{w}>"
+            features += [(f"c:{padded[i:i + n]}", 0.3) for i in range(len(padded) - n + 1)]
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vec[h % self.dim] += sign * weight
+
+        # Sublinear TF keeps repeated words from dominating
+        np.copyto(vec, np.sign(vec) * np.log1p(np.abs(vec)))
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec
+
+
+class SemanticCache:
+    """
+    Near-duplicate response cache over a fixed-capacity float32 matrix.
+
+    Rows are unit vectors, so cosine similarity is one matrix-vector product.
+    Entries are partitioned by namespace (model + system instruction) and
+    evicted oldest-first once the ring buffer is full.
+    """
+
+    def __init__(self, capacity: int = 10000, dim: int = 256, vectorizer: Optional[HashingVectorizer] = None):
+        self.capacity = capacity
+        self.vectorizer = vectorizer or HashingVectorizer(dim=dim)
+        self.dim = self.vectorizer.dim
+        self.lock = Lock()
+
+        self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._namespace = np.full(capacity, -1, dtype=np.int32)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._namespace_ids: Dict[str, int] = {}
+        self._next = 0
+        self._size = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _namespace_id(self, namespace: str) -> int:
+        ns_id = self._namespace_ids.get(namespace)
+        if ns_id is None:
+            ns_id = len(self._namespace_ids)
+            self._namespace_ids[namespace] = ns_id
+        return ns_id
+
+    def _insert(self, ns_id: int, vector: np.ndarray, entry: Dict[str, Any], now: float, ttl: float):
+        slot = self._next
+        self._matrix[slot] = vector
+        self._created[slot] = now
+        self._expires[slot] = now + ttl
+        self._namespace[slot] = ns_id
+        self._entries[slot] = entry
+        self._next = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def add(self, namespace: str, prompt: str, response: str, ttl: float,
+            model: Optional[str] = None, cost: float = 0.0):
+        if ttl <= 0:
+            return
+        vector = self.vectorizer.transform(prompt)
+        if not vector.any():
+            return
+        entry = {"prompt": prompt, "response": response, "model": model, "cost": cost}
+        with self.lock:
+            self._insert(self._namespace_id(namespace), vector, entry, time.time(), ttl)
+            self._stats["stores"] += 1
+
+    def bulk_add(self, namespace: str, vectors: np.ndarray, responses: List[str], ttl: float):
+        """Loads pre-computed unit vectors (warm starts and benchmarks)."""
+        now = time.time()
+        with self.lock:
+            ns_id = self._namespace_id(namespace)
+            for vector, response in zip(vectors, responses):
+                self._insert(ns_id, vector, {"prompt": None, "response": response, "model": None, "cost": 0.0}, now, ttl)
+
+    def lookup(self, namespace: str, prompt: str, threshold: float,
+               max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the most similar live entry in the namespace if its cosine
+        similarity is >= threshold (and it is younger than max_age, if given).
+        The returned dict includes a "similarity" field.
+        """
+        vector = self.vectorizer.transform(prompt)
+        if not vector.any():
+            return None
+
+        now = time.time()
+        with self.lock:
+            ns_id = self._namespace_ids.get(namespace)
+            if ns_id is None or self._size == 0:
+                self._stats["misses"] += 1
+                return None
+
+            n = self._size
+            scores = self._matrix[:n] @ vector
+            valid = (self._namespace[:n] == ns_id) & (self._expires[:n] > now)
+            if max_age is not None:
+                valid &= self._created[:n] >= now - max_age
+            scores = np.where(valid, scores, np.float32(-1.0))
+
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < threshold:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            result = dict(self._entries[best])
+            result["similarity"] = similarity
+            return result
+
+    def clear(self):
+        with self.lock:
+            self._namespace[:] = -1
+            self._entries = [None] * self.capacity
+            self._namespace_ids.clear()
+            self._next = 0
+            self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["entries"] = self._size
+        stats["capacity"] = self.capacity
+        stats["index_bytes"] = int(self._matrix.nbytes)
+        return stats
@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import Future, TimeoutError
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger("single_flight")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the leader)
+    runs the function, callers arriving while it is in flight wait for and share
+    its result (or exception). Nothing is kept once the call finishes; repeat
+    requests after that are the response cache's job.
+
+    A follower waits at most `timeout` seconds; if the leader is still running
+    by then (a hung provider), the follower runs fn itself instead.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "wait_timeouts": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True if this call waited on another caller's flight."""
+        with self.lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                future = self._inflight[key] = Future()
+                self._stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            try:
+                return future.result(timeout=timeout), True
+            except TimeoutError:
+                with self.lock:
+                    self._stats["wait_timeouts"] += 1
+                logger.warning(f"In-flight call still running after {timeout:.1f}s, making our own")
+                return fn(), False
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.lock:
+                del self._inflight[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        return stats
@@ -0,0 +1,168 @@
+import re
+import json
+import zlib
+import random
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("tier_classifier")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Traffic logs keep the first 500 chars of a prompt; inference looks at the same span
+MAX_CHARS = 500
+
+
+def hashed_features(text: str, dim: int, max_chars: int = MAX_CHARS) -> np.ndarray:
+    """Bucket indices of the word unigrams and bigrams of text (with repeats, for counts)."""
+    words = TOKEN_RE.findall(text[:max_chars].lower().replace("'", ""))
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams))
+
+
+class TierClassifier:
+    """
+    Multinomial Naive Bayes over hashed word unigrams and bigrams.
+
+    Training is a closed-form count over the examples, so it runs in seconds on
+    the whole traffic log; inference is a hash of the prompt plus a gather/sum
+    over a (tiers x dim) matrix of log likelihoods, well under a millisecond.
+    predict() returns the posterior of the best label so callers can fall back
+    to rules when the model is unsure.
+    """
+
+    def __init__(self, dim: int = 2 ** 15, alpha: float = 0.1):
+        self.dim = dim
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self.log_prior: Optional[np.ndarray] = None       # (labels,)
+        self.log_likelihood: Optional[np.ndarray] = None  # (labels, dim)
+
+    def fit(self, texts: Sequence[str], labels: Sequence[str]) -> "TierClassifier":
+        if not texts:
+            raise ValueError("no training examples")
+        self.labels = sorted(set(labels))
+        index = {label: i for i, label in enumerate(self.labels)}
+
+        counts = np.zeros((len(self.labels), self.dim), dtype=np.float64)
+        priors = np.zeros(len(self.labels), dtype=np.float64)
+        for text, label in zip(texts, labels):
+            row = index[label]
+            priors[row] += 1
+            np.add.at(counts[row], hashed_features(text, self.dim), 1.0)
+
+        smoothed = counts + self.alpha
+        self.log_likelihood = (np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))).astype(np.float32)
+        self.log_prior = np.log(priors / priors.sum()).astype(np.float32)
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Returns (label, confidence); (None, 0.0) for text without any words."""
+        if self.log_likelihood is None:
+            raise RuntimeError("classifier is not trained")
+        features = hashed_features(text, self.dim)
+        if not len(features):
+            return None, 0.0
+        scores = self.log_prior + self.log_likelihood[:, features].sum(axis=1)
+        scores = np.exp(scores - scores.max())
+        best = int(scores.argmax())
+        return self.labels[best], float(scores[best] / scores.sum())
+
+    def evaluate(self, texts: Sequence[str], labels: Sequence[str], threshold: float = 0.0) -> Dict[str, Any]:
+        """
+        Per-label precision/recall/support on (texts, labels). Predictions below
+        `threshold` count as abstentions (the rules would decide); coverage is the
+        share of examples the model answered.
+        """
+        per_label = {label: {"tp": 0, "fp": 0, "support": 0} for label in set(labels) | set(self.labels)}
+        answered = correct = 0
+        for text, label in zip(texts, labels):
+            per_label[label]["support"] += 1
+            predicted, confidence = self.predict(text)
+            if predicted is None or confidence < threshold:
+                continue
+            answered += 1
+            if predicted == label:
+                correct += 1
+                per_label[label]["tp"] += 1
+            else:
+                per_label[predicted]["fp"] += 1
+
+        report = {}
+        for label, c in sorted(per_label.items()):
+            predicted = c["tp"] + c["fp"]
+            report[label] = {
+                "precision": round(c["tp"] / predicted, 4) if predicted else None,
+                "recall": round(c["tp"] / c["support"], 4) if c["support"] else None,
+                "support": c["support"],
+            }
+        total = len(labels)
+        return {
+            "labels": report,
+            "accuracy": round(correct / answered, 4) if answered else None,
+            "coverage": round(answered / total, 4) if total else None,
+            "examples": total,
+        }
+
+    def save(self, path: str):
+        np.savez_compressed(path, labels=np.array(self.labels), log_prior=self.log_prior,
+                            log_likelihood=self.log_likelihood, dim=self.dim, alpha=self.alpha)
+
+    @classmethod
+    def load(cls, path: str) -> "TierClassifier":
+        with np.load(path) as data:
+            model = cls(dim=int(data["dim"]), alpha=float(data["alpha"]))
+            model.labels = [str(label) for label in data["labels"]]
+            model.log_prior = data["log_prior"]
+            model.log_likelihood = data["log_likelihood"]
+        return model
+
+
+def examples_from_traffic(rows: Iterable[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    (prompt, tier) training pairs from escalations in traffic rows, oldest first.
+
+    The tier a prompt was routed to is the router's own decision, so it is never
+    a label by itself. A prompt is labelled only when it was sent again at a
+    different tier than its first one (that tier failed, or the caller asked for
+    another): the label is the last such tier that answered successfully. The
+    tier is the row's tier column, else its context profile name
+    ("persona+whatsapp"); rows with neither are skipped.
+    """
+    first_tiers: Dict[str, str] = {}
+    labels: Dict[str, str] = {}
+    for row in rows:
+        prompt = row.get("prompt")
+        tier = row.get("tier") or (row.get("context_profile") or "").split("+")[0]
+        if not prompt or not tier:
+            continue
+        first_tier = first_tiers.setdefault(prompt, tier)
+        if row.get("status") == "success" and tier != first_tier:
+            labels[prompt] = tier
+    return list(labels.items())
+
+
+def load_labeled_examples(path: str) -> List[Tuple[str, str]]:
+    """Hand-labelled corrections: JSON lines of {"prompt": ..., "tier": ...}."""
+    examples = []
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                examples.append((item["prompt"], item["tier"]))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_no}: expected {{\"prompt\": ..., \"tier\": ...}} ({e})")
+    return examples
+
+
+def split_examples(examples: Sequence[Tuple[str, str]], test_fraction: float = 0.2,
+                   seed: int = 0) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Deterministic shuffled train/test split."""
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    cut = int(len(shuffled) * (1 - test_fraction))
+    return shuffled[:cut], shuffled[cut:]
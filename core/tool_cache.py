@@ -0,0 +1,98 @@
+import json
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("tool_cache")
+
+_MISS = object()
+
+
+class ToolResultCache:
+    """
+    In-memory TTL cache of tool results, keyed by (tool name, normalized args).
+
+    Each tool picks its own TTL when storing. A call that changes what another tool
+    would return (e.g. sending a WhatsApp message) invalidates that tool's entries
+    whose args match. Results of calls that were already running when their tool was
+    invalidated are not stored, so a slow read can't put a stale result back.
+    """
+
+    MISS = _MISS
+
+    def __init__(self, max_entries: int = 256, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.lock = Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(args: Dict[str, Any]) -> str:
+        return json.dumps(args, sort_keys=True, default=str)
+
+    def _tool_stats(self, tool: str) -> Dict[str, int]:
+        return self._stats.setdefault(tool, {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "invalidated": 0})
+
+    def generation(self, tool: str) -> int:
+        """Token to pass to put(); changes whenever the tool's entries are invalidated."""
+        with self.lock:
+            return self._generations.get(tool, 0)
+
+    def get(self, tool: str, args: Dict[str, Any]) -> Any:
+        """The cached result, or ToolResultCache.MISS."""
+        key = (tool, self.make_key(args))
+        with self.lock:
+            stats = self._tool_stats(tool)
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] <= self.clock():
+                del self._entries[key]
+                stats["expired"] += 1
+                entry = None
+            if entry is None:
+                stats["misses"] += 1
+                return _MISS
+            stats["hits"] += 1
+            return entry["result"]
+
+    def put(self, tool: str, args: Dict[str, Any], result: Any, ttl: float, generation: Optional[int] = None):
+        """Stores a result for `ttl` seconds, unless the tool was invalidated since `generation`."""
+        with self.lock:
+            if generation is not None and generation != self._generations.get(tool, 0):
+                return
+            if len(self._entries) >= self.max_entries:
+                now = self.clock()
+                for key in [k for k, e in self._entries.items() if e["expires_at"] <= now]:
+                    del self._entries[key]
+                if len(self._entries) >= self.max_entries:
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k]["expires_at"])]
+            self._entries[(tool, self.make_key(args))] = {"args": args, "result": result,
+                                                          "expires_at": self.clock() + ttl}
+            self._tool_stats(tool)["stores"] += 1
+
+    def invalidate(self, tool: str, match: Optional[Dict[str, Any]] = None) -> int:
+        """Drops the tool's entries whose args include every item of `match` (all if None)."""
+        with self.lock:
+            self._generations[tool] = self._generations.get(tool, 0) + 1
+            keys = [k for k, e in self._entries.items()
+                    if k[0] == tool and all(e["args"].get(name) == value for name, value in (match or {}).items())]
+            for key in keys:
+                del self._entries[key]
+            self._tool_stats(tool)["invalidated"] += len(keys)
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached {tool} result(s) matching {match}")
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            tools = {}
+            for tool, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                tools[tool] = dict(stats, hit_rate=round(stats["hits"] / lookups, 3) if lookups else 0.0)
+            return {"entries": len(self._entries), "tools": tools}
@@ -1,11 +1,56 @@
 import abc
+import datetime
+import os
+import re
+import time
 import logging
 import inspect
-from typing import Any, Dict, List, Optional, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock, Thread
+from typing import Any, Dict, List, Optional, Callable, Tuple, Type
+
+from core.deadline import Deadline
+from core.tool_cache import ToolResultCache
 
 logger = logging.getLogger("tool_registry")
 
+TOOL_WORKERS = int(os.environ.get("CLAWBRAIN_TOOL_WORKERS", 4))
+
+# Results of tools with a cache_ttl are shared by every default registry in the
+# process; disable with CLAWBRAIN_TOOL_CACHE=0.
+TOOL_CACHE_ENABLED = os.environ.get("CLAWBRAIN_TOOL_CACHE", "1").lower() not in ("0", "false", "no")
+tool_result_cache = ToolResultCache()
+
+# Fans out execute_tools batches; each worker waits on one call (see _start_call)
+_batch_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool-batch")
+
+
+def _start_call(name: str, fn: Callable[..., Any], kwargs: Dict[str, Any]) -> Future:
+    """
+    Runs fn(**kwargs) on its own daemon thread, for calls that have a timeout: a
+    hung tool (subprocess, network) can then be abandoned without holding a slot
+    that later calls need, and it does not keep the process alive at exit.
+    """
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(fn(**kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    Thread(target=run, name=f"tool-{name}", daemon=True).start()
+    return future
+
+
 class BaseTool(abc.ABC):
+    # Seconds a call may run before the registry gives up on it (None = no limit
+    # beyond the caller's deadline)
+    timeout: Optional[float] = None
+    # Seconds a result may be served from the registry's cache (None = never cached)
+    cache_ttl: Optional[float] = None
+
     @property
     @abc.abstractmethod
     def name(self) -> str:
@@ -20,60 +65,203 @@ class BaseTool(abc.ABC):
     def execute(self, **kwargs) -> Any:
         pass
 
+    def cache_args(self, **kwargs) -> Dict[str, Any]:
+        """The call's args as the result cache keys them: execute()'s defaults filled in."""
+        signature = inspect.signature(self.execute)
+        try:
+            bound = signature.bind(**kwargs)
+        except TypeError:
+            return dict(kwargs)
+        bound.apply_defaults()
+        args = {}
+        for name, value in bound.arguments.items():
+            if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+                args.update(value)
+            else:
+                args[name] = value
+        return args
+
+    def invalidates(self, **kwargs) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Cached results this call makes stale, as (tool name, cache args to match, or None for all)."""
+        return []
+
 class ToolRegistry:
-    def __init__(self):
+    def __init__(self, cache: Optional[ToolResultCache] = None):
         self._tools: Dict[str, BaseTool] = {}
+        # Registered by class, built on first use (see register_tool_class)
+        self._tool_classes: Dict[str, Type[BaseTool]] = {}
+        self._descriptions: Dict[str, str] = {}
+        self._build_lock = Lock()
+        self.build_seconds: Dict[str, float] = {}
+        self.cache = cache
 
     def register_tool(self, tool: BaseTool):
-        if tool.name in self._tools:
+        if tool.name in self._descriptions:
             logger.warning(f"Tool {tool.name} already registered. Overwriting.")
+        self._tool_classes.pop(tool.name, None)
         self._tools[tool.name] = tool
+        self._descriptions[tool.name] = tool.description
         logger.info(f"Registered tool: {tool.name}")
 
+    def register_tool_class(self, tool_class: Type[BaseTool]):
+        """
+        Registers a tool without constructing it; it is built (once, thread-safely) the
+        first time it is executed. The class must define name and description as class
+        attributes, so the tool can be listed to the model before it exists.
+        """
+        name = tool_class.name
+        if name in self._descriptions:
+            logger.warning(f"Tool {name} already registered. Overwriting.")
+        self._tools.pop(name, None)
+        self._tool_classes[name] = tool_class
+        self._descriptions[name] = tool_class.description
+
     def get_tool(self, name: str) -> Optional[BaseTool]:
-        return self._tools.get(name)
+        tool = self._tools.get(name)
+        if tool is None and name in self._tool_classes:
+            with self._build_lock:
+                tool = self._tools.get(name)
+                if tool is None:
+                    start = time.perf_counter()
+                    tool = self._tool_classes[name]()
+                    self.build_seconds[name] = time.perf_counter() - start
+                    self._tools[name] = tool
+                    logger.info(f"Built tool {name} in {self.build_seconds[name] * 1000:.1f}ms")
+        return tool
 
     def list_tools(self) -> List[Dict[str, str]]:
-        return [{"name": t.name, "description": t.description} for t in self._tools.values()]
+        return [{"name": name, "description": description} for name, description in self._descriptions.items()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "registered": list(self._descriptions),
+            "built": {name: round(seconds, 4) for name, seconds in self.build_seconds.items()},
+        }
     
-    def execute_tool(self, name: str, **kwargs) -> Any:
+    def execute_tool(self, name: str, deadline: Optional[Deadline] = None, **kwargs) -> Any:
+        """
+        Runs a tool. Gives up (returning an error string) after the tool's timeout or
+        once the deadline runs out, whichever comes first. Tools with a cache_ttl are
+        answered from the registry's cache (if any) while a result for the same args is
+        fresh; errors are never cached.
+        """
         tool = self.get_tool(name)
         if not tool:
             return f"Error: Tool '{name}' not found."
+        cache = self.cache if tool.cache_ttl else None
+        if cache is not None:
+            args = tool.cache_args(**kwargs)
+            cached = cache.get(name, args)
+            if cached is not ToolResultCache.MISS:
+                logger.info(f"Tool {name}: cached result")
+                return cached
+            generation = cache.generation(name)
+
+        result = self._run(tool, deadline, kwargs)
+
+        if cache is not None and not (isinstance(result, str) and result.startswith(("Error", "Failed"))):
+            cache.put(name, args, result, tool.cache_ttl, generation)
+        if self.cache is not None:
+            for target, match in tool.invalidates(**kwargs):
+                self.cache.invalidate(target, match)
+        return result
+
+    def _run(self, tool: BaseTool, deadline: Optional[Deadline], kwargs: Dict[str, Any]) -> Any:
+        name = tool.name
+        remaining = deadline.remaining() if deadline is not None else None
+        timeout = min((t for t in (tool.timeout, remaining) if t is not None), default=None)
         try:
-            return tool.execute(**kwargs)
+            if timeout is None:
+                return tool.execute(**kwargs)
+            if timeout <= 0:
+                return f"Error: Tool '{name}' not run, request deadline exceeded."
+            future = _start_call(name, tool.execute, kwargs)
+            try:
+                return future.result(timeout=timeout)
+            except TimeoutError:
+                if future.done():
+                    raise
+                limit = "request deadline" if timeout == remaining else "tool timeout"
+                logger.warning(f"Tool {name} did not finish within the {limit} ({timeout:.1f}s)")
+                return f"Error: Tool '{name}' timed out after {timeout:.1f}s ({limit})."
         except Exception as e:
             logger.error(f"Error executing tool {name}: {e}")
             return f"Error executing tool {name}: {e}"
 
+    def _timed_execute(self, name: str, args: Dict[str, Any], deadline: Optional[Deadline]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = self.execute_tool(name, deadline=deadline, **args)
+        return {"tool": name, "args": args, "result": result, "seconds": time.perf_counter() - start}
+
+    def execute_tools(self, calls: List[Tuple[str, Dict[str, Any]]],
+                      deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """
+        Runs several (name, args) tool calls concurrently, each like execute_tool (its own
+        timeout, the shared deadline). Returns {"tool", "args", "result", "seconds"} per
+        call, in call order whatever order they finish in.
+        """
+        start = time.perf_counter()
+        if len(calls) == 1:
+            results = [self._timed_execute(calls[0][0], calls[0][1], deadline)]
+        else:
+            futures = [_batch_executor.submit(self._timed_execute, name, args, deadline) for name, args in calls]
+            results = [future.result() for future in futures]
+        wall = time.perf_counter() - start
+        logger.info(f"Ran {len(calls)} tool call(s) in {wall:.2f}s "
+                    f"(sum of tool times {sum(r['seconds'] for r in results):.2f}s)")
+        return results
+
 # --- Concrete Tools ---
 
 class CalendarTool(BaseTool):
+    name = "get_calendar_events"
+    description = ("Fetches calendar events for the rest of the day or tomorrow. "
+                   "Args: day (optional: today, tomorrow or YYYY-MM-DD)")
+    timeout = 20.0  # Google Calendar API round trips
+    cache_ttl = 60.0  # short: events added elsewhere show up within a minute
+
     def __init__(self):
         # Lazy import to avoid circular dependencies or top-level failures
         try:
             import calendar_sync
+            if not calendar_sync.CALENDAR_LIBS_AVAILABLE:
+                raise ImportError("Google client libraries not installed")
             self._calendar_module = calendar_sync
         except ImportError:
             self._calendar_module = None
             logger.warning("calendar_sync module not found.")
 
-    @property
-    def name(self) -> str:
-        return "get_calendar_events"
+    @staticmethod
+    def resolve_day(day: Optional[str]) -> Optional[datetime.date]:
+        """'today', 'tomorrow' or an ISO date -> date; None for the default window."""
+        if not day:
+            return None
+        day = str(day).strip().lower()
+        today = datetime.date.today()
+        if day == "today":
+            return today
+        if day == "tomorrow":
+            return today + datetime.timedelta(days=1)
+        return datetime.date.fromisoformat(day)
 
-    @property
-    def description(self) -> str:
-        return "Fetches calendar events for the rest of the day or tomorrow. No arguments needed."
+    def cache_args(self, **kwargs) -> Dict[str, Any]:
+        # Keyed on the resolved date, and the default window on today's date, so an
+        # answer cached before midnight never serves a request after it
+        try:
+            day = self.resolve_day(kwargs.get("day"))
+        except ValueError:
+            return dict(kwargs)
+        return {"day": day.isoformat() if day else None, "on": datetime.date.today().isoformat()}
 
-    def execute(self, **kwargs) -> str:
+    def execute(self, day: Optional[str] = None, **kwargs) -> str:
         if not self._calendar_module:
             return "Error: Calendar module not available."
         
         try:
             # Reusing the existing logic from calendar_sync.py
             # get_busy_slots returns a list of dicts with 'start', 'end', 'summary'
-            slots = self._calendar_module.get_busy_slots()
+            day = self.resolve_day(day)
+            slots = self._calendar_module.get_busy_slots(day) if day else self._calendar_module.get_busy_slots()
             if not slots:
                 return "No upcoming events found."
             
@@ -89,13 +277,9 @@ class CalendarTool(BaseTool):
             return f"Failed to fetch calendar: {str(e)}"
 
 class FileSystemTool(BaseTool):
-    @property
-    def name(self) -> str:
-        return "read_file"
-
-    @property
-    def description(self) -> str:
-        return "Reads the content of a file. Args: filepath"
+    name = "read_file"
+    description = "Reads the content of a file. Args: filepath"
+    timeout = 5.0
 
     def execute(self, filepath: str, **kwargs) -> str:
         try:
@@ -106,14 +290,23 @@ class FileSystemTool(BaseTool):
 
 # --- Wacli Tools ---
 
+def _whatsapp_chat(to: Any) -> str:
+    """Chat as wacli resolves it: '1 555-0100', '15550100' and '15550100@c.us' are one chat."""
+    chat = str(to).strip().lower()
+    if chat.endswith("@c.us"):
+        chat = chat[:-len("@c.us")]
+    if "@" not in chat:
+        chat = re.sub(r"[\s\-().+]", "", chat)
+    return chat
+
 class WhatsAppSendTool(BaseTool):
-    @property
-    def name(self) -> str:
-        return "send_whatsapp"
+    name = "send_whatsapp"
+    description = "Sends a WhatsApp message. Args: to (phone number), message (content)"
+    timeout = 30.0  # wacli spawns a Node process
 
-    @property
-    def description(self) -> str:
-        return "Sends a WhatsApp message. Args: to (phone number), message (content)"
+    def invalidates(self, to: str = "", **kwargs) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        # Our own message must show up in the next read of that chat
+        return [("read_whatsapp", {"to": _whatsapp_chat(to)})]
 
     def execute(self, to: str, message: str, **kwargs) -> str:
         try:
@@ -125,13 +318,21 @@ class WhatsAppSendTool(BaseTool):
             return f"Error sending message: {e}"
 
 class WhatsAppReadTool(BaseTool):
-    @property
-    def name(self) -> str:
-        return "read_whatsapp"
+    name = "read_whatsapp"
+    description = "Reads WhatsApp chat history. Args: to (phone number), limit (optional int, default 5)"
+    timeout = 30.0
+    cache_ttl = 10.0  # short: incoming messages aren't seen until it expires
 
-    @property
-    def description(self) -> str:
-        return "Reads WhatsApp chat history. Args: to (phone number), limit (optional int, default 5)"
+    def cache_args(self, **kwargs) -> Dict[str, Any]:
+        # Keyed on (chat, limit)
+        args = super().cache_args(**kwargs)
+        if "to" in args:
+            args["to"] = _whatsapp_chat(args["to"])
+        try:
+            args["limit"] = int(args["limit"])
+        except (KeyError, TypeError, ValueError):
+            pass
+        return args
 
     def execute(self, to: str, limit: int = 5, **kwargs) -> str:
         try:
@@ -142,14 +343,14 @@ class WhatsAppReadTool(BaseTool):
         except Exception as e:
             return f"Error reading history: {e}"
 
-# Helper to initialize default registry
+# Helper to initialize default registry (tools are built on first use)
 def create_default_registry() -> ToolRegistry:
-    registry = ToolRegistry()
-    registry.register_tool(CalendarTool())
-    registry.register_tool(FileSystemTool())
+    registry = ToolRegistry(cache=tool_result_cache if TOOL_CACHE_ENABLED else None)
+    registry.register_tool_class(CalendarTool)
+    registry.register_tool_class(FileSystemTool)
     
     # Register Wacli Tools
-    registry.register_tool(WhatsAppSendTool())
-    registry.register_tool(WhatsAppReadTool())
+    registry.register_tool_class(WhatsAppSendTool)
+    registry.register_tool_class(WhatsAppReadTool)
     
     return registry
@@ -1,11 +1,28 @@
 import sqlite3
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from threading import Lock
 
 logger = logging.getLogger("traffic_logger")
 
+# Metric columns added after the original schema: name -> column definition.
+# Missing columns are added on startup; log_traffic accepts them as keyword arguments.
+METRIC_COLUMNS = {
+    "cost_saved": "REAL DEFAULT 0.0",
+    "cache_similarity": "REAL",
+    "ttft": "REAL",  # time to first token (streaming calls only)
+    "hedged": "INTEGER DEFAULT 0",  # attempt ran alongside a hedge (both sides are flagged)
+    "route_reason": "TEXT",  # why the adaptive router picked this model
+    "context_profile": "TEXT",
+    "context_tokens_saved": "INTEGER DEFAULT 0",  # brain context tokens trimmed by the profile
+    "cache_read_tokens": "INTEGER DEFAULT 0",  # provider prompt-cache reads (part of tokens_in)
+    "cache_write_tokens": "INTEGER DEFAULT 0",  # provider prompt-cache writes (part of tokens_in)
+    "tier": "TEXT",  # capability tier the request was routed to
+    "rate_limit_wait": "REAL DEFAULT 0.0",  # seconds queued for a rate-limit slot / 429 backoff (not in latency)
+    "agent_step": "INTEGER",  # AgentLoop step of the call (tokens_in is that step's prompt size)
+}
+
 class TrafficLogger:
     def __init__(self, db_path="traffic.db"):
         self.db_path = db_path
@@ -42,23 +59,42 @@ class TrafficLogger:
                     # Column likely missing, add it
                     logger.info("Migrating traffic table: adding 'channel' column")
                     cursor.execute('ALTER TABLE traffic ADD COLUMN channel TEXT DEFAULT "unknown"')
+
+                cursor.execute('PRAGMA table_info(traffic)')
+                existing = {row[1] for row in cursor.fetchall()}
+                for column, definition in METRIC_COLUMNS.items():
+                    if column not in existing:
+                        logger.info(f"Migrating traffic table: adding '{column}' column")
+                        cursor.execute(f'ALTER TABLE traffic ADD COLUMN {column} {definition}')
                     
                 conn.commit()
                 conn.close()
         except Exception as e:
             logger.error(f"Failed to initialize traffic database: {e}")
 
-    def log_traffic(self, prompt, response, provider, model, latency, status="success", tokens_in=0, tokens_out=0, cost=0.0, channel="unknown"):
-        """Logs a traffic event to the database."""
+    def log_traffic(self, prompt, response, provider, model, latency, status="success", tokens_in=0, tokens_out=0, cost=0.0, channel="unknown", **metrics):
+        """
+        Logs a traffic event to the database.
+        Extra keyword arguments are stored in the matching METRIC_COLUMNS column.
+        """
         try:
             timestamp = datetime.now().isoformat()
+            columns = ["timestamp", "prompt", "response", "provider", "model", "latency", "status", "tokens_in", "tokens_out", "cost", "channel"]
+            values = [timestamp, prompt, response, provider, model, latency, status, tokens_in, tokens_out, cost, channel]
+            for name, value in metrics.items():
+                if name not in METRIC_COLUMNS:
+                    logger.warning(f"Ignoring unknown traffic metric '{name}'")
+                    continue
+                columns.append(name)
+                values.append(value)
+
             with self.lock:
                 conn = sqlite3.connect(self.db_path)
                 cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO traffic (timestamp, prompt, response, provider, model, latency, status, tokens_in, tokens_out, cost, channel)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (timestamp, prompt, response, provider, model, latency, status, tokens_in, tokens_out, cost, channel))
+                cursor.execute(f'''
+                    INSERT INTO traffic ({", ".join(columns)})
+                    VALUES ({", ".join("?" for _ in columns)})
+                ''', values)
                 conn.commit()
                 conn.close()
         except Exception as e:
@@ -81,6 +117,86 @@ class TrafficLogger:
             logger.error(f"Failed to retrieve traffic logs: {e}")
             return []
 
+    def get_latency_percentile(self, provider, model=None, percentile=0.9, window=200, min_samples=20):
+        """
+        Returns the given latency percentile (seconds) over the last `window` successful,
+        non-streaming calls to a provider (and model), or None with fewer than `min_samples`.
+        """
+        try:
+            query = "SELECT latency FROM traffic WHERE provider = ? AND status = 'success' AND ttft IS NULL"
+            params = [provider]
+            if model:
+                query += " AND model = ?"
+                params.append(model)
+            query += " ORDER BY id DESC LIMIT ?"
+            params.append(window)
+
+            with self.lock:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                latencies = sorted(row[0] for row in cursor.fetchall() if row[0] is not None)
+                conn.close()
+
+            if len(latencies) < min_samples:
+                return None
+            index = min(len(latencies) - 1, int(round(percentile * (len(latencies) - 1))))
+            return latencies[index]
+        except Exception as e:
+            logger.error(f"Failed to compute latency percentile: {e}")
+            return None
+
+    def get_recent_outcomes(self, minutes=15, limit=1000):
+        """
+        Returns provider call outcomes from the last N minutes, oldest first, as dicts
+        with provider, model, status, latency, cost, ttft and timestamp (cache hits excluded).
+        """
+        try:
+            since = (datetime.now() - timedelta(minutes=minutes)).isoformat()
+            with self.lock:
+                conn = sqlite3.connect(self.db_path)
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM (
+                        SELECT id, provider, model, status, latency, cost, ttft, timestamp
+                        FROM traffic
+                        WHERE timestamp >= ? AND provider != 'cache'
+                        ORDER BY id DESC LIMIT ?
+                    ) ORDER BY id ASC
+                ''', (since, limit))
+                rows = cursor.fetchall()
+                conn.close()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to retrieve recent outcomes: {e}")
+            return []
+
+    def get_prompt_outcomes(self, limit=50000):
+        """
+        Returns the latest N logged provider calls, oldest first, as dicts with prompt,
+        status, provider, model, tier and context_profile (training data for the tier classifier).
+        """
+        try:
+            with self.lock:
+                conn = sqlite3.connect(self.db_path)
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM (
+                        SELECT id, prompt, status, provider, model, tier, context_profile
+                        FROM traffic
+                        WHERE provider != 'cache' AND prompt IS NOT NULL AND prompt != ''
+                        ORDER BY id DESC LIMIT ?
+                    ) ORDER BY id ASC
+                ''', (limit,))
+                rows = cursor.fetchall()
+                conn.close()
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to retrieve prompt outcomes: {e}")
+            return []
+
     def get_stats(self, days=7):
         """Retrieves aggregated statistics for the last N days."""
         try:
@@ -120,13 +236,76 @@ class TrafficLogger:
                 ''')
                 daily_stats = [dict(row) for row in cursor.fetchall()]
 
+                # Response cache savings
+                cursor.execute('''
+                    SELECT COUNT(*) as hits, COALESCE(SUM(cost_saved), 0) as cost_saved
+                    FROM traffic
+                    WHERE provider = 'cache'
+                ''')
+                cache_savings = dict(cursor.fetchone())
+
+                # Streaming time-to-first-token per provider
+                cursor.execute('''
+                    SELECT provider, COUNT(ttft) as streams, AVG(ttft) as avg_ttft, AVG(latency) as avg_latency
+                    FROM traffic
+                    WHERE ttft IS NOT NULL
+                    GROUP BY provider
+                ''')
+                ttft_stats = [dict(row) for row in cursor.fetchall()]
+
+                # Prompt tokens trimmed by context profiles, per profile
+                cursor.execute('''
+                    SELECT context_profile, COUNT(*) as requests, COALESCE(SUM(context_tokens_saved), 0) as tokens_saved
+                    FROM traffic
+                    WHERE context_profile IS NOT NULL AND status = 'success'
+                    GROUP BY context_profile
+                ''')
+                context_savings = [dict(row) for row in cursor.fetchall()]
+
+                # Provider prompt caching per provider
+                cursor.execute('''
+                    SELECT provider, COALESCE(SUM(tokens_in), 0) as tokens_in,
+                           COALESCE(SUM(cache_read_tokens), 0) as cache_read_tokens,
+                           COALESCE(SUM(cache_write_tokens), 0) as cache_write_tokens
+                    FROM traffic
+                    WHERE status = 'success' AND provider != 'cache'
+                    GROUP BY provider
+                ''')
+                prompt_cache = [dict(row) for row in cursor.fetchall()]
+
+                # Hedged requests: extra spend on losing attempts vs. requests won by a hedge
+                cursor.execute('''
+                    SELECT COUNT(*) as attempts,
+                           COALESCE(SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END), 0) as wins,
+                           COALESCE(SUM(CASE WHEN status = 'hedge_lost' THEN cost ELSE 0 END), 0) as extra_cost,
+                           AVG(CASE WHEN status = 'success' THEN latency END) as avg_win_latency
+                    FROM traffic
+                    WHERE hedged = 1
+                ''')
+                hedging = dict(cursor.fetchone())
+
+                # Prompts answered by the intent fast path (tool call without AgentLoop), per intent
+                cursor.execute('''
+                    SELECT model as intent, COUNT(*) as requests, AVG(latency) as avg_latency
+                    FROM traffic
+                    WHERE provider = 'fast_path'
+                    GROUP BY model
+                ''')
+                fast_path = [dict(row) for row in cursor.fetchall()]
+
                 conn.close()
                 
                 return {
                     "total_requests": total_requests,
                     "provider_distribution": provider_stats,
                     "cost_distribution": cost_stats,
-                    "daily_requests": daily_stats
+                    "daily_requests": daily_stats,
+                    "cache_savings": cache_savings,
+                    "ttft": ttft_stats,
+                    "hedging": hedging,
+                    "context_savings": context_savings,
+                    "prompt_cache": prompt_cache,
+                    "fast_path": fast_path
                 }
         except Exception as e:
             logger.error(f"Failed to retrieve traffic stats: {e}")
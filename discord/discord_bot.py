@@ -19,6 +19,8 @@ load_dotenv(env_path)
 
 DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 OPENCLAW_API_URL = os.getenv("OPENCLAW_API_URL", "http://localhost:8001/api/chat")
+# Time budget for the brain; the HTTP timeout leaves it a little slack to answer
+OPENCLAW_TIMEOUT = float(os.getenv("OPENCLAW_TIMEOUT", 60))
 # Optional: Restrict to specific channels (comma separated)
 ALLOWED_CHANNELS = os.getenv("DISCORD_ALLOWED_CHANNELS", "")
 
@@ -68,6 +70,8 @@ async def on_message(message):
             # Prepare payload for OpenClaw
             payload = {
                 "message": message.content,
+                "channel": "discord",
+                "timeout": OPENCLAW_TIMEOUT,
                 "context": {
                     "source": "discord",
                     "channel": message.channel.name,
@@ -79,7 +83,7 @@ async def on_message(message):
             loop = asyncio.get_event_loop()
             response = await loop.run_in_executor(
                 None, 
-                lambda: requests.post(OPENCLAW_API_URL, json=payload)
+                lambda: requests.post(OPENCLAW_API_URL, json=payload, timeout=OPENCLAW_TIMEOUT + 5)
             )
             
             if response.status_code == 200:
@@ -1,9 +1,31 @@
 import os
+import json
+import asyncio
 import logging
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from enum import Enum
 from dotenv import load_dotenv
 
+from core.adaptive_router import AdaptiveRouter
+from core.agent_history import ASSISTANT, USER, AgentHistory
+from core.agent_services import AgentServices
+from core.brain_context import BrainContextCache, split_system_instruction
+from core.circuit_breaker import CircuitBreaker
+from core.client_pool import ProviderClientRegistry
+from core.deadline import Deadline
+from core.prompt_cache import GeminiPromptCache
+from core.rate_limiter import (RateLimited, RateLimiter, RateLimitExceeded, backoff_delay, parse_retry_after,
+                               rate_limit_info)
+from core.request_timing import timed
+from core.intent_router import IntentRouter
+from core.keyword_engine import KeywordEngine
+from core.lazy_import import LazyModule, module_available
+from core.context_profiles import ContextProfile
+from core.response_cache import ResponseCache
+from core.single_flight import SingleFlight
+
 # Load environment variables
 load_dotenv()
 
@@ -35,6 +57,45 @@ class CapabilityTier(Enum):
     VISUALS = "visuals"        # Image generation → Imagen
     VOICE = "voice"            # Audio responses → OpenAI Audio
 
+# --- Keyword Tables ---
+# Tier and agent keywords, matched in one pass per prompt (see core/keyword_engine.py).
+# Groups can be replaced from a JSON file: CLAWBRAIN_KEYWORDS_FILE=/path/keywords.json
+
+def _load_keyword_engine():
+    path = os.environ.get("CLAWBRAIN_KEYWORDS_FILE")
+    if path:
+        try:
+            return KeywordEngine.from_file(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load keyword tables from {path}, using defaults: {e}")
+    return KeywordEngine()
+
+keyword_engine = _load_keyword_engine()
+
+# --- Learned Tier Classifier (optional) ---
+# Trained offline with `clawbrain train --labels FILE` (hand labels plus escalations in traffic.db).
+# If the model file exists, classify_tier asks it first and falls back to the keyword
+# rules below CLAWBRAIN_TIER_THRESHOLD confidence. Disable with CLAWBRAIN_TIER_CLASSIFIER=0.
+
+TIER_CLASSIFIER_PATH = os.environ.get("CLAWBRAIN_TIER_MODEL",
+                                      os.path.join(os.path.dirname(__file__), "tier_classifier.npz"))
+TIER_CLASSIFIER_THRESHOLD = float(os.environ.get("CLAWBRAIN_TIER_THRESHOLD", 0.9))
+TIER_CLASSIFIER_ENABLED = os.environ.get("CLAWBRAIN_TIER_CLASSIFIER", "1").lower() not in ("0", "false", "no")
+
+def _load_tier_classifier():
+    if not TIER_CLASSIFIER_ENABLED or not os.path.exists(TIER_CLASSIFIER_PATH):
+        return None
+    try:
+        from core.tier_classifier import TierClassifier  # numpy: only paid for when a model is installed
+        model = TierClassifier.load(TIER_CLASSIFIER_PATH)
+        logger.info(f"Loaded tier classifier from {TIER_CLASSIFIER_PATH} ({', '.join(model.labels)})")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load tier classifier from {TIER_CLASSIFIER_PATH}, using keyword rules: {e}")
+        return None
+
+tier_classifier = _load_tier_classifier()
+
 def classify_tier(prompt, context=None):
     """
     Classify message into capability tier for specialized routing.
@@ -46,35 +107,41 @@ def classify_tier(prompt, context=None):
     Returns:
         CapabilityTier
     """
-    prompt_lower = prompt.lower()
     context = context or {}
     
     # UTILITY: Background/automated tasks
     if context.get("is_automated") or context.get("is_heartbeat"):
         return CapabilityTier.UTILITY
+
+    # Learned classifier first; the keyword rules decide when it is unsure
+    if tier_classifier is not None:
+        label, confidence = tier_classifier.predict(prompt)
+        if label is not None and confidence >= TIER_CLASSIFIER_THRESHOLD:
+            try:
+                return CapabilityTier(label)
+            except ValueError:
+                logger.warning(f"Tier classifier predicted unknown tier {label!r}")
+
+    matched = keyword_engine.scan(prompt)
     
     # UTILITY: Very short check-ins
-    if len(prompt) < 15 and any(w in prompt_lower for w in ["hi", "hey", "ping", "status", "hello"]):
+    if len(prompt) < 15 and "greeting" in matched:
         return CapabilityTier.UTILITY
     
     # VISUALS: Image generation requests
-    visual_indicators = ["create image", "generate photo", "realistic photo", "draw", "make an image"]
-    if any(ind in prompt_lower for ind in visual_indicators):
+    if "visuals" in matched:
         return CapabilityTier.VISUALS
     
     # CODING: Software engineering
-    coding_indicators = ["debug", "code", "implement", "refactor", "fix bug", "git", "deploy", "api", "function", "class"]
-    if any(ind in prompt_lower for ind in coding_indicators):
+    if "coding" in matched:
         return CapabilityTier.CODING
     
     # APEX: Complex reasoning (longer, analytical queries)
-    apex_indicators = ["analyze", "compare", "strategy", "evaluate options", "research", "investigate"]
-    if any(ind in prompt_lower for ind in apex_indicators) and len(prompt) > 100:
+    if "apex" in matched and len(prompt) > 100:
         return CapabilityTier.APEX
     
     # BRAIN: Agentic/tool usage (calendar, files, multimodal)
-    brain_indicators = ["calendar", "schedule", "appointment", "file", "folder", "photo", "image", "video", "busy", "free"]
-    if any(ind in prompt_lower for ind in brain_indicators):
+    if "brain" in matched:
         return CapabilityTier.BRAIN
     
     # PERSONA: Default conversational tier
@@ -97,191 +164,258 @@ COST_RATES = {
 }
 
 # --- Provider Availability Checks ---
-try:
-    from google import genai
-    from google.genai import types
-    GEMINI_LIB_AVAILABLE = True
-except ImportError:
-    GEMINI_LIB_AVAILABLE = False
+# Only checks that the SDKs are installed; each one is imported on its first use
+# (they take seconds to import, which every CLI command and worker start would pay).
+genai = LazyModule("google.genai")
+types = LazyModule("google.genai.types")
+anthropic = LazyModule("anthropic")
+requests = LazyModule("requests")  # used for OpenRouter
+
+GEMINI_LIB_AVAILABLE = module_available("google.genai")
+if not GEMINI_LIB_AVAILABLE:
     logger.warning("google-genai lib missing.")
 
-try:
-    import anthropic
-    ANTHROPIC_LIB_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_LIB_AVAILABLE = False
+ANTHROPIC_LIB_AVAILABLE = module_available("anthropic")
+if not ANTHROPIC_LIB_AVAILABLE:
     logger.warning("anthropic lib missing.")
 
-# Check for requests (used for OpenRouter)
-try:
-    import requests
-    REQUESTS_LIB_AVAILABLE = True
-except ImportError:
-    REQUESTS_LIB_AVAILABLE = False
+REQUESTS_LIB_AVAILABLE = module_available("requests")
+if not REQUESTS_LIB_AVAILABLE:
     logger.warning("requests lib missing.")
 
 
+# --- Pooled Provider Clients ---
+# One long-lived client per (provider, api key) keeps TLS connections alive between messages.
+
+# Base URLs, overridable to run against a proxy or the local mock providers
+# (python -m core.mock_provider). CLAWBRAIN_MOCK_PROVIDER_URL points all three at
+# one mock server and stands in for missing API keys; the per-provider
+# CLAWBRAIN_*_BASE_URL settings take precedence over it.
+MOCK_PROVIDER_URL = os.environ.get("CLAWBRAIN_MOCK_PROVIDER_URL", "").rstrip("/")
+MOCK_API_KEY = "mock-key"
+
+PROVIDER_BASE_URLS = {
+    "openrouter": (os.environ.get("CLAWBRAIN_OPENROUTER_BASE_URL")
+                   or (f"{MOCK_PROVIDER_URL}/api/v1" if MOCK_PROVIDER_URL else "https://openrouter.ai/api/v1")),
+    # None = the SDK's default endpoint
+    "gemini": os.environ.get("CLAWBRAIN_GEMINI_BASE_URL") or MOCK_PROVIDER_URL or None,
+    "claude": os.environ.get("CLAWBRAIN_ANTHROPIC_BASE_URL") or MOCK_PROVIDER_URL or None,
+}
+
+OPENROUTER_URL = f"{PROVIDER_BASE_URLS['openrouter'].rstrip('/')}/chat/completions"
+
+# Maps .env key names to the provider whose clients depend on them
+PROVIDER_KEY_NAMES = {
+    "GEMINI_API_KEY": "gemini",
+    "ANTHROPIC_API_KEY": "claude",
+    "OPENROUTER_API_KEY": "openrouter",
+}
+
+client_registry = ProviderClientRegistry()
+
+def _make_openrouter_session(api_key, registry):
+    """requests.Session with a bounded keep-alive pool (OpenRouter is plain HTTPS)."""
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=registry.max_connections,
+        max_retries=0
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _httpx_limits(registry):
+    import httpx
+    return httpx.Limits(
+        max_connections=registry.max_connections,
+        max_keepalive_connections=registry.max_keepalive_connections,
+        keepalive_expiry=registry.keepalive_expiry
+    )
+
+def _make_gemini_client(api_key, registry, base_url=None):
+    # The same client serves sync calls and (via client.aio) async calls
+    http_options = types.HttpOptions(
+        base_url=base_url or PROVIDER_BASE_URLS["gemini"],
+        client_args={"limits": _httpx_limits(registry)},
+        async_client_args={"limits": _httpx_limits(registry)}
+    )
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+def _make_claude_client(api_key, registry, base_url=None):
+    http_client = anthropic.DefaultHttpxClient(limits=_httpx_limits(registry))
+    # 429s are retried by _call_with_rate_limit (shared backoff, deadline-aware); other errors fall back
+    return anthropic.Anthropic(api_key=api_key, base_url=base_url or PROVIDER_BASE_URLS["claude"],
+                               http_client=http_client, max_retries=0)
+
+# Async clients (one per event loop, see ProviderClientRegistry.get_async)
+
+def _make_openrouter_async_client(api_key, registry):
+    import httpx
+    # No client-wide timeout; each request passes its own (see _attempt_config)
+    return httpx.AsyncClient(limits=_httpx_limits(registry), timeout=None)
+
+def _make_claude_async_client(api_key, registry, base_url=None):
+    http_client = anthropic.DefaultAsyncHttpxClient(limits=_httpx_limits(registry))
+    return anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url or PROVIDER_BASE_URLS["claude"],
+                                    http_client=http_client, max_retries=0)
+
+if REQUESTS_LIB_AVAILABLE:
+    client_registry.register_factory("openrouter", _make_openrouter_session)
+    client_registry.register_factory("openrouter_async", _make_openrouter_async_client)
+if GEMINI_LIB_AVAILABLE:
+    client_registry.register_factory("gemini", _make_gemini_client)
+    client_registry.register_factory("gemini_async", _make_gemini_client)
+if ANTHROPIC_LIB_AVAILABLE:
+    client_registry.register_factory("claude", _make_claude_client)
+    client_registry.register_factory("claude_async", _make_claude_async_client)
+
+def refresh_provider_clients(key_name=None):
+    """Drops pooled clients after an API key change (all providers if key_name is None)."""
+    if key_name is None:
+        client_registry.refresh()
+    elif key_name in PROVIDER_KEY_NAMES:
+        provider = PROVIDER_KEY_NAMES[key_name]
+        client_registry.refresh(provider)
+        client_registry.refresh(f"{provider}_async")
+
+
 def get_api_key(name):
     key = os.environ.get(name)
     if not key or key.strip() == "":
-        return None
+        # The mock providers accept any key
+        return MOCK_API_KEY if MOCK_PROVIDER_URL else None
     return key
 
 
 # --- Context Loading ---
 
+BRAIN_DIR = os.path.join(os.path.dirname(__file__), "brain")
+
+# Process-wide cache: files are only re-read when their mtime/size changes
+brain_context_cache = BrainContextCache(BRAIN_DIR)
+
 def load_brain_context():
-    """Reads and combines the brain markdown files."""
-    brain_dir = os.path.join(os.path.dirname(__file__), "brain")
-    
-    # Priority order for context
-    # SOUL -> USER -> IDENTITY -> AGENTS -> daily_schedule -> memory
-    files_to_read = [
-        "SOUL.md",
-        "USER.md",
-        "IDENTITY.md",
-        "AGENTS.md",
-        "daily_schedule.md"
-    ]
-    
-    context_parts = []
-    
-    for filename in files_to_read:
-        filepath = os.path.join(brain_dir, filename)
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    if content:
-                        context_parts.append(f"\n\n--- {filename} ---\n{content}")
-            except Exception as e:
-                logger.error(f"Failed to read brain file {filename}: {e}")
+    """Returns the combined brain markdown files (cached, reloaded on change)."""
+    return brain_context_cache.get_context()
 
-    # Load today's memory if available
-    import datetime
-    today_str = datetime.date.today().strftime("%Y-%m-%d")
-    memory_file = os.path.join(brain_dir, "memory", f"{today_str}.md")
-    
-    if os.path.exists(memory_file):
-         try:
-            with open(memory_file, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if content:
-                    context_parts.append(f"\n\n--- memory/{today_str}.md ---\n{content}")
-         except Exception as e:
-            logger.error(f"Failed to read daily memory: {e}")
-            
-    return "\n".join(context_parts)
+# --- Model Routing ---
+
+# OpenRouter Free Models (Good for simple tasks)
+OPENROUTER_FREE_CONFIG = {
+    "model": "openrouter/free", # Recommended for guaranteed free access
+    "site_url": "https://openclaw.ai", 
+    "app_name": "OpenClaw"
+}
+
+# Model Configs
+# Using stable, proven models that exist in Gemini v1beta API
+GEMINI_FLASH_CONFIG = {"model": "gemini-2.0-flash-001"}  # Stable flash model
+GEMINI_PRO_CONFIG = {"model": "gemini-1.5-pro-002"}      # Stable pro model
+CLAUDE_OPUS_46_CONFIG = {"model": "claude-opus-4.6"}     # If credits available
 
-def generate_text(prompt, tier=None, complexity=None, system_instruction=None, context=None, channel="api"):
+# Model Configs by Tier
+TIER_MODELS = {
+    CapabilityTier.UTILITY: {
+        "provider": "openrouter",
+        "config": {"model": "openrouter/free", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
+    },
+    CapabilityTier.PERSONA: {
+        "provider": "gemini",
+        "config": {"model": "gemini-2.5-flash-lite"}
+    },
+    CapabilityTier.BRAIN: {
+        "provider": "openrouter",
+        "config": {"model": "openrouter/xai/grok-4.1", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
+    },
+    CapabilityTier.CODING: {
+        "provider": "openrouter",
+        "config": {"model": "openrouter/xai/grok-code-fast-1", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
+    },
+    CapabilityTier.APEX: {
+        "provider": "gemini",
+        "config": {"model": "gemini-1.5-pro-002"}
+    },
+}
+
+# --- Adaptive Routing ---
+# Candidate models per tier, TIER_MODELS' choice first (it is the default until there
+# is enough traffic to compare). Policies pick the objective and constraints per tier:
+# objective is "p95_latency", "cost" or "success_rate"; max_cost is USD per call.
+# Disable with CLAWBRAIN_ADAPTIVE_ROUTING=0.
+
+TIER_CANDIDATES = {
+    CapabilityTier.UTILITY: [
+        TIER_MODELS[CapabilityTier.UTILITY],
+        {"provider": "gemini", "config": {"model": "gemini-2.5-flash-lite"}},
+    ],
+    CapabilityTier.PERSONA: [
+        TIER_MODELS[CapabilityTier.PERSONA],
+        {"provider": "gemini", "config": GEMINI_FLASH_CONFIG},
+    ],
+    CapabilityTier.BRAIN: [
+        TIER_MODELS[CapabilityTier.BRAIN],
+        {"provider": "gemini", "config": GEMINI_FLASH_CONFIG},
+    ],
+    CapabilityTier.CODING: [TIER_MODELS[CapabilityTier.CODING]],
+    CapabilityTier.APEX: [TIER_MODELS[CapabilityTier.APEX]],
+}
+
+ROUTING_POLICIES = {
+    CapabilityTier.UTILITY: {"objective": "cost"},
+    CapabilityTier.PERSONA: {"objective": "p95_latency", "max_cost": 0.001},
+    CapabilityTier.BRAIN: {"objective": "p95_latency", "max_cost": 0.01},
+}
+
+ADAPTIVE_ROUTING_ENABLED = os.environ.get("CLAWBRAIN_ADAPTIVE_ROUTING", "1").lower() not in ("0", "false", "no")
+
+def _routing_outcomes():
+    """Non-streaming provider outcomes from the last day, for the adaptive router."""
+    if not TRAFFIC_LOGGING_AVAILABLE:
+        return []
+    return [row for row in traffic_logger.get_recent_outcomes(minutes=24 * 60, limit=5000)
+            if row["ttft"] is None and _outcome_ok(row["status"]) is not None]
+
+adaptive_router = AdaptiveRouter(
+    TIER_CANDIDATES,
+    _routing_outcomes,
+    policies=ROUTING_POLICIES,
+    exploration=float(os.environ.get("CLAWBRAIN_ROUTING_EXPLORATION", 0.05))
+)
+
+def resolve_tier(prompt, tier=None, complexity=None, context=None):
     """
-    Generate text using 7-tier capability router or legacy complexity routing.
-    
-    Args:
-        prompt: User message
-        tier: Optional CapabilityTier (auto-detected if None)
-        complexity: Legacy complexity parameter (deprecated, use tier instead)
-        system_instruction: Optional system override
-        context: Dict with metadata (is_automated, source, etc.)
-        channel: Source channel (api, whatsapp, discord)
+    Returns the explicit tier, or classifies the prompt (legacy HEARTBEAT maps to UTILITY).
+    A classified tier only picks cache TTLs, context profiles and output budgets; which
+    model answers is decided by the explicit tier alone (see PreparedRequest).
     """
-    gemini_key = get_api_key("GEMINI_API_KEY")
-    claude_key = get_api_key("ANTHROPIC_API_KEY")
-    openrouter_key = get_api_key("OPENROUTER_API_KEY")
+    if tier is not None:
+        return tier
+    if complexity == Complexity.HEARTBEAT:
+        return CapabilityTier.UTILITY
+    return classify_tier(prompt, context)
 
-    # --- Load & Inject Brain Context ---
-    brain_context = load_brain_context()
-    
-    # If a specific system instruction is provided (e.g. by a tool like generate_schedule), 
-    # we append the brain context to it (or prepend, depending on importance).
-    # Generally, the Persona (Brain) should be the base, and specific instructions add to it.
-    
-    final_system_instruction = brain_context
-    if system_instruction:
-        final_system_instruction = f"{brain_context}\n\n--- TASK INSTRUCTION ---\n{system_instruction}"
-        
-    # Override the local variable to be used in calls
-    # We will pass final_system_instruction instead of system_instruction to the providers
-    
-    # --- Tool Routing (Auto-Upgrade to AgentLoop) ---
-    # If the user asks about calendar, schedule, or files, try to use the AgentLoop automatically.
-    # This ensures "dumb" callers (like the legacy WhatsApp bot) get "smart" behavior.
-    
-    # Simple check for keywords
-    tool_keywords = ["calendar", "schedule", "appointment", "busy", "free", "project", "file"]
-    should_use_agent = any(keyword in prompt.lower() for keyword in tool_keywords)
-    
-    # NOTE: AgentLoop internally uses memory/tools which is "Agentic". 
-    # The brain files we just loaded are "Persona/Context". 
-    # We should ideally pass this brain context to the AgentLoop too, 
-    # but AgentLoop constructs its own system prompt. 
-    # For now, we will leave AgentLoop as is, or we would need to modify AgentLoop to accept extra context.
-    # Given the implementation of AgentLoop below, it constructs a prompt. 
-    # Let's Modify AgentLoop later if needed to respect this context. 
-    # For now, let's focus on non-agent text generation (the bulk of chat).
-
-    if should_use_agent and CORE_AVAILABLE and not system_instruction: 
-         # Only hijack if no specific system instruction (to avoid breaking specific workflows like generate_schedule)
-         try:
-             logger.info(f"Auto-upgrading prompt to AgentLoop: {prompt}")
-             agent = AgentLoop(prompt)
-             # Run for a few steps and return the result
-             result = agent.run(max_steps=3)
-             return result
-         except Exception as e:
-             logger.error(f"AgentLoop failed, falling back to simple text: {e}")
+def tier_primary_model(tier):
+    """The model TIER_MODELS assigns to a tier (what cache keys are based on)."""
+    tier_config = TIER_MODELS.get(tier)
+    return (tier_config["config"] if tier_config else GEMINI_FLASH_CONFIG).get("model", "default")
 
-    # Log incoming prompt length for debugging
-    logger.info(f"Incoming prompt length: {len(prompt)} chars")
+def build_provider_chain(tier, route=None):
+    """
+    Returns the provider fallback chain for a tier.
+    Format: [(name, api_key, lib_available, model_config), ...]
 
-    # --- Standard Text Generation ---
+    route: optional {"provider", "config"} replacing the tier's TIER_MODELS entry
+    (the adaptive router's pick); fallbacks are chosen the same way.
+    """
+    gemini_key = get_api_key("GEMINI_API_KEY")
+    openrouter_key = get_api_key("OPENROUTER_API_KEY")
 
-    # Define providers with fallbacks
-    # Format: (name, api_key, lib_available, model_config)
-    
     providers = []
-    
-    # OpenRouter Free Models (Good for simple tasks)
-    openrouter_free_config = {
-        "model": "openrouter/free", # Recommended for guaranteed free access
-        "site_url": "https://openclaw.ai", 
-        "app_name": "OpenClaw"
-    }
-    
-    # Model Configs
-    # Using stable, proven models that exist in Gemini v1beta API
-    gemini_flash_config = {"model": "gemini-2.0-flash-001"}  # Stable flash model
-    gemini_pro_config = {"model": "gemini-1.5-pro-002"}      # Stable pro model
-    claude_opus_46_config = {"model": "claude-opus-4.6"}     # If credits available
-
-
-
-    # Model Configs by Tier
-    tier_models = {
-        CapabilityTier.UTILITY: {
-            "provider": "openrouter",
-            "config": {"model": "openrouter/free", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
-        },
-        CapabilityTier.PERSONA: {
-            "provider": "gemini",
-            "config": {"model": "gemini-2.5-flash-lite"}
-        },
-        CapabilityTier.BRAIN: {
-            "provider": "openrouter",
-            "config": {"model": "openrouter/xai/grok-4.1", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
-        },
-        CapabilityTier.CODING: {
-            "provider": "openrouter",
-            "config": {"model": "openrouter/xai/grok-code-fast-1", "site_url": "https://openclaw.ai", "app_name": "OpenClaw"}
-        },
-        CapabilityTier.APEX: {
-            "provider": "gemini",
-            "config": {"model": "gemini-1.5-pro-002"}
-        },
-    }
-    
+
     # Get provider config for this tier
-    tier_config = tier_models.get(tier)
+    tier_config = route or TIER_MODELS.get(tier)
     if tier_config:
         provider_name = tier_config["provider"]
         model_config = tier_config["config"]
@@ -290,109 +424,1193 @@ def generate_text(prompt, tier=None, complexity=None, system_instruction=None, c
         if provider_name == "gemini":
             providers.append(("gemini", gemini_key, GEMINI_LIB_AVAILABLE, model_config))
             # Fallback to free if Gemini fails
-            providers.append(("openrouter", openrouter_key, REQUESTS_LIB_AVAILABLE, openrouter_free_config))
+            providers.append(("openrouter", openrouter_key, REQUESTS_LIB_AVAILABLE, OPENROUTER_FREE_CONFIG))
         elif provider_name == "openrouter":
             providers.append(("openrouter", openrouter_key, REQUESTS_LIB_AVAILABLE, model_config))
             # Fallback to Gemini Flash if OpenRouter fails
-            providers.append(("gemini", gemini_key, GEMINI_LIB_AVAILABLE, gemini_flash_config))
+            providers.append(("gemini", gemini_key, GEMINI_LIB_AVAILABLE, GEMINI_FLASH_CONFIG))
+    else:
+        # No (or unknown) tier, use default (PERSONA)
+        if tier is not None:
+            logger.warning(f"Unknown tier {tier}, using PERSONA default")
+        providers.append(("gemini", gemini_key, GEMINI_LIB_AVAILABLE, GEMINI_FLASH_CONFIG))
+        providers.append(("openrouter", openrouter_key, REQUESTS_LIB_AVAILABLE, OPENROUTER_FREE_CONFIG))
+
+    return providers
+
+# Prompt caching: (cache read, cache write) multipliers on the input rate
+CACHE_RATE_MULTIPLIERS = {
+    "claude": (0.10, 1.25),  # Anthropic: reads 10%, 5-minute cache writes 125%
+    "gemini": (0.25, 1.0),   # Gemini cached contents (storage billed separately, not included)
+    "default": (1.0, 1.0),
+}
+
+def estimate_cost(model_id, tokens_in, tokens_out, cache_read_tokens=0, cache_write_tokens=0):
+    """
+    Estimates request cost in USD from COST_RATES (first matching model fragment wins).
+    tokens_in are uncached input tokens; cached reads/writes use CACHE_RATE_MULTIPLIERS.
+    """
+    rates = COST_RATES.get("default")
+    
+    # specific matches
+    for k, v in COST_RATES.items():
+        if k in model_id:
+            rates = v
+            break
+
+    read_mult, write_mult = next((v for k, v in CACHE_RATE_MULTIPLIERS.items() if k in model_id),
+                                 CACHE_RATE_MULTIPLIERS["default"])
+    input_cost = (tokens_in + cache_read_tokens * read_mult + cache_write_tokens * write_mult) * rates[0]
+    return (input_cost + tokens_out * rates[1]) / 1_000_000
+
+def _usage_tokens(usage):
+    """Normalized (tokens_in, tokens_out, cache_read, cache_write) from a provider usage dict."""
+    return (
+        usage.get("prompt_tokens", 0) or 0,
+        usage.get("completion_tokens", 0) or 0,
+        usage.get("cache_read_tokens", 0) or 0,
+        usage.get("cache_write_tokens", 0) or 0,
+    )
+
+
+# --- Context Profiles ---
+# Which brain sections each tier gets, their token budget (sections are outlined or
+# truncated to fit) and the tier's reply length cap (see Output Budgets). Channel
+# overrides narrow the tier's profile further. Disable with CLAWBRAIN_CONTEXT_PROFILES=0
+# (full context everywhere; output budgets still apply).
+
+CONTEXT_PROFILES = {
+    CapabilityTier.UTILITY: ContextProfile("utility", ["IDENTITY.md", "SOUL.md"], token_budget=400, max_output_tokens=512),
+    CapabilityTier.PERSONA: ContextProfile("persona", ["SOUL.md", "IDENTITY.md", "USER.md", "memory"],
+                                           token_budget=2500, max_output_tokens=1024),
+    CapabilityTier.BRAIN: ContextProfile("brain", None, token_budget=6000, max_output_tokens=4096),
+    CapabilityTier.CODING: ContextProfile("coding", ["IDENTITY.md", "USER.md", "AGENTS.md"],
+                                          token_budget=2000, max_output_tokens=8192),
+    CapabilityTier.APEX: ContextProfile("apex", None, max_output_tokens=8192),
+    CapabilityTier.VISUALS: ContextProfile("visuals", ["SOUL.md", "IDENTITY.md"], token_budget=1000, max_output_tokens=1024),
+    CapabilityTier.VOICE: ContextProfile("voice", ["SOUL.md", "IDENTITY.md"], token_budget=1000, max_output_tokens=1024),
+}
+
+# Per channel: keyword overrides for ContextProfile.with_overrides
+CHANNEL_CONTEXT_OVERRIDES = {
+    "whatsapp": {"max_output_tokens": 800},   # phone-sized replies
+    "discord": {"max_output_tokens": 1500},   # Discord splits messages at 2000 chars
+    "cli": {},                                # own profile name, tier limits (see CHANNEL_OUTPUT_BUDGETS)
+}
+
+CONTEXT_PROFILES_ENABLED = os.environ.get("CLAWBRAIN_CONTEXT_PROFILES", "1").lower() not in ("0", "false", "no")
+
+def resolve_context_profile(tier, channel=None):
+    """Returns the ContextProfile for a tier/channel, or None for the full brain context."""
+    if not CONTEXT_PROFILES_ENABLED:
+        return None
+    profile = CONTEXT_PROFILES.get(tier)
+    overrides = CHANNEL_CONTEXT_OVERRIDES.get(channel)
+    if profile is not None and overrides is not None:
+        profile = profile.with_overrides(channel, **overrides)
+    return profile
+
+
+# --- Output Budgets ---
+# Max output tokens per reply: the tier's cap (CONTEXT_PROFILES), narrowed by the
+# channel's (CHANNEL_CONTEXT_OVERRIDES). Channels in CHANNEL_OUTPUT_BUDGETS set their
+# own cap instead; None lifts it (the CLI reads long answers in a terminal).
+# Override with CLAWBRAIN_MAX_OUTPUT_TOKENS_<TIER> / _<CHANNEL>, 0 = no cap.
+# Calls with a task instruction (generate_schedule, the agent) keep the provider default.
+
+CHANNEL_OUTPUT_BUDGETS = {
+    "cli": None,
+}
+
+for _tier in CapabilityTier:
+    _budget_override = os.environ.get(f"CLAWBRAIN_MAX_OUTPUT_TOKENS_{_tier.name}")
+    if _budget_override and _tier in CONTEXT_PROFILES:
+        try:
+            CONTEXT_PROFILES[_tier].max_output_tokens = int(_budget_override) or None
+        except ValueError:
+            logger.warning(f"Ignoring invalid CLAWBRAIN_MAX_OUTPUT_TOKENS_{_tier.name}={_budget_override}")
+
+for _channel in set(CHANNEL_CONTEXT_OVERRIDES) | set(CHANNEL_OUTPUT_BUDGETS):
+    _budget_override = os.environ.get(f"CLAWBRAIN_MAX_OUTPUT_TOKENS_{_channel.upper()}")
+    if _budget_override:
+        try:
+            CHANNEL_OUTPUT_BUDGETS[_channel] = int(_budget_override) or None
+        except ValueError:
+            logger.warning(f"Ignoring invalid CLAWBRAIN_MAX_OUTPUT_TOKENS_{_channel.upper()}={_budget_override}")
+
+def resolve_output_budget(tier, channel=None):
+    """Max output tokens for a reply on this tier/channel, or None for the provider default."""
+    if channel in CHANNEL_OUTPUT_BUDGETS:
+        return CHANNEL_OUTPUT_BUDGETS[channel]
+    profile = CONTEXT_PROFILES.get(tier)
+    budget = profile.max_output_tokens if profile else None
+    channel_budget = CHANNEL_CONTEXT_OVERRIDES.get(channel, {}).get("max_output_tokens")
+    if channel_budget is not None:
+        budget = channel_budget if budget is None else min(budget, channel_budget)
+    return budget
+
+
+# --- Response Cache ---
+# Exact-match cache keyed on (resolved model, system instruction, prompt).
+# TTLs are per tier in seconds; 0 disables caching for that tier.
+# Override with CLAWBRAIN_CACHE_TTL_<TIER>, e.g. CLAWBRAIN_CACHE_TTL_PERSONA=0
+
+RESPONSE_CACHE_TTLS = {
+    CapabilityTier.UTILITY: 600,   # heartbeats, status pings
+    CapabilityTier.PERSONA: 300,
+    CapabilityTier.BRAIN: 120,     # tool-adjacent answers go stale quickly
+    CapabilityTier.CODING: 900,
+    CapabilityTier.APEX: 900,
+    CapabilityTier.VISUALS: 0,
+    CapabilityTier.VOICE: 0,
+}
+
+for _tier in CapabilityTier:
+    _ttl_override = os.environ.get(f"CLAWBRAIN_CACHE_TTL_{_tier.name}")
+    if _ttl_override:
+        try:
+            RESPONSE_CACHE_TTLS[_tier] = int(_ttl_override)
+        except ValueError:
+            logger.warning(f"Ignoring invalid CLAWBRAIN_CACHE_TTL_{_tier.name}={_ttl_override}")
+
+response_cache = ResponseCache(db_path=os.environ.get(
+    "CLAWBRAIN_RESPONSE_CACHE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.db")))
+
+def _is_cacheable(content):
+    return bool(content) and not content.startswith("Error:")
+
+
+# --- Semantic Cache (optional) ---
+# Near-duplicate lookup over local hashed embeddings, consulted after an exact-cache miss.
+# Enable with CLAWBRAIN_SEMANTIC_CACHE=1 (requires numpy).
+
+# Minimum cosine similarity per tier; tiers not listed are never answered semantically
+SEMANTIC_CACHE_THRESHOLDS = {
+    CapabilityTier.UTILITY: 0.90,
+    CapabilityTier.PERSONA: 0.93,
+    CapabilityTier.BRAIN: 0.95,
+}
+
+# Tiers whose answers depend on live tool data (calendar, files). These are only
+# served semantically within their freshness window (seconds); no window means excluded.
+TOOL_DEPENDENT_TIERS = {CapabilityTier.BRAIN}
+SEMANTIC_CACHE_FRESHNESS = {
+    CapabilityTier.BRAIN: 60,
+}
+
+semantic_cache = None
+if os.environ.get("CLAWBRAIN_SEMANTIC_CACHE", "").lower() in ("1", "true", "yes"):
+    try:
+        from core.semantic_cache import SemanticCache
+        semantic_cache = SemanticCache(capacity=int(os.environ.get("CLAWBRAIN_SEMANTIC_CACHE_SIZE", 10000)))
+    except ImportError:
+        logger.warning("numpy missing, semantic cache disabled.")
+
+def _semantic_policy(tier):
+    """Returns (threshold, max_age) for a tier, or None if the tier is excluded."""
+    threshold = SEMANTIC_CACHE_THRESHOLDS.get(tier)
+    if semantic_cache is None or threshold is None:
+        return None
+    max_age = None
+    if tier in TOOL_DEPENDENT_TIERS:
+        max_age = SEMANTIC_CACHE_FRESHNESS.get(tier)
+        if not max_age:
+            return None
+    return threshold, max_age
+
+
+# --- Circuit Breaker ---
+# Rolling per (provider, model) health. Open circuits are skipped without waiting for
+# an error; healthy providers move to the front of the chain. Seeded from recent traffic.
+
+circuit_breaker = CircuitBreaker(
+    cooldown=float(os.environ.get("CLAWBRAIN_CIRCUIT_COOLDOWN", 30)),
+    failure_threshold=int(os.environ.get("CLAWBRAIN_CIRCUIT_FAILURES", 5))
+)
+
+def _outcome_ok(status):
+    """Maps a traffic status to a breaker outcome: True/False, or None if it says nothing about health."""
+    if status == "success":
+        return True
+    if status and status.startswith("error") and status != "error: cancelled":
+        return False
+    return None
+
+def _seed_circuit_breaker():
+    if not TRAFFIC_LOGGING_AVAILABLE:
+        return
+    outcomes = []
+    for row in traffic_logger.get_recent_outcomes(minutes=15):
+        ok = _outcome_ok(row["status"])
+        if ok is None:
+            continue
+        try:
+            timestamp = datetime.fromisoformat(row["timestamp"]).timestamp()
+        except (TypeError, ValueError):
+            continue
+        outcomes.append((row["provider"], row["model"], ok, row["latency"], timestamp))
+    if outcomes:
+        logger.info(f"Seeded circuit breaker with {circuit_breaker.seed(outcomes)} recent outcomes")
+
+_seed_circuit_breaker()
+
+
+# --- Hedged Requests (optional, per tier) ---
+# If the current provider hasn't answered within its observed p90 latency, the next
+# provider in the chain starts in parallel; the first success wins. At most one hedge
+# per request. Enable per tier with CLAWBRAIN_HEDGE_TIERS, e.g. CLAWBRAIN_HEDGE_TIERS=persona,brain
+
+HEDGED_TIERS = set()
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 20      # below this many logged calls, HEDGE_DEFAULT_DELAY is used
+HEDGE_DEFAULT_DELAY = 5.0   # seconds
+HEDGE_MIN_DELAY = 0.25      # never hedge sooner than this
+HEDGE_THRESHOLD_TTL = 60    # seconds before a provider's p90 is recomputed
+
+for _tier_name in filter(None, os.environ.get("CLAWBRAIN_HEDGE_TIERS", "").lower().split(",")):
+    try:
+        HEDGED_TIERS.add(CapabilityTier(_tier_name.strip()))
+    except ValueError:
+        logger.warning(f"Ignoring unknown tier in CLAWBRAIN_HEDGE_TIERS: {_tier_name}")
+
+_hedge_thresholds = {}  # (provider, model) -> (delay, computed_at)
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("CLAWBRAIN_HEDGE_WORKERS", 16)),
+                                     thread_name_prefix="hedge")
+
+def hedge_delay(name, config):
+    """Seconds to wait on a provider before hedging: its observed p90 latency from the traffic log."""
+    model = config.get("model")
+    now = time.time()
+    cached = _hedge_thresholds.get((name, model))
+    if cached and now - cached[1] < HEDGE_THRESHOLD_TTL:
+        return cached[0]
+
+    delay = None
+    if TRAFFIC_LOGGING_AVAILABLE:
+        delay = traffic_logger.get_latency_percentile(name, model, HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES)
+    delay = max(HEDGE_MIN_DELAY, delay if delay is not None else HEDGE_DEFAULT_DELAY)
+    _hedge_thresholds[(name, model)] = (delay, now)
+    return delay
+
+
+# --- Deadlines ---
+# Callers pass a Deadline (see core/deadline.py) down from the edge. Each provider
+# attempt gets the remaining budget as its timeout, capped at PROVIDER_TIMEOUTS; a
+# fallback or hedge only starts with at least MIN_ATTEMPT_BUDGET seconds left.
+# Attempts cut short or skipped for lack of budget are logged as DEADLINE_STATUS
+# and say nothing about provider health.
+
+PROVIDER_TIMEOUTS = {
+    "openrouter": float(os.environ.get("CLAWBRAIN_OPENROUTER_TIMEOUT", 60)),
+    "gemini": float(os.environ.get("CLAWBRAIN_GEMINI_TIMEOUT", 60)),
+    "claude": float(os.environ.get("CLAWBRAIN_CLAUDE_TIMEOUT", 90)),
+}
+MIN_ATTEMPT_BUDGET = 2.0     # seconds
+DEFAULT_REQUEST_TIMEOUT = float(os.environ.get("CLAWBRAIN_REQUEST_TIMEOUT", 120))  # used by the API and CLI
+DEADLINE_STATUS = "deadline_exceeded"
+
+def _attempt_config(name, config, deadline):
+    """Provider config for one attempt, with its timeout (seconds) derived from the deadline."""
+    timeout = deadline.timeout(PROVIDER_TIMEOUTS.get(name))
+    if timeout is None:
+        return config
+    return {**config, "timeout": timeout}
+
+def _deadline_allows(request, name, config, fallback, errors):
+    """
+    True if the request has budget for an attempt with `name`. The first attempt only
+    needs an unexpired deadline; fallbacks and hedges need MIN_ATTEMPT_BUDGET.
+    """
+    deadline = request.deadline
+    if not deadline.expired() and (not fallback or deadline.allows(MIN_ATTEMPT_BUDGET)):
+        return True
+    logger.warning(f"Not trying {name}: {deadline.remaining():.1f}s left of the {deadline.budget}s deadline")
+    errors.append(f"deadline of {deadline.budget}s exceeded before trying {name}")
+    _record_failure(request, name, config, "not attempted", status=DEADLINE_STATUS)
+    return False
+
+def _failure_status(request, error=None):
+    """
+    Traffic status override for a failed attempt: the deadline status if the budget
+    ran out, RATE_LIMITED_STATUS if it never got a rate-limit slot.
+    """
+    if request.deadline.expired():
+        return DEADLINE_STATUS
+    return RATE_LIMITED_STATUS if isinstance(error, RateLimitExceeded) else None
+
+
+# --- Rate Limits ---
+# Client-side request/token budgets per (provider, model, API key), so bursts queue
+# here instead of collecting 429s that also burn the fallback provider's quota.
+# Providers default to unlimited: accounts differ too much for a fixed guess, and
+# 429s are honoured either way. Set CLAWBRAIN_<PROVIDER>_RPM and
+# CLAWBRAIN_<PROVIDER>_TPM to your account's limits (0 = unlimited), or opt into the
+# providers' free/entry-tier limits with CLAWBRAIN_RATE_LIMITS_PRESET=free-tier
+# (explicit RPM/TPM settings still win). A call waits for its
+# slot only while the deadline keeps MIN_ATTEMPT_BUDGET for the call itself;
+# otherwise the provider is skipped as RATE_LIMITED_STATUS (not a health signal).
+# A 429 pauses the key for its Retry-After (or a jittered exponential backoff) and
+# the same provider is retried up to RATE_LIMIT_RETRIES times before falling back.
+# Time spent waiting is logged as `rate_limit_wait` and excluded from latency.
+# Disable with CLAWBRAIN_RATE_LIMITS=0.
+
+RATE_LIMITS_ENABLED = os.environ.get("CLAWBRAIN_RATE_LIMITS", "1").lower() not in ("0", "false", "no")
+PROVIDER_RATE_LIMITS = {
+    "openrouter": {"rpm": None, "tpm": None},
+    "gemini": {"rpm": None, "tpm": None},
+    "claude": {"rpm": None, "tpm": None},
+}
+MODEL_RATE_LIMITS = {
+    "openrouter/free": {"rpm": 20, "tpm": None},  # free models: 20 requests/min on every account
+}
+RATE_LIMIT_PRESETS = {
+    "free-tier": {
+        "gemini": {"rpm": 15, "tpm": 1_000_000},  # free tier, per model
+        "claude": {"rpm": 50, "tpm": 30_000},     # tier 1, per model class
+    },
+}
+RATE_LIMITS_PRESET = os.environ.get("CLAWBRAIN_RATE_LIMITS_PRESET", "").lower()
+RATE_LIMIT_RETRIES = int(os.environ.get("CLAWBRAIN_RATE_LIMIT_RETRIES", 2))
+RATE_LIMIT_BACKOFF_BASE = 0.5   # seconds, doubled per retry (full jitter)
+RATE_LIMIT_BACKOFF_CAP = 20.0   # seconds
+RATE_LIMITED_STATUS = "rate_limited"
+
+if RATE_LIMITS_PRESET:
+    if RATE_LIMITS_PRESET in RATE_LIMIT_PRESETS:
+        for _provider, _limits in RATE_LIMIT_PRESETS[RATE_LIMITS_PRESET].items():
+            PROVIDER_RATE_LIMITS[_provider].update(_limits)
     else:
-        # Unknown tier, use default (PERSONA)
-        logger.warning(f"Unknown tier {tier}, using PERSONA default")
-        providers.append(("gemini", gemini_key, GEMINI_LIB_AVAILABLE, {"model": "gemini-2.0-flash-001"}))
-        providers.append(("openrouter", openrouter_key, REQUESTS_LIB_AVAILABLE, openrouter_free_config))
+        logger.warning(f"Ignoring unknown CLAWBRAIN_RATE_LIMITS_PRESET={RATE_LIMITS_PRESET} "
+                       f"(known: {', '.join(RATE_LIMIT_PRESETS)})")
+
+for _provider, _limits in PROVIDER_RATE_LIMITS.items():
+    for _kind in ("rpm", "tpm"):
+        _value = os.environ.get(f"CLAWBRAIN_{_provider.upper()}_{_kind.upper()}")
+        if _value:
+            _limits[_kind] = float(_value) or None
+            # An explicit provider limit applies to all of its models
+            for _model_limits in MODEL_RATE_LIMITS.values():
+                _model_limits.pop(_kind, None)
+
+rate_limiter = RateLimiter(PROVIDER_RATE_LIMITS, MODEL_RATE_LIMITS)
+
+def _estimate_tokens(request):
+    """Rough prompt size (~4 chars per token) reserved against TPM before a call."""
+    history = sum(len(m["content"]) for m in request.history or [])
+    return (len(request.prompt) + len(request.final_system_instruction or "") + history) // 4
+
+def _rate_limit_slot(request, name, key, config):
+    """
+    Reserves a rate-limit slot for one call and returns the seconds to wait for it.
+    Raises RateLimitExceeded if the wait would not leave MIN_ATTEMPT_BUDGET.
+    """
+    if not RATE_LIMITS_ENABLED:
+        return 0.0
+    remaining = request.deadline.remaining()
+    max_wait = None if remaining is None else max(0.0, remaining - MIN_ATTEMPT_BUDGET)
+    return rate_limiter.reserve(name, config.get("model"), key, _estimate_tokens(request), max_wait)
+
+def _settle_rate_limit(request, name, key, config, usage):
+    if RATE_LIMITS_ENABLED:
+        t_in, t_out, cache_read, cache_write = _usage_tokens(usage)
+        used = t_in + t_out + cache_read + cache_write
+        if used:
+            rate_limiter.settle(name, config.get("model"), key, used - _estimate_tokens(request))
+
+def _rate_limit_backoff(request, name, key, config, error, retries):
+    """
+    After a failed call: if it was a 429, pauses the key for the backoff delay and
+    returns it when the same provider should be retried (retries left and the
+    deadline covers the wait plus MIN_ATTEMPT_BUDGET). None means fall back.
+    """
+    limited, retry_after = rate_limit_info(error)
+    if not limited or not RATE_LIMITS_ENABLED:
+        return None
+    delay = backoff_delay(retries, RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_CAP, retry_after)
+    rate_limiter.penalize(name, config.get("model"), key, delay)
+    if retries >= RATE_LIMIT_RETRIES or not request.deadline.allows(delay + MIN_ATTEMPT_BUDGET):
+        return None
+    logger.warning(f"{name} rate limited (429), retrying in {delay:.1f}s")
+    return delay
+
+def _call_with_rate_limit(request, name, key, config, waited):
+    """
+    _call_provider behind the rate limiter: waits for a slot, and on a 429 retries the
+    same provider once the key's pause is over. Adds the seconds spent waiting to
+    waited["rate_limit_wait"].
+    """
+    retries = 0
+    while True:
+        wait = _rate_limit_slot(request, name, key, config)
+        if wait:
+            time.sleep(wait)
+            waited["rate_limit_wait"] += wait
+        try:
+            content, usage = _call_provider(name, key, request.prompt, request.final_system_instruction,
+                                            _attempt_config(name, config, request.deadline))
+        except Exception as e:
+            if _rate_limit_backoff(request, name, key, config, e, retries) is None:
+                raise
+            retries += 1
+            continue
+        _settle_rate_limit(request, name, key, config, usage)
+        return content, usage
+
+async def _call_with_rate_limit_async(request, name, key, config, waited):
+    """Async _call_with_rate_limit; waiting for a slot doesn't block the event loop."""
+    retries = 0
+    while True:
+        wait = _rate_limit_slot(request, name, key, config)
+        if wait:
+            await asyncio.sleep(wait)
+            waited["rate_limit_wait"] += wait
+        try:
+            content, usage = await _call_provider_async(name, key, request.prompt, request.final_system_instruction,
+                                                        _attempt_config(name, config, request.deadline))
+        except Exception as e:
+            if _rate_limit_backoff(request, name, key, config, e, retries) is None:
+                raise
+            retries += 1
+            continue
+        _settle_rate_limit(request, name, key, config, usage)
+        return content, usage
+
+
+class PreparedRequest:
+    """Routing and cache state for one generation call, shared by the blocking and streaming paths."""
+
+    def __init__(self, prompt, tier=None, complexity=None, system_instruction=None, context=None,
+                 channel="api", bypass_cache=False, deadline=None, stop_sequences=None, messages=None):
+        self.prompt = prompt
+        self.channel = channel
+        self.deadline = Deadline.resolve(deadline)
+        # Earlier turns of a multi-turn conversation, sent before the prompt
+        self.history = list(messages) if messages else None
+        self.agent_step = (context or {}).get("agent_step")
+
+        with timed("classify"):
+            self.tier = resolve_tier(prompt, tier, complexity, context)
+        # Only an explicit tier changes the model; untiered calls keep the default chain
+        self.route_tier = tier
+
+        # --- Load & Inject Brain Context ---
+        # If a specific system instruction is provided (e.g. by a tool like generate_schedule), 
+        # we append it to the brain context. The Persona (Brain) is the base, and specific instructions add to it.
+        # Only the tier/channel profile's sections are included, compacted to its token budget.
+        # The assembled instruction is cached per (brain context version, profile, task instruction).
+        # Providers receive final_system_instruction, never the bare system_instruction.
+        with timed("context"):
+            self.context_profile = resolve_context_profile(self.tier, channel)
+            self.final_system_instruction, self.context_tokens_saved = brain_context_cache.get_profiled_instruction(
+                system_instruction, self.context_profile
+            )
+
+        self.route_reason = None
+        route = None
+        if ADAPTIVE_ROUTING_ENABLED and self.route_tier is not None:
+            decision = adaptive_router.choose(self.route_tier)
+            if decision is not None:
+                route = {"provider": decision.provider, "config": decision.config}
+                self.route_reason = f"{self.tier.value}: {decision.reason}"
+                logger.info(f"Routing decision: {self.route_reason}")
+        self.providers = circuit_breaker.order(build_provider_chain(self.route_tier, route))
+
+        # Reply length cap. Task instructions (generate_schedule, ...) define their own
+        # output format, so they keep the provider default.
+        self.max_output_tokens = None if system_instruction else resolve_output_budget(self.tier, channel)
+        self.stop_sequences = list(stop_sequences) if stop_sequences else None
+        limits = {}
+        if self.max_output_tokens:
+            limits["max_output_tokens"] = self.max_output_tokens
+        if self.stop_sequences:
+            limits["stop_sequences"] = self.stop_sequences
+        if self.history:
+            limits["history"] = self.history
+        if limits:
+            self.providers = [(name, key, lib_ok, {**config, **limits})
+                              for name, key, lib_ok, config in self.providers]
+        self.hedged = self.tier in HEDGED_TIERS
+
+        # Output caps and stop sequences change the reply, so they are part of the cache/flight keys
+        key_model = tier_primary_model(self.route_tier)
+        if self.max_output_tokens:
+            key_model = f"{key_model}|max_tokens={self.max_output_tokens}"
+        if self.stop_sequences:
+            key_model = f"{key_model}|stop={json.dumps(self.stop_sequences)}"
+
+        # Earlier turns are part of what is being answered
+        key_prompt = prompt
+        if self.history:
+            key_prompt = json.dumps(self.history + [{"role": "user", "content": prompt}])
+
+        # Identifies identical concurrent requests for single-flight coalescing
+        self.flight_key = ResponseCache.make_key(f"{self.tier.value}:{key_model}",
+                                                 self.final_system_instruction, key_prompt)
+
+        # --- Response Cache Keys ---
+        self.cache_ttl = 0 if bypass_cache else RESPONSE_CACHE_TTLS.get(self.tier, 0)
+        self.cache_key = None
+        self.primary_model = None
+        self.semantic_policy = None
+        self.semantic_namespace = None
+        if self.cache_ttl > 0 and self.providers:
+            # Keyed on the tier's primary model: that is what the caller asked for,
+            # even if the router, a fallback or a healthier provider ended up answering.
+            self.primary_model = tier_primary_model(self.route_tier)
+            self.cache_key = ResponseCache.make_key(key_model, self.final_system_instruction, key_prompt)
+
+            # Semantic entries are partitioned by (model, system instruction); a prompt
+            # that continues a conversation can't be matched on its own
+            self.semantic_policy = None if self.history else _semantic_policy(self.tier)
+            if self.semantic_policy:
+                self.semantic_namespace = ResponseCache.make_key(key_model, self.final_system_instruction, "")
+
+    def traffic_fields(self):
+        """Routing/context metrics recorded with every provider attempt for this request."""
+        return {
+            "tier": self.tier.value,
+            "route_reason": self.route_reason,
+            "context_profile": self.context_profile.name if self.context_profile else None,
+            "context_tokens_saved": self.context_tokens_saved,
+            "agent_step": self.agent_step,
+        }
+
+
+# Shares one provider call between identical concurrent generate_text calls (any thread).
+# A caller waits on another's flight for at most SINGLE_FLIGHT_MAX_WAIT seconds, and
+# never past the point where its own attempt would lack MIN_ATTEMPT_BUDGET; after
+# that it makes its own call.
+SINGLE_FLIGHT_MAX_WAIT = float(os.environ.get("CLAWBRAIN_SINGLE_FLIGHT_MAX_WAIT", 60))
+single_flight = SingleFlight()
 
+def _flight_wait(deadline):
+    """Seconds to wait on an identical in-flight call before making our own."""
+    remaining = deadline.remaining()
+    if remaining is None:
+        return SINGLE_FLIGHT_MAX_WAIT
+    return min(SINGLE_FLIGHT_MAX_WAIT, max(0.0, remaining - MIN_ATTEMPT_BUDGET))
+
+
+def _should_use_agent(prompt, system_instruction=None):
+    # --- Tool Routing (Auto-Upgrade to AgentLoop) ---
+    # If the user asks about calendar, schedule, or files, try to use the AgentLoop automatically.
+    # This ensures "dumb" callers (like the legacy WhatsApp bot) get "smart" behavior.
+    # Only hijack if no specific system instruction (to avoid breaking specific workflows like generate_schedule)
     
+    # Keyword check ("agent" group); the scan is shared with classify_tier
+    if not CORE_AVAILABLE or system_instruction:
+        return False
+    return keyword_engine.matches(prompt, "agent")
+
+def _run_agent(prompt, deadline=None):
+    """Runs the AgentLoop for a prompt. Returns None if the agent failed (caller falls back to plain text)."""
+    # NOTE: AgentLoop internally uses memory/tools which is "Agentic". 
+    # The brain files are "Persona/Context". 
+    # AgentLoop constructs its own system prompt and does not see the brain context yet.
+    try:
+        logger.info(f"Auto-upgrading prompt to AgentLoop: {prompt}")
+        agent = AgentLoop(prompt)
+        # Run for a few steps and return the result
+        return agent.run(max_steps=3, deadline=deadline)
+    except Exception as e:
+        logger.error(f"AgentLoop failed, falling back to simple text: {e}")
+        return None
+
+def _lookup_cache(request):
+    """Returns a cached response (exact, then semantic) and logs the hit, or None."""
+    if not request.cache_key:
+        return None
+
+    lookup_start = time.time()
+    with timed("cache"):
+        cached = response_cache.get(request.cache_key)
+        similarity = None
+        if cached is None and request.semantic_namespace:
+            cached = semantic_cache.lookup(request.semantic_namespace, request.prompt, *request.semantic_policy)
+            if cached is not None:
+                similarity = cached["similarity"]
+
+    if cached is None:
+        return None
+
+    tier_name = request.tier.value if request.tier else "unknown"
+    logger.info(f"Response cache hit ({tier_name} tier, similarity={similarity or 1.0:.3f})")
+    if TRAFFIC_LOGGING_AVAILABLE:
+        with timed("logging"):
+            traffic_logger.log_traffic(
+                prompt=request.prompt[:500],
+                response=cached["response"][:500],
+                provider="cache",
+                model=cached["model"] or request.primary_model,
+                latency=time.time() - lookup_start,
+                status="success",
+                cost=0,
+                channel=request.channel,
+                cost_saved=cached["cost"],
+                cache_similarity=similarity if similarity is not None else 1.0
+            )
+    return cached["response"]
+
+def _record_success(request, name, config, content, usage, latency, **metrics):
+    """Logs a successful provider attempt and stores the response in the caches."""
+    # usage keys are normalized by the provider calls; prompt_tokens excludes cached tokens
+    t_in, t_out, cache_read, cache_write = _usage_tokens(usage)
+    model_id = config.get("model", "default")
+    cost = estimate_cost(model_id, t_in, t_out, cache_read, cache_write)
+    circuit_breaker.record_success(name, model_id, latency)
+
+    # --- Traffic Logging ---
+    if TRAFFIC_LOGGING_AVAILABLE:
+        try:
+            with timed("logging"):
+                traffic_logger.log_traffic(
+                    prompt=request.prompt[:500], # Log truncated prompt
+                    response=content[:500] if content else "", # Log truncated response
+                    provider=name,
+                    model=model_id,
+                    latency=latency,
+                    status="success",
+                    tokens_in=t_in + cache_read + cache_write,
+                    tokens_out=t_out,
+                    cost=cost,
+                    cache_read_tokens=cache_read,
+                    cache_write_tokens=cache_write,
+                    channel=request.channel,
+                    **request.traffic_fields(),
+                    **metrics
+                )
+        except Exception as log_err:
+            logger.error(f"Traffic logging failed (non-blocking): {log_err}")
+
+    if request.cache_key and _is_cacheable(content):
+        with timed("cache"):
+            response_cache.set(request.cache_key, content, request.cache_ttl, model=model_id, cost=cost)
+            if request.semantic_namespace:
+                semantic_cache.add(request.semantic_namespace, request.prompt, content, request.cache_ttl, model=model_id, cost=cost)
+
+def _record_failure(request, name, config, error, latency=0, status=None, **metrics):
+    """Logs a failed provider attempt. `status` overrides the default "error: ..." status."""
+    status = status or f"error: {str(error)}"
+    if _outcome_ok(status) is False:
+        circuit_breaker.record_failure(name, config.get("model", "default"), latency)
+    if TRAFFIC_LOGGING_AVAILABLE:
+        with timed("logging"):
+            traffic_logger.log_traffic(
+                prompt=request.prompt[:500],
+                response="",
+                provider=name,
+                model=config.get("model", "unknown"),
+                latency=latency,
+                status=status,
+                cost=0,
+                channel=request.channel,
+                **request.traffic_fields(),
+                **metrics
+            )
+    logger.error(f"{name} failed: {error}")
+
+def _record_hedge_loser(request, attempt, usage=None):
+    """Logs the losing side of a hedge. Its cost (if it finished) is the price of the hedge."""
+    t_in, t_out, cache_read, cache_write = _usage_tokens(usage or {})
+    model_id = attempt["config"].get("model", "default")
+    if TRAFFIC_LOGGING_AVAILABLE:
+        traffic_logger.log_traffic(
+            prompt=request.prompt[:500],
+            response="",
+            provider=attempt["name"],
+            model=model_id,
+            latency=time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"],
+            status="hedge_lost",
+            tokens_in=t_in + cache_read + cache_write,
+            tokens_out=t_out,
+            cost=estimate_cost(model_id, t_in, t_out, cache_read, cache_write),
+            cache_read_tokens=cache_read,
+            cache_write_tokens=cache_write,
+            channel=request.channel,
+            **request.traffic_fields(),
+            **attempt["waited"],
+            hedged=1
+        )
+
+def _usable_providers(request):
+    return [(name, key, config) for name, key, lib_ok, config in request.providers if lib_ok and key]
+
+def _circuit_allows(name, config, errors):
+    if circuit_breaker.allow(name, config.get("model", "default")):
+        return True
+    logger.info(f"Skipping {name}: circuit open")
+    errors.append(f"{name}: circuit open")
+    return False
+
+def _pop_allowed(queue, errors):
+    """Pops the next (name, key, config) whose circuit allows a call, or None."""
+    while queue:
+        name, key, config = queue.pop(0)
+        if _circuit_allows(name, config, errors):
+            return name, key, config
+    return None
+
+def _call_provider(name, key, prompt, system_instruction, config):
+    if name == "gemini":
+        return _call_gemini(key, prompt, system_instruction, config)
+    elif name == "claude":
+        return _call_claude(key, prompt, system_instruction, config)
+    elif name == "openrouter":
+        return _call_openrouter(key, prompt, system_instruction, config)
+    raise ValueError(f"Unknown provider: {name}")
+
+async def _call_provider_async(name, key, prompt, system_instruction, config):
+    if name == "gemini":
+        return await _call_gemini_async(key, prompt, system_instruction, config)
+    elif name == "claude":
+        return await _call_claude_async(key, prompt, system_instruction, config)
+    elif name == "openrouter":
+        return await _call_openrouter_async(key, prompt, system_instruction, config)
+    raise ValueError(f"Unknown provider: {name}")
+
+def _stream_with_rate_limit(request, name, key, config, usage, waited):
+    """_stream_provider behind the rate limiter; a 429 before the first chunk is retried like _call_with_rate_limit."""
+    retries = 0
+    while True:
+        wait = _rate_limit_slot(request, name, key, config)
+        if wait:
+            time.sleep(wait)
+            waited["rate_limit_wait"] += wait
+        started = False
+        try:
+            for chunk in _stream_provider(name, key, request.prompt, request.final_system_instruction,
+                                          _attempt_config(name, config, request.deadline), usage):
+                started = started or bool(chunk)
+                yield chunk
+        except Exception as e:
+            if started or _rate_limit_backoff(request, name, key, config, e, retries) is None:
+                raise
+            retries += 1
+            continue
+        _settle_rate_limit(request, name, key, config, usage)
+        return
+
+def _stream_provider(name, key, prompt, system_instruction, config, usage):
+    if name == "gemini":
+        return _stream_gemini(key, prompt, system_instruction, config, usage)
+    elif name == "claude":
+        return _stream_claude(key, prompt, system_instruction, config, usage)
+    elif name == "openrouter":
+        return _stream_openrouter(key, prompt, system_instruction, config, usage)
+    raise ValueError(f"Unknown provider: {name}")
+
+
+def generate_text(prompt, tier=None, complexity=None, system_instruction=None, context=None, channel="api",
+                  bypass_cache=False, deadline=None, stop_sequences=None, messages=None):
+    """
+    Generate text using 7-tier capability router or legacy complexity routing.
+    
+    Args:
+        prompt: User message
+        tier: Optional CapabilityTier (auto-detected if None)
+        complexity: Legacy complexity parameter (deprecated, use tier instead)
+        system_instruction: Optional system override
+        context: Dict with metadata (is_automated, source, etc.)
+        channel: Source channel (api, whatsapp, discord)
+        bypass_cache: Skip the response cache for this call (no lookup, no store)
+        deadline: Optional Deadline for the whole call, including agent steps and
+            tools; provider timeouts and fallbacks are limited to what is left
+        stop_sequences: Optional strings that end generation (not included in the reply)
+        messages: Optional earlier turns ([{"role": "user"|"assistant", "content": ...}]),
+            sent before `prompt` through each provider's multi-turn API
+
+    Single calendar/WhatsApp lookups are answered by the intent fast path (see
+    _run_fast_path) before the AgentLoop upgrade is considered.
+    Reply length is capped per tier/channel (see resolve_output_budget).
+    Tiers in HEDGED_TIERS start the next provider in parallel once the current one
+    is slower than its p90 (see hedge_delay).
+    """
+    deadline = Deadline.resolve(deadline)
+    with timed("classify"):
+        fast_path = _match_fast_path(prompt, system_instruction)
+        use_agent = _should_use_agent(prompt, system_instruction)
+    if fast_path is not None:
+        result = _run_fast_path(prompt, fast_path, channel, deadline)
+        if result is not None:
+            return result
+    if use_agent:
+        result = _run_agent(prompt, deadline)
+        if result is not None:
+            return result
+
+    # Log incoming prompt length for debugging
+    logger.info(f"Incoming prompt length: {len(prompt)} chars")
+
+    # --- Standard Text Generation ---
+    request = PreparedRequest(prompt, tier, complexity, system_instruction, context, channel, bypass_cache,
+                              deadline, stop_sequences, messages)
+
+    cached = _lookup_cache(request)
+    if cached is not None:
+        return cached
+
+    # Identical requests already in flight (double sends, duplicate webhook events)
+    # wait for that call instead of making their own
+    # Time spent waiting on another caller's flight counts as provider time
+    with timed("provider"):
+        content, shared = single_flight.do(request.flight_key, lambda: _generate_uncached(request),
+                                           timeout=_flight_wait(request.deadline))
+    if shared:
+        logger.info(f"Coalesced with an identical in-flight request ({request.tier.value} tier)")
+    return content
+
+def _generate_uncached(request):
+    """Runs the provider chain for a prepared request (no cache lookup)."""
     errors = []
 
-    for name, key, lib_ok, config in providers:
+    if request.hedged:
+        content = _generate_hedged(request, errors)
+        if content is not None:
+            return content
+        return f"Brain Failure. All models failed. Errors: {'; '.join(errors)}"
+
+    attempted = False
+    for name, key, lib_ok, config in request.providers:
         if not lib_ok:
             # errors.append(f"{name}: lib missing") # don't clutter logs with missing libs unless critical
             continue
         if not key:
             # errors.append(f"{name}: key missing")
             continue
+        if not _circuit_allows(name, config, errors):
+            continue
+        if not _deadline_allows(request, name, config, attempted, errors):
+            break
+        attempted = True
             
         # Attempt generation
+        waited = {"rate_limit_wait": 0.0}
         try:
             logger.info(f"Attempting generation with {name}...")
             start_time = time.time()
-            content = None
-            usage = {}
-            
-            if name == "gemini":
-                content, usage = _call_gemini(key, prompt, final_system_instruction, config)
-            elif name == "claude":
-                content, usage = _call_claude(key, prompt, final_system_instruction, config)
-            elif name == "openrouter":
-                content, usage = _call_openrouter(key, prompt, final_system_instruction, config)
-            
-            end_time = time.time()
-            latency = end_time - start_time
-            
-            # --- Traffic Logging ---
-            if TRAFFIC_LOGGING_AVAILABLE:
-                try:
-                    # usage keys vary by provider, normalize them
-                    t_in = usage.get("prompt_tokens", 0)
-                    t_out = usage.get("completion_tokens", 0)
-                    
-                    # Estimate cost
-                    model_id = config.get("model", "default")
-                    rates = COST_RATES.get("default")
-                    
-                    # specific matches
-                    for k, v in COST_RATES.items():
-                        if k in model_id:
-                            rates = v
-                            break
-                            
-                    cost = (t_in * rates[0] + t_out * rates[1]) / 1_000_000
-                    
-                    traffic_logger.log_traffic(
-                        prompt=prompt[:500], # Log truncated prompt
-                        response=content[:500] if content else "", # Log truncated response
-                        provider=name,
-                        model=model_id,
-                        latency=latency,
-                        status="success",
-                        tokens_in=t_in,
-                        tokens_out=t_out,
-                        cost=cost,
-                        channel=channel
-                    )
-                except Exception as log_err:
-                    logger.error(f"Traffic logging failed (non-blocking): {log_err}")
+            content, usage = _call_with_rate_limit(request, name, key, config, waited)
+            latency = time.time() - start_time - waited["rate_limit_wait"]
 
+            _record_success(request, name, config, content, usage, latency, **waited)
             return content
                 
         except Exception as e:
-            # Log failure
-            if TRAFFIC_LOGGING_AVAILABLE:
-                traffic_logger.log_traffic(
-                    prompt=prompt[:500],
-                    response="",
-                    provider=name,
-                    model=config.get("model", "unknown"),
-                    latency=0,
-                    status=f"error: {str(e)}",
-                    cost=0,
-                    channel=channel
-                )
-
-            logger.error(f"{name} failed: {e}")
+            _record_failure(request, name, config, e, status=_failure_status(request, e), **waited)
             errors.append(f"{name} error: {str(e)}")
             continue # Try next provider
 
     return f"Brain Failure. All models failed. Errors: {'; '.join(errors)}"
 
 
-def _call_openrouter(api_key, prompt, system_instruction=None, config=None):
-    """Calls OpenRouter API."""
+def _generate_hedged(request, errors):
+    """
+    Runs the provider chain in order like generate_text, but when the attempt in flight
+    passes its hedge_delay the next provider is started alongside it. The first success
+    wins. Returns the content, or None if every provider failed (details in errors).
+
+    Blocking calls cannot be interrupted, so a losing attempt that already started runs
+    to completion in the background and is then logged as "hedge_lost" with its cost.
+    """
+    queue = _usable_providers(request)
+    pending = {}  # future -> attempt
+    hedge_used = False
+    attempted = False
+
+    def launch(hedged):
+        nonlocal attempted
+        provider = _pop_allowed(queue, errors)
+        if provider is None:
+            return False
+        name, key, config = provider
+        if not _deadline_allows(request, name, config, attempted, errors):
+            queue.clear()
+            return False
+        attempted = True
+        logger.info(f"Attempting generation with {name}{' (hedge)' if hedged else ''}...")
+        waited = {"rate_limit_wait": 0.0}
+        future = _hedge_executor.submit(_call_with_rate_limit, request, name, key, config, waited)
+        pending[future] = {"name": name, "config": config, "start": time.time(), "hedged": hedged,
+                           "waited": waited}
+        return True
+
+    while pending or queue:
+        if not pending and not launch(False):
+            break
+
+        timeout = None
+        if not hedge_used and queue and len(pending) == 1:
+            attempt = next(iter(pending.values()))
+            timeout = max(0.0, attempt["start"] + hedge_delay(attempt["name"], attempt["config"]) - time.time())
+
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Current attempt is in its tail: hedge with the next provider
+            hedge_used = True
+            if launch(True):
+                for attempt in pending.values():
+                    attempt["hedged"] = True
+            continue
+
+        for future in done:
+            attempt = pending.pop(future)
+            latency = time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"]
+            try:
+                content, usage = future.result()
+            except Exception as e:
+                _record_failure(request, attempt["name"], attempt["config"], e, latency=latency,
+                                status=_failure_status(request, e), hedged=int(attempt["hedged"]),
+                                **attempt["waited"])
+                errors.append(f"{attempt['name']} error: {str(e)}")
+                continue
+
+            _record_success(request, attempt["name"], attempt["config"], content, usage, latency,
+                            hedged=int(attempt["hedged"]), **attempt["waited"])
+            for loser_future, loser in pending.items():
+                if loser_future.cancel():
+                    _record_hedge_loser(request, loser)
+                else:
+                    loser_future.add_done_callback(lambda f, loser=loser: _settle_hedge_loser(request, loser, f))
+            return content
+
+    return None
+
+def _settle_hedge_loser(request, attempt, future):
+    try:
+        _, usage = future.result()
+    except Exception as e:
+        _record_failure(request, attempt["name"], attempt["config"], e,
+                        latency=time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"],
+                        status=_failure_status(request, e), hedged=1, **attempt["waited"])
+        return
+    _record_hedge_loser(request, attempt, usage)
+
+
+def generate_text_stream(prompt, tier=None, complexity=None, system_instruction=None, context=None, channel="api",
+                         bypass_cache=False, deadline=None, stop_sequences=None, messages=None):
+    """
+    Streaming version of generate_text: yields text chunks as the provider produces them.
+
+    Fallback to the next provider only happens if the current one fails before its
+    first token; after that the caller already has partial output, so the stream ends.
+    Time-to-first-token is recorded in the traffic log as `ttft`.
+    Cache hits, fast-path and AgentLoop results are yielded as a single chunk. The deadline bounds
+    the wait for each chunk rather than the whole stream.
+    """
+    deadline = Deadline.resolve(deadline)
+    fast_path = _match_fast_path(prompt, system_instruction)
+    if fast_path is not None:
+        result = _run_fast_path(prompt, fast_path, channel, deadline)
+        if result is not None:
+            yield result
+            return
+    if _should_use_agent(prompt, system_instruction):
+        # AgentLoop needs complete responses to parse tool calls; only its answer is streamed
+        result = _run_agent(prompt, deadline)
+        if result is not None:
+            yield result
+            return
+
+    logger.info(f"Incoming prompt length: {len(prompt)} chars (streaming)")
+
+    request = PreparedRequest(prompt, tier, complexity, system_instruction, context, channel, bypass_cache,
+                              deadline, stop_sequences, messages)
+
+    cached = _lookup_cache(request)
+    if cached is not None:
+        yield cached
+        return
+
+    errors = []
+    attempted = False
+
+    for name, key, lib_ok, config in request.providers:
+        if not lib_ok or not key:
+            continue
+        if not _circuit_allows(name, config, errors):
+            continue
+        if not _deadline_allows(request, name, config, attempted, errors):
+            break
+        attempted = True
+
+        logger.info(f"Attempting streaming generation with {name}...")
+        start_time = time.time()
+        ttft = None
+        usage = {}
+        chunks = []
+        waited = {"rate_limit_wait": 0.0}
+        try:
+            for chunk in _stream_with_rate_limit(request, name, key, config, usage, waited):
+                if not chunk:
+                    continue
+                if ttft is None:
+                    ttft = time.time() - start_time - waited["rate_limit_wait"]
+                chunks.append(chunk)
+                yield chunk
+            if ttft is None:
+                raise Exception("stream ended without content")
+        except Exception as e:
+            latency = time.time() - start_time - waited["rate_limit_wait"]
+            if ttft is None:
+                _record_failure(request, name, config, e, latency=latency,
+                                status=_failure_status(request, e), **waited)
+                errors.append(f"{name} error: {str(e)}")
+                continue # Nothing sent yet, try next provider
+
+            # Partial output already reached the caller; no fallback possible
+            _record_failure(request, name, config, e, latency=latency,
+                            status=_failure_status(request, e), ttft=ttft, **waited)
+            return
+
+        _record_success(request, name, config, "".join(chunks), usage,
+                        time.time() - start_time - waited["rate_limit_wait"], ttft=ttft, **waited)
+        return
+
+    yield f"Brain Failure. All models failed. Errors: {'; '.join(errors)}"
+
+
+async def generate_text_async(prompt, tier=None, complexity=None, system_instruction=None, context=None,
+                              channel="api", bypass_cache=False, timeout=None, deadline=None, stop_sequences=None,
+                              messages=None):
+    """
+    Async version of generate_text: same routing, caching and fallback, but provider
+    calls run on the event loop, so one loop can serve many conversations.
+
+    Args:
+        timeout: Optional overall deadline in seconds (shorthand for deadline=Deadline(timeout)).
+            Each provider attempt gets the remaining budget; once it is spent the
+            attempt in flight is cancelled and no further fallback is attempted.
+        deadline: Optional Deadline shared with the caller; takes precedence over timeout.
+
+    Cancelling the awaiting task cancels the in-flight provider request. Tiers in
+    HEDGED_TIERS hedge like generate_text; here the losing request is cancelled.
+    """
+    deadline = Deadline.resolve(deadline, timeout)
+
+    fast_path = _match_fast_path(prompt, system_instruction)
+    if fast_path is not None:
+        # The tool is synchronous; keep it off the event loop
+        result = await asyncio.to_thread(_run_fast_path, prompt, fast_path, channel, deadline)
+        if result is not None:
+            return result
+
+    if _should_use_agent(prompt, system_instruction):
+        # AgentLoop and its tools are synchronous; keep them off the event loop
+        result = await asyncio.to_thread(_run_agent, prompt, deadline)
+        if result is not None:
+            return result
+
+    logger.info(f"Incoming prompt length: {len(prompt)} chars (async)")
+
+    request = PreparedRequest(prompt, tier, complexity, system_instruction, context, channel, bypass_cache,
+                              deadline, stop_sequences, messages)
+
+    cached = _lookup_cache(request)
+    if cached is not None:
+        return cached
+
+    errors = []
+    queue = _usable_providers(request)
+    pending = {}  # task -> attempt
+    hedge_used = not request.hedged
+    attempted = False
+
+    def launch(hedged):
+        nonlocal attempted
+        provider = _pop_allowed(queue, errors)
+        if provider is None:
+            return False
+        name, key, config = provider
+        if not _deadline_allows(request, name, config, attempted, errors):
+            queue.clear()
+            return False
+        attempted = True
+        logger.info(f"Attempting async generation with {name}{' (hedge)' if hedged else ''}...")
+        waited = {"rate_limit_wait": 0.0}
+        task = asyncio.ensure_future(_call_with_rate_limit_async(request, name, key, config, waited))
+        pending[task] = {"name": name, "config": config, "start": time.time(), "hedged": hedged,
+                         "waited": waited}
+        return True
+
+    try:
+        while pending or queue:
+            if not pending and not launch(False):
+                break
+
+            remaining = deadline.remaining()
+            hedge_in = None
+            if not hedge_used and queue and len(pending) == 1:
+                attempt = next(iter(pending.values()))
+                hedge_in = max(0.0, attempt["start"] + hedge_delay(attempt["name"], attempt["config"]) - time.time())
+            waits = [t for t in (remaining, hedge_in) if t is not None]
+
+            done, _ = await asyncio.wait(pending, timeout=min(waits) if waits else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_in is not None and (remaining is None or hedge_in < remaining):
+                    # Current attempt is in its tail: hedge with the next provider
+                    hedge_used = True
+                    if launch(True):
+                        for attempt in pending.values():
+                            attempt["hedged"] = True
+                    continue
+
+                # Deadline reached: cancel whatever is still in flight
+                for task, attempt in pending.items():
+                    task.cancel()
+                    error = f"timed out after {time.time() - attempt['start']:.1f}s"
+                    _record_failure(request, attempt["name"], attempt["config"], error,
+                                    latency=time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"],
+                                    status=DEADLINE_STATUS, hedged=int(attempt["hedged"]), **attempt["waited"])
+                    errors.append(f"{attempt['name']} error: {error}")
+                pending.clear()
+                if queue:
+                    errors.append(f"deadline of {deadline.budget}s exceeded before trying {queue[0][0]}")
+                break
+
+            for task in done:
+                attempt = pending.pop(task)
+                latency = time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"]
+                try:
+                    content, usage = task.result()
+                except Exception as e:
+                    _record_failure(request, attempt["name"], attempt["config"], e, latency=latency,
+                                    status=_failure_status(request, e), hedged=int(attempt["hedged"]),
+                                    **attempt["waited"])
+                    errors.append(f"{attempt['name']} error: {str(e)}")
+                    continue # Try next provider
+
+                _record_success(request, attempt["name"], attempt["config"], content, usage, latency,
+                                hedged=int(attempt["hedged"]), **attempt["waited"])
+                for loser_task, loser in pending.items():
+                    if loser_task.done() and not loser_task.cancelled() and not loser_task.exception():
+                        _record_hedge_loser(request, loser, loser_task.result()[1])
+                    else:
+                        loser_task.cancel()
+                        _record_hedge_loser(request, loser)
+                pending.clear()
+                return content
+
+    except asyncio.CancelledError:
+        for task, attempt in pending.items():
+            task.cancel()
+            _record_failure(request, attempt["name"], attempt["config"], "cancelled",
+                            latency=time.time() - attempt["start"] - attempt["waited"]["rate_limit_wait"],
+                            hedged=int(attempt["hedged"]), **attempt["waited"])
+        raise
+
+    return f"Brain Failure. All models failed. Errors: {'; '.join(errors)}"
+
+
+# --- Provider Calls ---
+
+def _openrouter_request(api_key, prompt, system_instruction=None, config=None):
+    """Builds (headers, payload) for an OpenRouter chat completion."""
     model = config.get("model", "meta-llama/llama-3.3-70b-instruct:free")
     
     messages = []
     if system_instruction:
         messages.append({"role": "system", "content": system_instruction})
+    messages.extend(config.get("history") or [])
     messages.append({"role": "user", "content": prompt})
     
     headers = {
@@ -406,11 +1624,29 @@ def _call_openrouter(api_key, prompt, system_instruction=None, config=None):
         "model": model,
         "messages": messages
     }
+    if config.get("max_output_tokens"):
+        payload["max_tokens"] = config["max_output_tokens"]
+    if config.get("stop_sequences"):
+        payload["stop"] = config["stop_sequences"]
+    return headers, payload
+
+def _openrouter_error(response):
+    """Exception for a non-200 OpenRouter response; 429s carry their Retry-After."""
+    message = f"OpenRouter API Error: {response.status_code} - {response.text}"
+    if response.status_code == 429:
+        return RateLimited(message, parse_retry_after(response.headers.get("Retry-After")))
+    return Exception(message)
+
+def _call_openrouter(api_key, prompt, system_instruction=None, config=None):
+    """Calls OpenRouter API."""
+    headers, payload = _openrouter_request(api_key, prompt, system_instruction, config)
     
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
+    session = client_registry.get("openrouter", api_key)
+    response = session.post(
+        OPENROUTER_URL,
         headers=headers,
-        json=payload
+        json=payload,
+        timeout=config.get("timeout")
     )
     
     if response.status_code == 200:
@@ -422,14 +1658,68 @@ def _call_openrouter(api_key, prompt, system_instruction=None, config=None):
         else:
              raise Exception(f"OpenRouter returned empty choices: {data}")
     else:
-        raise Exception(f"OpenRouter API Error: {response.status_code} - {response.text}")
+        raise _openrouter_error(response)
 
+async def _call_openrouter_async(api_key, prompt, system_instruction=None, config=None):
+    """Async OpenRouter call over a pooled httpx.AsyncClient."""
+    headers, payload = _openrouter_request(api_key, prompt, system_instruction, config)
 
-def _call_gemini(api_key, prompt, system_instruction=None, config=None):
-    """Calls Gemini (using gemini-2.0-flash with search tool)."""
-    
-    client = genai.Client(api_key=api_key)
-    
+    client = client_registry.get_async("openrouter_async", api_key)
+    response = await client.post(OPENROUTER_URL, headers=headers, json=payload, timeout=config.get("timeout"))
+
+    if response.status_code == 200:
+        data = response.json()
+        if "choices" in data and len(data["choices"]) > 0:
+            return data["choices"][0]["message"]["content"], data.get("usage", {})
+        raise Exception(f"OpenRouter returned empty choices: {data}")
+    raise _openrouter_error(response)
+
+def _stream_openrouter(api_key, prompt, system_instruction=None, config=None, usage=None):
+    """Streams an OpenRouter completion (SSE). Fills `usage` from the final chunk."""
+    headers, payload = _openrouter_request(api_key, prompt, system_instruction, config)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+
+    session = client_registry.get("openrouter", api_key)
+    with session.post(OPENROUTER_URL, headers=headers, json=payload, stream=True,
+                      timeout=config.get("timeout")) as response:
+        if response.status_code != 200:
+            raise _openrouter_error(response)
+
+        # text/event-stream has no charset, requests would otherwise assume latin-1
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            # Skip blank separators and ": OPENROUTER PROCESSING" keep-alive comments
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise Exception(f"OpenRouter stream error: {chunk['error']}")
+            if chunk.get("usage") and usage is not None:
+                usage.update(chunk["usage"])
+            for choice in chunk.get("choices", []):
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+
+
+# --- Provider Prompt Caching ---
+# Gemini: the system instruction (brain context) lives in a cached content per brain
+# version; Claude: a cache_control breakpoint after the brain context.
+# Disable with CLAWBRAIN_PROMPT_CACHING=0.
+
+PROMPT_CACHING_ENABLED = os.environ.get("CLAWBRAIN_PROMPT_CACHING", "1").lower() not in ("0", "false", "no")
+gemini_prompt_cache = GeminiPromptCache(ttl=int(os.environ.get("CLAWBRAIN_GEMINI_CACHE_TTL", 3600)))
+
+def _gemini_request(system_instruction=None, config=None, client=None, api_key=None):
+    """
+    Returns (model_name, GenerateContentConfig) for a Gemini call.
+    With a client, a plain brain-context instruction is served from Gemini cached contents.
+    """
     # Using Gemini 2.0 Flash (Recommended for speed/tools)
     model_name = config.get("model", "gemini-2.0-flash")
     
@@ -441,66 +1731,303 @@ def _call_gemini(api_key, prompt, system_instruction=None, config=None):
     if "flash" in model_name:
          tools=[types.Tool(google_search=types.GoogleSearch())]
 
-    gen_config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
-        tools=tools,
-        response_modalities=["TEXT"]
-    )
+    # Cached contents must carry the system instruction and tools themselves, so
+    # only instructions without a per-call task part are cached
+    cached_content = None
+    if PROMPT_CACHING_ENABLED and client is not None and not split_system_instruction(system_instruction)[1]:
+        cached_content = gemini_prompt_cache.get(client, api_key, model_name, system_instruction, tools,
+                                                 version=brain_context_cache.version)
+
+    # Per-attempt timeout from the request deadline (HttpOptions takes milliseconds)
+    http_options = None
+    if config.get("timeout"):
+        http_options = types.HttpOptions(timeout=int(config["timeout"] * 1000))
+
+    if cached_content:
+        gen_config = types.GenerateContentConfig(
+            cached_content=cached_content,
+            response_modalities=["TEXT"],
+            max_output_tokens=config.get("max_output_tokens"),
+            stop_sequences=config.get("stop_sequences"),
+            http_options=http_options
+        )
+    else:
+        gen_config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            tools=tools,
+            response_modalities=["TEXT"],
+            max_output_tokens=config.get("max_output_tokens"),
+            stop_sequences=config.get("stop_sequences"),
+            http_options=http_options
+        )
+    return model_name, gen_config
+
+def _gemini_contents(prompt, config):
+    """The prompt, preceded by any earlier turns (Gemini calls the assistant "model")."""
+    history = config.get("history")
+    if not history:
+        return prompt
+    contents = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+                for m in history]
+    contents.append({"role": "user", "parts": [{"text": prompt}]})
+    return contents
+
+def _gemini_usage(usage_metadata):
+    # prompt_token_count includes the cached part
+    cached = usage_metadata.cached_content_token_count or 0
+    return {
+        "prompt_tokens": (usage_metadata.prompt_token_count or 0) - cached,
+        "completion_tokens": usage_metadata.candidates_token_count,
+        "cache_read_tokens": cached
+    }
+
+def _gemini_cache_miss(gen_config, error):
+    """True if a call failed because its cached content is gone (expired/deleted remotely)."""
+    if gen_config.cached_content and "cache" in str(error).lower():
+        gemini_prompt_cache.invalidate(gen_config.cached_content)
+        return True
+    return False
+
+def _call_gemini(api_key, prompt, system_instruction=None, config=None):
+    """Calls Gemini (using gemini-2.0-flash with search tool)."""
     
-    response = client.models.generate_content(
-        model=model_name,
-        contents=prompt,
-        config=gen_config
-    )
+    client = client_registry.get("gemini", api_key)
+    model_name, gen_config = _gemini_request(system_instruction, config, client, api_key)
+    
+    try:
+        response = client.models.generate_content(
+            model=model_name,
+            contents=_gemini_contents(prompt, config),
+            config=gen_config
+        )
+    except Exception as e:
+        if not _gemini_cache_miss(gen_config, e):
+            raise
+        # Cached content vanished; retry once with the instruction inline
+        model_name, gen_config = _gemini_request(system_instruction, config)
+        response = client.models.generate_content(model=model_name, contents=_gemini_contents(prompt, config),
+                                                  config=gen_config)
     
+    return _gemini_result(response)
+
+def _gemini_result(response):
     if response.candidates and response.candidates[0].content.parts:
          content = response.text
          # Extract usage if available
          usage = {}
          if response.usage_metadata:
-             usage = {
-                 "prompt_tokens": response.usage_metadata.prompt_token_count,
-                 "completion_tokens": response.usage_metadata.candidates_token_count
-             }
+             usage = _gemini_usage(response.usage_metadata)
          return content, usage
     return "Error: No content generated.", {}
 
+async def _call_gemini_async(api_key, prompt, system_instruction=None, config=None):
+    """Async Gemini call (client.aio)."""
+    client = client_registry.get_async("gemini_async", api_key)
+    # Creating/refreshing a cached content is a blocking call; keep it off the loop
+    model_name, gen_config = await asyncio.to_thread(_gemini_request, system_instruction, config, client, api_key)
+
+    try:
+        response = await client.aio.models.generate_content(
+            model=model_name,
+            contents=_gemini_contents(prompt, config),
+            config=gen_config
+        )
+    except Exception as e:
+        if not _gemini_cache_miss(gen_config, e):
+            raise
+        # Cached content vanished; retry once with the instruction inline
+        model_name, gen_config = _gemini_request(system_instruction, config)
+        response = await client.aio.models.generate_content(model=model_name, contents=_gemini_contents(prompt, config),
+                                                            config=gen_config)
+    return _gemini_result(response)
+
+def _stream_gemini(api_key, prompt, system_instruction=None, config=None, usage=None):
+    """Streams a Gemini completion. Fills `usage` from the last chunk's usage metadata."""
+    client = client_registry.get("gemini", api_key)
+    model_name, gen_config = _gemini_request(system_instruction, config, client, api_key)
+
+    for chunk in client.models.generate_content_stream(
+        model=model_name,
+        contents=_gemini_contents(prompt, config),
+        config=gen_config
+    ):
+        if chunk.usage_metadata and usage is not None:
+            usage.update(_gemini_usage(chunk.usage_metadata))
+        if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+            text = chunk.text
+            if text:
+                yield text
+
+def _claude_system(system_instruction):
+    """
+    System prompt blocks with a cache breakpoint after the brain context, so Anthropic
+    reuses the prefix across calls; a task instruction follows uncached.
+    """
+    if not system_instruction:
+        return ""
+    if not PROMPT_CACHING_ENABLED:
+        return system_instruction
+    context, task = split_system_instruction(system_instruction)
+    blocks = []
+    if context:
+        blocks.append({"type": "text", "text": context, "cache_control": {"type": "ephemeral"}})
+    if task:
+        blocks.append({"type": "text", "text": task})
+    return blocks
+
+def _claude_messages(prompt, config):
+    return list(config.get("history") or []) + [{"role": "user", "content": prompt}]
+
+def _claude_usage(usage):
+    # input_tokens excludes cache reads and writes
+    return {
+        "prompt_tokens": usage.input_tokens,
+        "completion_tokens": usage.output_tokens,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0
+    }
+
 def _call_claude(api_key, prompt, system_instruction=None, config=None):
     """Calls Claude 3.5 Sonnet / Opus."""
-    client = anthropic.Anthropic(api_key=api_key)
+    client = client_registry.get("claude", api_key)
     
-    messages = [{"role": "user", "content": prompt}]
+    messages = _claude_messages(prompt, config)
     
     # Using Claude 3 Opus (Fallback to known stable)
     model_name = config.get("model", "claude-3-opus-20240229")
     
     response = client.messages.create(
         model=model_name,
-        max_tokens=4096,
-        system=system_instruction if system_instruction else "",
-        messages=messages
+        max_tokens=config.get("max_output_tokens", 4096),
+        stop_sequences=config.get("stop_sequences") or anthropic.NOT_GIVEN,
+        system=_claude_system(system_instruction),
+        messages=messages,
+        timeout=config.get("timeout", anthropic.NOT_GIVEN)
     )
     
+    return _claude_result(response)
+
+def _claude_result(response):
     content = response.content[0].text
     usage = {}
     if response.usage:
-        usage = {
-            "prompt_tokens": response.usage.input_tokens,
-            "completion_tokens": response.usage.output_tokens
-        }
+        usage = _claude_usage(response.usage)
     
     return content, usage
 
+async def _call_claude_async(api_key, prompt, system_instruction=None, config=None):
+    """Async Claude call over a pooled AsyncAnthropic client."""
+    client = client_registry.get_async("claude_async", api_key)
+    model_name = config.get("model", "claude-3-opus-20240229")
+
+    response = await client.messages.create(
+        model=model_name,
+        max_tokens=config.get("max_output_tokens", 4096),
+        stop_sequences=config.get("stop_sequences") or anthropic.NOT_GIVEN,
+        system=_claude_system(system_instruction),
+        messages=_claude_messages(prompt, config),
+        timeout=config.get("timeout", anthropic.NOT_GIVEN)
+    )
+    return _claude_result(response)
+
+def _stream_claude(api_key, prompt, system_instruction=None, config=None, usage=None):
+    """Streams a Claude completion. Fills `usage` from the final message."""
+    client = client_registry.get("claude", api_key)
+    model_name = config.get("model", "claude-3-opus-20240229")
+
+    with client.messages.stream(
+        model=model_name,
+        max_tokens=config.get("max_output_tokens", 4096),
+        stop_sequences=config.get("stop_sequences") or anthropic.NOT_GIVEN,
+        system=_claude_system(system_instruction),
+        messages=_claude_messages(prompt, config),
+        timeout=config.get("timeout", anthropic.NOT_GIVEN)
+    ) as stream:
+        for text in stream.text_stream:
+            yield text
+        final = stream.get_final_message()
+        if final.usage and usage is not None:
+            usage.update(_claude_usage(final.usage))
+
 
 # --- Core Integration ---
 try:
     from core.memory_manager import MemoryManager
-    from core.tool_registry import ToolRegistry, create_default_registry
+    from core.tool_registry import ToolRegistry, create_default_registry, tool_result_cache
     CORE_AVAILABLE = True
 except ImportError:
     CORE_AVAILABLE = False
     logger.warning("Core modules (memory, tools) not found. Advanced agent features disabled.")
 
+# One MemoryManager and tool registry for every AgentLoop in the process, built on
+# first use (the API warms them at startup); tools are built on first execution.
+agent_services = AgentServices(MemoryManager, create_default_registry) if CORE_AVAILABLE else None
+
+# --- Intent Fast Path ---
+# Short prompts that are plainly one lookup (today's/tomorrow's calendar, a contact's
+# WhatsApp history; see IntentRouter) call the tool directly instead of going through
+# AgentLoop's planning calls. The result is phrased by a local template, or with
+# CLAWBRAIN_FAST_PATH_FORMAT=model by one UTILITY call (template if that fails).
+# Answers are logged with provider "fast_path" and the intent as the model; if the
+# tool fails, the prompt takes the normal path. Contacts for WhatsApp come from the
+# "contacts" ({name: number}) entry of the memory's user context.
+FAST_PATH_ENABLED = os.environ.get("CLAWBRAIN_FAST_PATH", "1").lower() not in ("0", "false", "no")
+FAST_PATH_FORMAT = os.environ.get("CLAWBRAIN_FAST_PATH_FORMAT", "template").lower()
+FAST_PATH_FORMAT_INSTRUCTION = (
+    "Answer the user's question from the tool result below, briefly and in plain text. "
+    "Use only what the result contains."
+)
+intent_router = IntentRouter()
+
+def _fast_path_contacts():
+    memory, _ = agent_services.get(count=False)
+    return memory.get_context().get("contacts")
+
+def _match_fast_path(prompt, system_instruction=None):
+    """The fast-path IntentMatch for a prompt, or None (same eligibility as the agent upgrade)."""
+    if not FAST_PATH_ENABLED or not CORE_AVAILABLE or system_instruction:
+        return None
+    # Only the router's regexes run for ordinary chat: memory is loaded when a
+    # WhatsApp lookup needs a contact name resolved
+    return intent_router.match(prompt, contacts=_fast_path_contacts)
+
+def _run_fast_path(prompt, match, channel="api", deadline=None):
+    """Answers a matched intent with its tool. Returns None if the tool failed (caller takes the normal path)."""
+    start = time.perf_counter()
+    _, registry = agent_services.get(count=False)
+    logger.info(f"Fast path: {match.intent} -> {match.tool}({match.args})")
+    with timed("tool"):
+        result = registry.execute_tool(match.tool, deadline=deadline, **match.args)
+    if not isinstance(result, str) or not result.strip() or result.startswith(("Error", "Failed")):
+        logger.warning(f"Fast path {match.intent} fell back, tool returned: {str(result)[:200]}")
+        intent_router.record(match.intent, time.perf_counter() - start, ok=False)
+        return None
+
+    answer = None
+    if FAST_PATH_FORMAT == "model":
+        answer = generate_text(f"Question: {prompt}\n\nTool result:\n{result}", tier=CapabilityTier.UTILITY,
+                               system_instruction=FAST_PATH_FORMAT_INSTRUCTION, channel=channel, deadline=deadline)
+        if answer.startswith("Brain Failure"):
+            answer = None
+    if answer is None:
+        answer = match.format(result)
+
+    latency = time.perf_counter() - start
+    intent_router.record(match.intent, latency)
+    if TRAFFIC_LOGGING_AVAILABLE:
+        with timed("logging"):
+            traffic_logger.log_traffic(
+                prompt=prompt[:500],
+                response=answer[:500],
+                provider="fast_path",
+                model=match.intent,
+                latency=latency,
+                status="success",
+                cost=0,
+                channel=channel
+            )
+    return answer
+
 # --- Specific workflow functions ---
 
 def generate_schedule(tasks_data):
@@ -520,20 +2047,89 @@ def generate_schedule(tasks_data):
     
     return generate_text(prompt, complexity=Complexity.SIMPLE, system_instruction=system_instruction)
 
+# --- Agent Tool-Call Stop Policy ---
+# Tool calls are requested wrapped in <tool_call>...</tool_call> and the closing tag is
+# sent as a stop sequence, so a step's generation ends as soon as the JSON call is
+# complete instead of running on (e.g. into imagined tool output). The tag itself is
+# not returned; the JSON is parsed as before. Disable with CLAWBRAIN_AGENT_STOP_SEQUENCES=0.
+AGENT_TOOL_CALL_OPEN = "<tool_call>"
+AGENT_TOOL_CALL_CLOSE = "</tool_call>"
+AGENT_STOP_SEQUENCES_ENABLED = os.environ.get("CLAWBRAIN_AGENT_STOP_SEQUENCES", "1").lower() not in ("0", "false", "no")
+
+# --- Parallel Tool Calls ---
+# A step may request several independent tools as a JSON list; they run concurrently
+# through ToolRegistry.execute_tools (each under its own timeout and the request
+# deadline) and their results come back in the order they were requested. Calls past
+# AGENT_MAX_TOOL_CALLS in one step are dropped.
+AGENT_MAX_TOOL_CALLS = int(os.environ.get("CLAWBRAIN_AGENT_MAX_TOOL_CALLS", 4))
+AGENT_TOOL_OUTPUT_CHARS = 2000
+
+# --- Agent History ---
+# Each step sends the run so far as native multi-turn messages (see AgentHistory).
+# Past AGENT_HISTORY_TOKENS estimated tokens, the oldest steps are summarized by one
+# cheap UTILITY call (0 = never summarize); the last AGENT_HISTORY_KEEP_RECENT turns
+# stay verbatim. Each step's calls are logged with their `agent_step`.
+AGENT_HISTORY_TOKENS = int(os.environ.get("CLAWBRAIN_AGENT_HISTORY_TOKENS", 3000))
+AGENT_HISTORY_KEEP_RECENT = 4
+AGENT_SUMMARY_INSTRUCTION = (
+    "You condense an assistant's working notes. Merge the summary so far (if any) with "
+    "the new steps into a short summary that keeps every fact, tool result and open "
+    "question still needed to reach the goal. Output only the summary."
+)
+
+def _summarize_agent_turns(summary, turns, deadline=None):
+    """Summarizer for AgentHistory: the summary so far plus the folded turns, in one UTILITY call."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+    prompt = (f"Summary so far:\n{summary}\n\n" if summary else "") + f"New steps:\n{transcript}"
+    result = generate_text(prompt, tier=CapabilityTier.UTILITY, system_instruction=AGENT_SUMMARY_INSTRUCTION,
+                           deadline=deadline)
+    return None if result.startswith("Brain Failure") else result
+
 class AgentLoop:
     """
     A simple ReAct-style loop that uses Memory and Tools.
     """
     def __init__(self, goal: str):
         self.goal = goal
-        self.memory = MemoryManager() if CORE_AVAILABLE else None
-        self.registry = create_default_registry() if CORE_AVAILABLE else None
-        self.history = []
+        self.memory, self.registry = agent_services.get() if CORE_AVAILABLE else (None, None)
+        self.history = None  # AgentHistory of the current run
+
+    @staticmethod
+    def _tool_call_format():
+        call = '{"tool": "tool_name", "args": {...}}'
+        several = "To use several independent tools at once, put a JSON list of such calls in the same block."
+        if AGENT_STOP_SEQUENCES_ENABLED:
+            return f"To use a tool, output ONLY: {AGENT_TOOL_CALL_OPEN}{call}{AGENT_TOOL_CALL_CLOSE}\n{several}"
+        return f"To use a tool, output a JSON block ONLY: {call}\n{several}"
 
-    def run(self, max_steps=5):
+    @staticmethod
+    def _parse_tool_calls(response):
+        """[(tool, args)] from the first JSON call object, or list of them, in a step's reply."""
+        decoder = json.JSONDecoder()
+        for start, char in enumerate(response):
+            if char not in "{[":
+                continue
+            try:
+                value, _ = decoder.raw_decode(response, start)
+            except ValueError:
+                continue
+            calls = [(item["tool"], item.get("args") if isinstance(item.get("args"), dict) else {})
+                     for item in (value if isinstance(value, list) else [value])
+                     if isinstance(item, dict) and item.get("tool")]
+            if calls:
+                return calls
+        return []
+
+    def run(self, max_steps=5, deadline=None):
+        """
+        Runs up to max_steps plan/act steps. The deadline (if any) is shared by every
+        step's generate_text call and tool execution; no step starts once it has expired.
+        """
         if not CORE_AVAILABLE:
             return "Error: Core modules missing."
 
+        deadline = Deadline.resolve(deadline)
+
         print(f"Agent Goal: {self.goal}")
         
         # 1. Retrieve Context
@@ -549,55 +2145,55 @@ class AgentLoop:
             "CRITICAL INFLUENCE:\n"
             "You DO have access to the user's calendar and files via these tools.\n"
             "Do NOT say you cannot access them. Use the tool instead.\n\n"
-            "To use a tool, output a JSON block ONLY: {\"tool\": \"tool_name\", \"args\": {...}}\n"
+            f"{self._tool_call_format()}\n"
             "If you have enough info to finish, output: FINAL ANSWER: [your answer]"
         )
-        
-        current_prompt = f"Goal: {self.goal}"
+        stop_sequences = [AGENT_TOOL_CALL_CLOSE] if AGENT_STOP_SEQUENCES_ENABLED else None
+
+        self.history = AgentHistory(
+            f"Goal: {self.goal}", AGENT_HISTORY_TOKENS or None, AGENT_HISTORY_KEEP_RECENT,
+            summarize=lambda summary, turns: _summarize_agent_turns(summary, turns, deadline)
+        )
         
         for i in range(max_steps):
+            if deadline.expired():
+                logger.warning(f"Agent stopped before step {i+1}: deadline of {deadline.budget}s exceeded")
+                return "Deadline exceeded before the task could be completed."
             print(f"--- Step {i+1} ---")
-            # Call LLM (using simple complexity for generic planning)
-            # merging history
-            # merging history
-            full_prompt = "\n".join(self.history + [current_prompt])
-            logger.info(f"Agent Step {i+1} Prompt Length: {len(full_prompt)} chars")
+            # Earlier steps go as structured turns, summarized once over budget
+            self.history.compact()
+            messages, current_prompt = self.history.request()
+            logger.info(f"Agent Step {i+1}: {len(messages) + 1} messages, ~{self.history.tokens()} history tokens")
             
-            response = generate_text(full_prompt, complexity=Complexity.COMPLEX, system_instruction=system_prompt)
+            response = generate_text(current_prompt, complexity=Complexity.COMPLEX, system_instruction=system_prompt,
+                                     context={"agent_step": i + 1}, deadline=deadline,
+                                     stop_sequences=stop_sequences, messages=messages)
             print(f"LLM Response: {response}")
-            self.history.append(f"Assistant: {response}")
+            self.history.add(ASSISTANT, response)
             
             # Check for tool use
-            # Very naive parsing for this MVP
-            import json
-            if "{" in response and "}" in response:
-                try:
-                    # Find first JSON-like block
-                    start = response.find("{")
-                    end = response.rfind("}") + 1
-                    json_str = response[start:end]
-                    tool_call = json.loads(json_str)
-                    
-                    tool_name = tool_call.get("tool")
-                    tool_args = tool_call.get("args", {})
-                    
-                    if tool_name:
-                        print(f"Executing {tool_name} with {tool_args}...")
-                        result = str(self.registry.execute_tool(tool_name, **tool_args))
-                        
-                        # Safety Truncation for Tool Outputs
-                        original_len = len(result)
-                        if original_len > 2000:
-                            result = result[:2000] + f"\n...(truncated {original_len - 2000} chars)..."
-                            logger.warning(f"Tool output truncated from {original_len} to 2000 chars.")
-
-                        print(f"Tool Output: {result}")
-                        self.history.append(f"System: Tool {tool_name} returned: {result}")
-                        current_prompt = f"Tool output: {result}. Continue."
-                        continue
-                        
-                except Exception as e:
-                    print(f"Failed to parse tool call: {e}")
+            calls = self._parse_tool_calls(response)
+            if calls:
+                if len(calls) > AGENT_MAX_TOOL_CALLS:
+                    logger.warning(f"Step {i+1} asked for {len(calls)} tool calls; running the first {AGENT_MAX_TOOL_CALLS}")
+                    calls = calls[:AGENT_MAX_TOOL_CALLS]
+                for tool_name, tool_args in calls:
+                    print(f"Executing {tool_name} with {tool_args}...")
+                with timed("tool"):
+                    results = self.registry.execute_tools(calls, deadline=deadline)
+
+                outputs = []
+                for call in results:
+                    result = str(call["result"])
+                    # Safety Truncation for Tool Outputs
+                    original_len = len(result)
+                    if original_len > AGENT_TOOL_OUTPUT_CHARS:
+                        result = result[:AGENT_TOOL_OUTPUT_CHARS] + f"\n...(truncated {original_len - AGENT_TOOL_OUTPUT_CHARS} chars)..."
+                        logger.warning(f"Tool output truncated from {original_len} to {AGENT_TOOL_OUTPUT_CHARS} chars.")
+                    print(f"Tool Output: {result}")
+                    outputs.append(f"Tool {call['tool']} returned: {result}")
+                self.history.add(USER, "\n\n".join(outputs) + "\nContinue.")
+                continue
             
             if "FINAL ANSWER:" in response:
                 return response.split("FINAL ANSWER:")[1].strip()
@@ -605,8 +2201,9 @@ class AgentLoop:
             # If no tool and no final answer, just let it continue or stop
             # For this simple loop, we'll assume it's chatting or asking.
             # But let's stop if it didn't use a tool to avoid loops.
-            if i > 0 and "Tool" not in self.history[-1]:
+            if i > 0 and "Tool" not in response:
                  return response
+            self.history.add(USER, "Continue.")
                  
         return "Max steps reached."
 
@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 import sys
+import json
 import logging
 from dotenv import load_dotenv
+from core.request_timing import track_request
 
 # Setup logging
 logging.basicConfig(
@@ -34,6 +36,10 @@ except ImportError as e:
     traffic_logger = None
     settings_manager = None
 
+# Build the agent's memory service and tool registry now, not on the first agent request
+if llm_brain.CORE_AVAILABLE:
+    llm_brain.agent_services.warm()
+
 app = Flask(__name__, static_folder='web-dashboard/dist', static_url_path='')
 CORS(app)
 
@@ -53,43 +59,97 @@ def health():
         "env": os.getenv("CLAWBRAIN_ENV", "production")
     }), 200
 
+def _parse_chat_request():
+    """
+    Validates a chat payload.
+    Returns (params, None) on success or (None, error_response) on failure.
+    """
+    data = request.json
+    if not data:
+        return None, (jsonify({"error": "No JSON data provided"}), 400)
+        
+    message = data.get('message', '')
+    sender = data.get('sender', 'unknown')
+    context = data.get('context', {})  # Extract context for tier routing
+    # Clients that only set context.source (WhatsApp, Discord) still get their channel's limits
+    channel = data.get('channel') or context.get('source') or 'api'
+    bypass_cache = bool(data.get('bypass_cache', False))
+    
+    if not message:
+        return None, (jsonify({"error": "No message provided"}), 400)
+
+    # Overall time budget (seconds) for the request, including agent steps and tools
+    try:
+        timeout = float(data.get('timeout', llm_brain.DEFAULT_REQUEST_TIMEOUT))
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "timeout must be a number of seconds"}), 400)
+    if timeout <= 0:
+        return None, (jsonify({"error": "timeout must be positive"}), 400)
+    deadline = llm_brain.Deadline(timeout)
+    
+    logger.info(f"Received message from {sender} via {channel}: {message[:50]}...")
+    
+    # Add channel to context if not present
+    if 'source' not in context:
+        context['source'] = channel
+
+    return (message, sender, channel, context, bypass_cache, deadline), None
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        data = request.json
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
-            
-        message = data.get('message', '')
-        sender = data.get('sender', 'unknown')
-        channel = data.get('channel', 'api')
-        context = data.get('context', {})  # Extract context for tier routing
-        
-        if not message:
-            return jsonify({"error": "No message provided"}), 400
-        
-        logger.info(f"Received message from {sender} via {channel}: {message[:50]}...")
-        
-        # Add channel to context if not present
-        if 'source' not in context:
-            context['source'] = channel
+        params, error = _parse_chat_request()
+        if error:
+            return error
+        message, sender, channel, context, bypass_cache, deadline = params
         
         # Generate response using 7-tier router
-        response = llm_brain.generate_text(message, context=context, channel=channel)
+        with track_request() as timings:
+            response = llm_brain.generate_text(message, context=context, channel=channel,
+                                               bypass_cache=bypass_cache, deadline=deadline)
         
         logger.info(f"Generated response for {sender}: {response[:50]}...")
         
+        # Per-phase breakdown (classify, context, cache, provider, tool, logging) for load tests
         return jsonify({
             "response": response,
             "metadata": {
                 "processed_by": "ClawBrain v1.0.0"
             }
-        }), 200
+        }), 200, {"Server-Timing": timings.server_timing()}
         
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Server-Sent Events variant of /api/chat.
+    Emits one `data: {"delta": ...}` event per text chunk, then `event: done`
+    (or `event: error` if generation fails mid-stream).
+    """
+    params, error = _parse_chat_request()
+    if error:
+        return error
+    message, sender, channel, context, bypass_cache, deadline = params
+
+    def events():
+        try:
+            for chunk in llm_brain.generate_text_stream(message, context=context, channel=channel,
+                                                        bypass_cache=bypass_cache, deadline=deadline):
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'processed_by': 'ClawBrain v1.0.0'})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming message for {sender}: {e}", exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # --- Traffic & Settings Endpoints ---
 
 @app.route('/api/traffic', methods=['GET'])
@@ -108,7 +168,30 @@ def get_traffic_stats():
         return jsonify({"error": "Traffic logger not available"}), 503
     
     stats = traffic_logger.get_stats()
-    return jsonify({"stats": stats}), 200
+    # Since startup: how often the fast path answered and its latency (the stats above persist)
+    fast_path = llm_brain.intent_router.get_stats() if llm_brain.FAST_PATH_ENABLED else None
+    return jsonify({"stats": stats, "fast_path": fast_path}), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        "brain_context": llm_brain.brain_context_cache.get_stats(),
+        "provider_clients": llm_brain.client_registry.get_stats(),
+        "responses": llm_brain.response_cache.get_stats(),
+        "semantic": llm_brain.semantic_cache.get_stats() if llm_brain.semantic_cache else None,
+        "single_flight": llm_brain.single_flight.get_stats(),
+        "gemini_prompt_cache": llm_brain.gemini_prompt_cache.get_stats(),
+        "tools": llm_brain.tool_result_cache.get_stats() if llm_brain.CORE_AVAILABLE else None,
+        "agent_services": llm_brain.agent_services.get_stats() if llm_brain.CORE_AVAILABLE else None
+    }), 200
+
+@app.route('/api/providers/health', methods=['GET'])
+def get_provider_health():
+    return jsonify({
+        "providers": llm_brain.circuit_breaker.get_health(),
+        "routing": llm_brain.adaptive_router.get_stats() if llm_brain.ADAPTIVE_ROUTING_ENABLED else None,
+        "rate_limits": llm_brain.rate_limiter.get_stats() if llm_brain.RATE_LIMITS_ENABLED else None
+    }), 200
 
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
@@ -132,7 +215,10 @@ def update_settings():
         
     success = settings_manager.update_api_key(key_name, new_value)
     if success:
-        return jsonify({"status": "updated", "message": "Restart required for changes to take effect fully."}), 200
+        # Apply the new key in-process and rebuild the affected pooled client
+        os.environ[key_name] = new_value
+        llm_brain.refresh_provider_clients(key_name)
+        return jsonify({"status": "updated", "message": "Key applied. Restart required for other services to pick it up."}), 200
     else:
         return jsonify({"error": "Failed to update setting"}), 500
 
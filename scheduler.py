@@ -4,6 +4,8 @@ import datetime
 import os
 try:
     import calendar_sync
+    if not calendar_sync.CALENDAR_LIBS_AVAILABLE:
+        calendar_sync = None # Google client libraries not installed
 except ImportError:
     calendar_sync = None # Fallback if setup isn't complete
 
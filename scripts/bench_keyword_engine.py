@@ -0,0 +1,122 @@
+"""
+Benchmark: tier classification + agent check, compiled keyword engine vs. the
+previous per-list substring scans.
+
+Times both on short chat prompts and on ~100 KB pasted prompts: logs with no
+keywords (the worst case for substring scans), logs with a keyword at the end,
+and document-like text with a large vocabulary.
+
+Usage: python scripts/bench_keyword_engine.py [--runs 200] [--size 100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.keyword_engine import KeywordEngine
+
+SHORT_PROMPTS = [
+    "hey",
+    "am I free this afternoon",
+    "can you refactor the scheduler so it handles weekends",
+    "write a caption for the new listing on Elm Street",
+    "give me a rapid summary of today's news",
+]
+
+LOG_WORDS = ["INFO", "WARN", "request", "handled", "in", "ms", "user", "id", "ok", "200", "latency", "worker",
+             "queue", "drained", "retry", "socket", "closed", "upstream", "timeout=30s", "path=/v1/chat"]
+
+
+def legacy_classify(prompt):
+    """The substring implementation classify_tier/_should_use_agent used before the engine."""
+    prompt_lower = prompt.lower()
+    if len(prompt) < 15 and any(w in prompt_lower for w in ["hi", "hey", "ping", "status", "hello"]):
+        tier = "utility"
+    elif any(ind in prompt_lower for ind in ["create image", "generate photo", "realistic photo", "draw", "make an image"]):
+        tier = "visuals"
+    elif any(ind in prompt_lower for ind in ["debug", "code", "implement", "refactor", "fix bug", "git", "deploy", "api", "function", "class"]):
+        tier = "coding"
+    elif any(ind in prompt_lower for ind in ["analyze", "compare", "strategy", "evaluate options", "research", "investigate"]) and len(prompt) > 100:
+        tier = "apex"
+    elif any(ind in prompt_lower for ind in ["calendar", "schedule", "appointment", "file", "folder", "photo", "image", "video", "busy", "free"]):
+        tier = "brain"
+    else:
+        tier = "persona"
+    agent = any(k in prompt.lower() for k in ["calendar", "schedule", "appointment", "busy", "free", "project", "file"])
+    return tier, agent
+
+
+def engine_classify(engine, prompt):
+    """Same decision as llm_brain.classify_tier + _should_use_agent, from one scan."""
+    matched = engine.scan(prompt)
+    if len(prompt) < 15 and "greeting" in matched:
+        tier = "utility"
+    elif "visuals" in matched:
+        tier = "visuals"
+    elif "coding" in matched:
+        tier = "coding"
+    elif "apex" in matched and len(prompt) > 100:
+        tier = "apex"
+    elif "brain" in matched:
+        tier = "brain"
+    else:
+        tier = "persona"
+    return tier, "agent" in matched
+
+
+def log_text(size, rng, tail="", vocabulary=LOG_WORDS):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words) + tail
+
+
+def timed(fn, prompts, runs):
+    samples = []
+    for i in range(runs):
+        # Fresh string objects, so the engine's last-scan memo can't short-circuit
+        prompt = "".join(list(prompts[i % len(prompts)]))
+        start = time.perf_counter()
+        fn(prompt)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(0, int(len(samples) * 0.95) - 1)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--size", type=int, default=100_000, help="size of the long prompts in bytes")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    engine = KeywordEngine()
+    # Document-like text: a large vocabulary of made-up words (no keywords)
+    doc_words = ["".join(rng.choice("bdhklmnstvwxz") + rng.choice("aeiou") for _ in range(rng.randint(2, 5)))
+                 for _ in range(8000)]
+    cases = [
+        ("short chat prompts", SHORT_PROMPTS),
+        (f"{args.size // 1000} KB log, no keywords", [log_text(args.size, rng)]),
+        (f"{args.size // 1000} KB log, keyword at end", [log_text(args.size, rng, " please check my calendar")]),
+        (f"{args.size // 1000} KB document, no keywords", [log_text(args.size, rng, vocabulary=doc_words)]),
+    ]
+
+    print(f"classify_tier + agent check ({args.runs} runs each)\n")
+    print(f"{'case':<32}{'legacy p50':>12}{'engine p50':>12}{'legacy p95':>12}{'engine p95':>12}")
+    for label, prompts in cases:
+        legacy = timed(legacy_classify, prompts, args.runs)
+        compiled = timed(lambda p: engine_classify(engine, p), prompts, args.runs)
+        print(f"{label:<32}{legacy[0]:>10.3f}ms{compiled[0]:>10.3f}ms{legacy[1]:>10.3f}ms{compiled[1]:>10.3f}ms")
+
+    disagreements = [p for p in SHORT_PROMPTS if legacy_classify(p) != engine_classify(engine, p)]
+    if disagreements:
+        print("\nDifferent decisions (substring false positives fixed by word boundaries):")
+        for prompt in disagreements:
+            print(f"  {prompt!r}: legacy {legacy_classify(prompt)} -> engine {engine_classify(engine, prompt)}")
@@ -0,0 +1,278 @@
+"""
+Benchmark: end-to-end load test of /api/chat with a replayed or synthetic prompt mix.
+
+By default starts the local mock providers (core/mock_provider.py) and an
+llm_brain_api server pointed at them in a scratch directory, so no API keys
+are used and traffic.db is untouched. Requests are sent either closed-loop
+(--concurrency workers back to back) or open-loop (--rate arrivals per second,
+Poisson, at most --concurrency in flight).
+
+Reports throughput and p50/p95/p99 client latency, plus the server-side
+breakdown (classify, context, cache, provider, tool, logging, other) from the
+Server-Timing header of each response. --output writes the results as JSON;
+--compare prints the change against an earlier results file.
+
+Usage: python scripts/bench_load.py [--requests 200] [--concurrency 8] [--rate 20]
+           [--prompts traffic.db|mix.jsonl] [--provider-latency lognormal:0.3,0.4]
+           [--output results.json] [--compare baseline.json] [--url http://host:port]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from core.mock_provider import MockProviderServer
+from core.request_timing import PHASES, parse_server_timing
+from core.traffic_logger import TrafficLogger
+
+BRAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BREAKDOWN = PHASES + ("other", "total")
+
+# (weight, prompt) per kind of traffic; one of each tier plus agent (tool) requests
+SYNTHETIC_MIX = [
+    (3, "hey"),
+    (2, "status"),
+    (6, "how should I word a follow-up to a client who went quiet after the showing?"),
+    (6, "write an instagram caption for the new R&B Apparel spring drop"),
+    (3, "refactor the scheduler so it skips weekends"),
+    (2, "debug why the webhook returns a 500 after deploy"),
+    (2, "what's on my calendar tomorrow?"),
+    (1, "am I free friday afternoon for a listing shoot?"),
+    (1, "analyze the last quarter of listings and compare pricing strategy options for the spring market "
+        "across the three neighbourhoods we cover, with risks for each"),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return round(values[index], 3)
+
+
+def summarize(values):
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99),
+            "mean": round(sum(values) / len(values), 3) if values else None}
+
+
+def load_prompt_mix(path, limit):
+    """[(weight, prompt)] from traffic.db (each logged prompt once) or a JSONL of {"prompt"[, "weight"]}."""
+    if path.endswith(".jsonl"):
+        with open(path, "r") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+        return [(float(item.get("weight", 1)), item["prompt"]) for item in items[:limit]]
+    rows = TrafficLogger(path).get_prompt_outcomes(limit=limit)
+    counts = {}
+    for row in rows:
+        counts[row["prompt"]] = counts.get(row["prompt"], 0) + 1
+    return [(count, prompt) for prompt, count in counts.items()]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(mock_url, workdir, rate_limits=False):
+    """Starts llm_brain_api against the mock providers; returns (process, base url)."""
+    port = free_port()
+    # The providers' real rate limits would make the mock run measure the limiter instead
+    env = dict(os.environ, PORT=str(port), CLAWBRAIN_MOCK_PROVIDER_URL=mock_url,
+               CLAWBRAIN_RESPONSE_CACHE_DB=os.path.join(workdir, "response_cache.db"),
+               CLAWBRAIN_RATE_LIMITS="1" if rate_limits else "0")
+    for key in ("GEMINI_API_KEY", "ANTHROPIC_API_KEY", "OPENROUTER_API_KEY"):
+        env.pop(key, None)
+    log = open(os.path.join(workdir, "api.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.join(BRAIN_DIR, "llm_brain_api.py")], cwd=workdir,
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError(f"llm_brain_api exited during start-up, see {log.name}")
+        try:
+            requests.get(f"{url}/health", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("llm_brain_api did not start within 10s")
+
+
+def run_load(url, prompts, args):
+    rng = random.Random(args.seed)
+    weights = [w for w, _ in prompts]
+    schedule = [rng.choices(prompts, weights)[0][1] for _ in range(args.requests)]
+    if args.unique:
+        # Defeat the response cache and single-flight coalescing
+        schedule = [f"{prompt} [{i}]" for i, prompt in enumerate(schedule)]
+
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def send(prompt):
+        session = getattr(local, "session", None) or requests.Session()
+        local.session = session
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{url}/api/chat", json={"message": prompt, "sender": "bench_load",
+                                                              "timeout": args.timeout}, timeout=args.timeout + 5)
+            status = response.status_code
+            timings = parse_server_timing(response.headers.get("Server-Timing"))
+        except requests.RequestException as e:
+            status, timings = type(e).__name__, {}
+        result = {"latency_ms": (time.perf_counter() - start) * 1000, "status": status, "timings": timings}
+        with results_lock:
+            results.append(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        if args.rate:
+            # Open loop: arrivals don't wait for earlier responses (bounded by the pool size)
+            next_at = started
+            for prompt in schedule:
+                next_at += rng.expovariate(args.rate)
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                pool.submit(send, prompt)
+        else:
+            for prompt in schedule:
+                pool.submit(send, prompt)
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == 200]
+    statuses = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "requests": len(results),
+        "succeeded": len(ok),
+        "statuses": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": summarize([r["latency_ms"] for r in ok]),
+        "breakdown_ms": {phase: summarize([r["timings"].get(phase, 0.0) for r in ok if r["timings"]])
+                         for phase in BREAKDOWN},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BRAIN_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    results = report["results"]
+
+    def delta(path):
+        if baseline is None:
+            return ""
+        old, new = baseline["results"], results
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if old is None or new is None or abs(old) < 0.1:
+            return ""
+        return f" ({(new - old) / old * 100:+.0f}%)"
+
+    print(f"{results['succeeded']}/{results['requests']} ok in {results['duration_s']}s "
+          f"-> {results['throughput_rps']} req/s{delta(['throughput_rps'])}   statuses {results['statuses']}\n")
+    print(f"{'ms':<10}{'p50':>18}{'p95':>18}{'p99':>18}")
+    rows = [("client", ["latency_ms"])] + [(phase, ["breakdown_ms", phase]) for phase in BREAKDOWN]
+    for label, path in rows:
+        stats = results
+        for key in path:
+            stats = stats[key]
+        cells = []
+        for pct in ("p50", "p95", "p99"):
+            value = stats[pct]
+            cells.append(f"{value:.1f}{delta(path + [pct])}" if value is not None else "-")
+        print(f"{label:<10}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, help="open-loop arrivals per second (default: closed loop)")
+    parser.add_argument("--prompts", help="traffic.db to replay, or a JSONL prompt mix (default: synthetic mix)")
+    parser.add_argument("--limit", type=int, default=5000, help="prompts to read from --prompts")
+    parser.add_argument("--unique", action="store_true", help="make every prompt unique (no cache hits)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request deadline sent to the API")
+    parser.add_argument("--provider-latency", default="lognormal:0.3,0.4", help="mock provider latency")
+    parser.add_argument("--provider-error-rate", type=float, default=0.0)
+    parser.add_argument("--provider-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the client-side provider rate limits (off against the mock by default)")
+    parser.add_argument("--url", help="existing server to load instead of a local one on mock providers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    prompts = load_prompt_mix(args.prompts, args.limit) if args.prompts else SYNTHETIC_MIX
+    if not prompts:
+        sys.exit(f"No prompts found in {args.prompts}")
+
+    mock = api = None
+    workdir = tempfile.TemporaryDirectory(prefix="bench_load_")
+    try:
+        url = args.url
+        if not url:
+            mock = MockProviderServer({"seed": args.seed, "default": {
+                "latency": args.provider_latency, "error_rate": args.provider_error_rate,
+                "rate_limit_rate": args.provider_rate_limit_rate, "retry_after": 0}}).start()
+            api, url = start_api(mock.url, workdir.name, args.rate_limits)
+
+        mode = f"open loop at {args.rate}/s" if args.rate else "closed loop"
+        print(f"{args.requests} requests, {mode}, concurrency {args.concurrency}, "
+              f"{len(prompts)} distinct prompts ({args.prompts or 'synthetic mix'})\n")
+        results = run_load(url, prompts, args)
+    finally:
+        if api:
+            api.terminate()
+            api.wait()
+        if mock:
+            mock_stats = mock.get_stats()
+            mock.stop()
+        workdir.cleanup()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "rate": args.rate,
+                   "prompts": args.prompts or "synthetic", "unique": args.unique,
+                   "provider_latency": None if args.url else args.provider_latency,
+                   "provider_error_rate": None if args.url else args.provider_error_rate,
+                   "rate_limits": None if args.url else args.rate_limits,
+                   "url": args.url},
+        "results": results,
+    }
+    if mock:
+        report["mock_providers"] = mock_stats
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print(f"compared with {args.compare} (revision {baseline.get('revision')})")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
@@ -0,0 +1,128 @@
+"""
+Microbenchmark: per-call client overhead before/after pooled provider clients.
+
+Starts a local keep-alive HTTP stub that answers the OpenRouter, Anthropic and
+Gemini request shapes, then times N calls per provider two ways:
+  - before: a fresh client (or bare requests.post) per call, as llm_brain used to do
+  - after:  the long-lived client from llm_brain.client_registry
+
+Usage: python scripts/bench_provider_clients.py [--calls 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.client_pool import ProviderClientRegistry
+
+OPENROUTER_BODY = {
+    "choices": [{"message": {"role": "assistant", "content": "ok"}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1}
+}
+ANTHROPIC_BODY = {
+    "id": "msg_bench", "type": "message", "role": "assistant", "model": "stub",
+    "content": [{"type": "text", "text": "ok"}],
+    "stop_reason": "end_turn",
+    "usage": {"input_tokens": 1, "output_tokens": 1}
+}
+GEMINI_BODY = {
+    "candidates": [{"content": {"role": "model", "parts": [{"text": "ok"}]}}],
+    "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1}
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # allow keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+
+        if "/messages" in self.path:
+            body = ANTHROPIC_BODY
+        elif ":generateContent" in self.path:
+            body = GEMINI_BODY
+        else:
+            body = OPENROUTER_BODY
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _time_calls(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(name, before, after):
+    b, a = statistics.median(before), statistics.median(after)
+    print(f"{name:<12} before: {b:7.3f} ms/call   after: {a:7.3f} ms/call   saved: {b - a:7.3f} ms ({(1 - a / b) * 100:5.1f}%)")
+
+
+def run(calls):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    api_key = "bench-key"
+    print(f"Stub provider on {base_url}, {calls} calls per mode (median latency)\n")
+
+    try:
+        if llm_brain.REQUESTS_LIB_AVAILABLE:
+            url = f"{base_url}/api/v1/chat/completions"
+            payload = {"model": "stub", "messages": [{"role": "user", "content": "ping"}]}
+            registry = ProviderClientRegistry()
+            registry.register_factory("openrouter", llm_brain._make_openrouter_session)
+
+            before = _time_calls(lambda: llm_brain.requests.post(url, json=payload).json(), calls)
+            after = _time_calls(lambda: registry.get("openrouter", api_key).post(url, json=payload).json(), calls)
+            _report("openrouter", before, after)
+
+        if llm_brain.ANTHROPIC_LIB_AVAILABLE:
+            registry = ProviderClientRegistry()
+            registry.register_factory("claude", lambda k, r: llm_brain._make_claude_client(k, r, base_url=base_url))
+
+            def claude_call(client):
+                client.messages.create(model="stub", max_tokens=16, messages=[{"role": "user", "content": "ping"}])
+
+            before = _time_calls(lambda: claude_call(llm_brain.anthropic.Anthropic(api_key=api_key, base_url=base_url)), calls)
+            after = _time_calls(lambda: claude_call(registry.get("claude", api_key)), calls)
+            _report("claude", before, after)
+
+        if llm_brain.GEMINI_LIB_AVAILABLE:
+            registry = ProviderClientRegistry()
+            registry.register_factory("gemini", lambda k, r: llm_brain._make_gemini_client(k, r, base_url=base_url))
+            http_options = llm_brain.types.HttpOptions(base_url=base_url)
+
+            def gemini_call(client):
+                client.models.generate_content(model="stub", contents="ping")
+
+            before = _time_calls(lambda: gemini_call(llm_brain.genai.Client(api_key=api_key, http_options=http_options)), calls)
+            after = _time_calls(lambda: gemini_call(registry.get("gemini", api_key)), calls)
+            _report("gemini", before, after)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    run(parser.parse_args().calls)
@@ -0,0 +1,65 @@
+"""
+Benchmark: semantic cache lookup latency vs. number of cached entries.
+
+Fills a SemanticCache with random unit vectors (10k / 100k / 1M by default)
+and times lookups for real prompts, including the embedding step.
+
+Usage: python scripts/bench_semantic_cache.py [--sizes 10000 100000 1000000] [--dim 256]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.semantic_cache import SemanticCache
+
+PROMPTS = [
+    "am I free this afternoon",
+    "anything on my calendar this afternoon",
+    "status",
+    "write a caption for the new listing on Elm Street",
+    "what's the plan for R&B Apparel social posts this week",
+]
+
+
+def bench(size, dim, lookups, chunk=100_000):
+    cache = SemanticCache(capacity=size, dim=dim)
+    rng = np.random.default_rng(0)
+
+    for start in range(0, size, chunk):
+        n = min(chunk, size - start)
+        vectors = rng.standard_normal((n, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        cache.bulk_add("bench", vectors, [""] * n, ttl=3600)
+
+    # Warm up (page in the matrix)
+    cache.lookup("bench", PROMPTS[0], threshold=0.9)
+
+    samples = []
+    for i in range(lookups):
+        start = time.perf_counter()
+        cache.lookup("bench", PROMPTS[i % len(PROMPTS)], threshold=0.9)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    mb = cache.get_stats()["index_bytes"] / 1e6
+    print(f"{size:>10,} entries  index {mb:8.1f} MB   p50 {p50:8.3f} ms   p95 {p95:8.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--lookups", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"Semantic cache lookup latency (dim={args.dim}, {args.lookups} lookups)\n")
+    for size in args.sizes:
+        bench(size, args.dim, args.lookups)
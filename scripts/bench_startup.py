@@ -0,0 +1,90 @@
+"""
+Benchmark: start-up time of each clawbrain subcommand and of the server modules.
+
+Runs every case in a fresh interpreter with `python -X importtime` and reports
+the median wall time and the total time spent importing modules, plus the
+slowest imports. Cases only read state (no network, no files written), so the
+numbers are what a user waits for before the command does any work.
+
+Usage: python scripts/bench_startup.py [--runs 5] [--top 5] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BRAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(BRAIN_DIR, "clawbrain")
+
+CASES = [
+    ("clawbrain --help", [CLI, "--help"]),
+    ("clawbrain version", [CLI, "version"]),
+    ("clawbrain config", [CLI, "config"]),
+    ("clawbrain tools", [CLI, "tools"]),
+    ("clawbrain memory", [CLI, "memory"]),
+    ("clawbrain chat --help", [CLI, "chat", "--help"]),
+    ("clawbrain train --help", [CLI, "train", "--help"]),
+    ("import llm_brain", ["-c", "import llm_brain"]),
+    ("import llm_brain_api", ["-c", "import llm_brain_api"]),
+]
+
+# "import time:  self [us] | cumulative | imported package"; top-level imports are not indented
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def parse_importtime(stderr):
+    """(total import ms, {top-level module: cumulative ms})."""
+    top_level = {}
+    for line in stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m and not m.group(3):
+            top_level[m.group(4)] = int(m.group(2)) / 1000
+    return sum(top_level.values()), top_level
+
+
+def run_case(argv, runs):
+    walls, imports, modules = [], [], {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=BRAIN_DIR,
+                              capture_output=True, text=True)
+        walls.append((time.perf_counter() - start) * 1000)
+        total, top_level = parse_importtime(proc.stderr)
+        imports.append(total)
+        for name, ms in top_level.items():
+            modules.setdefault(name, []).append(ms)
+    return {
+        "wall_ms": round(statistics.median(walls), 1),
+        "import_ms": round(statistics.median(imports), 1),
+        "exit_code": proc.returncode,
+        "slowest_imports": {name: round(statistics.median(ms), 1)
+                            for name, ms in sorted(modules.items(), key=lambda kv: -statistics.median(kv[1]))},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest top-level imports to list per case")
+    parser.add_argument("--json", help="also write the results to this file, to compare across changes")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"start-up time (median of {args.runs} runs)\n")
+    print(f"{'case':<28}{'wall':>10}{'imports':>10}  slowest imports")
+    for label, argv in CASES:
+        result = run_case(argv, args.runs)
+        result["slowest_imports"] = dict(list(result["slowest_imports"].items())[:args.top])
+        results[label] = result
+        slowest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in result["slowest_imports"].items())
+        failed = f"  [exit {result['exit_code']}]" if result["exit_code"] else ""
+        print(f"{label:<28}{result['wall_ms']:>8.0f}ms{result['import_ms']:>8.0f}ms  {slowest}{failed}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"python": sys.version.split()[0], "runs": args.runs, "cases": results}, f, indent=2)
+        print(f"\nwrote {args.json}")
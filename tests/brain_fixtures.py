@@ -0,0 +1,49 @@
+"""Shared setUp helpers for tests that drive llm_brain's request path."""
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.circuit_breaker import CircuitBreaker
+from core.rate_limiter import RateLimiter
+from core.response_cache import ResponseCache
+
+
+def _patch(testcase, targets):
+    for target, value in targets.items():
+        patcher = patch.object(llm_brain, target, value)
+        patcher.start()
+        testcase.addCleanup(patcher.stop)
+
+
+def isolated_brain(testcase, **overrides):
+    """Give ``testcase`` its own llm_brain state until it finishes.
+
+    Calls get an in-memory response cache, a mock traffic logger, a fake API key,
+    static routing, a fresh circuit breaker and no rate limits. Keyword arguments
+    replace any of these or patch further llm_brain attributes.
+    """
+    targets = {
+        'response_cache': ResponseCache(db_path=None),
+        'traffic_logger': MagicMock(),
+        'TRAFFIC_LOGGING_AVAILABLE': True,
+        'get_api_key': MagicMock(return_value="fake_key"),
+        'ADAPTIVE_ROUTING_ENABLED': False,
+        'circuit_breaker': CircuitBreaker(),
+        'rate_limiter': RateLimiter({}),
+    }
+    targets.update(overrides)
+    _patch(testcase, targets)
+
+
+def point_providers_at(testcase, server):
+    """Send every provider's HTTP traffic to a MockProviderServer."""
+    _patch(testcase, {
+        'PROVIDER_BASE_URLS': {"openrouter": f"{server.url}/api/v1", "gemini": server.url, "claude": server.url},
+        'OPENROUTER_URL': f"{server.url}/api/v1/chat/completions",
+        'PROMPT_CACHING_ENABLED': False,
+    })
+    llm_brain.client_registry.refresh()
+    testcase.addCleanup(llm_brain.client_registry.refresh)
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.adaptive_router import AdaptiveRouter
+from brain_fixtures import isolated_brain
+
+FAST = {"provider": "gemini", "config": {"model": "fast"}}
+SLOW = {"provider": "openrouter", "config": {"model": "slow"}}
+PRICEY = {"provider": "gemini", "config": {"model": "pricey"}}
+
+def _rows(model, provider, n, latency, cost=0.0, failures=0):
+    rows = [{"provider": provider, "model": model, "status": "success", "latency": latency, "cost": cost}] * n
+    rows += [{"provider": provider, "model": model, "status": "error: 503", "latency": 1.0, "cost": 0.0}] * failures
+    return rows
+
+class TestAdaptiveRouter(unittest.TestCase):
+    def _router(self, rows, candidates, policy=None, exploration=0.0):
+        return AdaptiveRouter({"tier": candidates}, lambda: rows, policies={"tier": policy or {}},
+                              exploration=exploration, min_samples=5, rng=random.Random(0))
+
+    def test_defaults_to_first_candidate_without_data(self):
+        decision = self._router([], [SLOW, FAST]).choose("tier")
+        self.assertEqual(decision.config["model"], "slow")
+        self.assertTrue(decision.reason.startswith("default"))
+
+    def test_picks_lowest_p95_latency(self):
+        rows = _rows("slow", "openrouter", 20, 3.0) + _rows("fast", "gemini", 20, 0.5)
+        decision = self._router(rows, [SLOW, FAST]).choose("tier")
+        self.assertEqual(decision.config["model"], "fast")
+        self.assertIn("p95_latency", decision.reason)
+        self.assertIn("p95=0.50s", decision.reason)
+
+    def test_cost_ceiling_and_success_rate_exclude_candidates(self):
+        rows = (_rows("slow", "openrouter", 20, 3.0, cost=0.0001)
+                + _rows("pricey", "gemini", 20, 0.2, cost=0.05)
+                + _rows("fast", "gemini", 10, 0.1, failures=10))
+        decision = self._router(rows, [SLOW, PRICEY, FAST], {"max_cost": 0.01}).choose("tier")
+        self.assertEqual(decision.config["model"], "slow")
+
+    def test_cost_objective(self):
+        rows = _rows("pricey", "gemini", 20, 0.2, cost=0.05) + _rows("slow", "openrouter", 20, 3.0, cost=0.0)
+        decision = self._router(rows, [PRICEY, SLOW], {"objective": "cost"}).choose("tier")
+        self.assertEqual(decision.config["model"], "slow")
+
+    def test_exploration_tries_other_candidates(self):
+        rows = _rows("slow", "openrouter", 20, 3.0) + _rows("fast", "gemini", 20, 0.5)
+        router = self._router(rows, [SLOW, FAST], exploration=1.0)
+        decision = router.choose("tier")
+        self.assertEqual(decision.config["model"], "slow")
+        self.assertTrue(decision.reason.startswith("explore"))
+        self.assertEqual(router.get_stats()["decisions"]["explore"], 1)
+
+    def test_stats_are_cached_between_refreshes(self):
+        source = MagicMock(return_value=[])
+        router = AdaptiveRouter({"tier": [SLOW, FAST]}, source, refresh_interval=60)
+        router.choose("tier")
+        router.choose("tier")
+        self.assertEqual(source.call_count, 1)
+
+class TestRoutingInGenerateText(unittest.TestCase):
+    def setUp(self):
+        rows = _rows("gemini-2.0-flash-001", "gemini", 20, 0.4) + _rows("gemini-2.5-flash-lite", "gemini", 20, 2.0)
+        router = AdaptiveRouter(llm_brain.TIER_CANDIDATES, lambda: rows, policies=llm_brain.ROUTING_POLICIES,
+                                exploration=0.0)
+        isolated_brain(self, adaptive_router=router, ADAPTIVE_ROUTING_ENABLED=True)
+
+    def test_routed_model_is_used_and_reason_logged(self):
+        gemini = MagicMock(return_value=("hi", {}))
+        with patch('llm_brain._call_gemini', gemini):
+            llm_brain.generate_text("Say hello", tier=llm_brain.CapabilityTier.PERSONA)
+
+        self.assertEqual(gemini.call_args.args[3]["model"], "gemini-2.0-flash-001")
+        reason = llm_brain.traffic_logger.log_traffic.call_args.kwargs["route_reason"]
+        self.assertTrue(reason.startswith("persona: p95_latency: gemini-2.0-flash-001"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.agent_history import ASSISTANT, USER, AgentHistory
+from core.mock_provider import MockProviderServer
+from core.tool_registry import ToolRegistry
+from brain_fixtures import isolated_brain, point_providers_at
+
+
+def fill(history, steps, size=400):
+    for i in range(steps):
+        history.add(ASSISTANT, f"call {i} " + "a" * size)
+        history.add(USER, f"result {i} " + "r" * size)
+
+
+class TestAgentHistory(unittest.TestCase):
+    def test_request_splits_latest_user_message(self):
+        history = AgentHistory("Goal: plan my day")
+        self.assertEqual(history.request(), ([], "Goal: plan my day"))
+        history.add(ASSISTANT, "<tool_call>")
+        with self.assertRaises(ValueError):
+            history.request()
+        history.add(USER, "Tool x returned: 1")
+        messages, prompt = history.request()
+        self.assertEqual([m["role"] for m in messages], [USER, ASSISTANT])
+        self.assertEqual(prompt, "Tool x returned: 1")
+
+    def test_under_budget_is_untouched(self):
+        summarize = MagicMock()
+        history = AgentHistory("Goal", token_budget=10_000, summarize=summarize)
+        fill(history, 3)
+        self.assertEqual(history.compact(), 0)
+        summarize.assert_not_called()
+
+    def test_compact_folds_oldest_pairs_into_summary(self):
+        summarize = MagicMock(return_value="checked calendar: free at 3pm")
+        history = AgentHistory("Goal: find a slot", token_budget=300, keep_recent=2, summarize=summarize)
+        fill(history, 3)
+        self.assertEqual(history.compact(), 4)
+
+        previous, turns = summarize.call_args.args
+        self.assertIsNone(previous)
+        self.assertEqual(len(turns), 4)
+        messages = history.messages
+        self.assertEqual([m["role"] for m in messages], [USER, ASSISTANT, USER])
+        self.assertIn("Summary of earlier steps:\nchecked calendar: free at 3pm", messages[0]["content"])
+        self.assertTrue(messages[1]["content"].startswith("call 2"))
+
+        # Incremental: the next fold gets the summary so far
+        fill(history, 2)
+        history.compact()
+        self.assertEqual(summarize.call_args.args[0], "checked calendar: free at 3pm")
+        self.assertEqual(history.summarized_turns, 8)
+
+    def test_failed_summary_falls_back_to_clipped_turns(self):
+        history = AgentHistory("Goal", token_budget=300, keep_recent=2,
+                               summarize=MagicMock(side_effect=RuntimeError("no provider")))
+        fill(history, 3)
+        history.compact()
+        self.assertIn("assistant: call 0", history.summary)
+        self.assertLess(history.tokens(), 700)
+
+    def test_no_budget_never_compacts(self):
+        history = AgentHistory("Goal", token_budget=None)
+        fill(history, 10)
+        self.assertEqual(history.compact(), 0)
+
+
+class TestProviderHistory(unittest.TestCase):
+    """Earlier turns reach each provider as native messages (checked against the mock server)."""
+
+    def setUp(self):
+        self.server = MockProviderServer({"default": {"latency": 0}}).start()
+        self.addCleanup(self.server.stop)
+        point_providers_at(self, self.server)
+
+    def test_history_is_sent_as_turns(self):
+        history = [{"role": "user", "content": "Goal: " + "g" * 400},
+                   {"role": "assistant", "content": "<tool_call>" + "c" * 400}]
+        models = {"openrouter": "openrouter/free", "gemini": "gemini-2.0-flash-001", "claude": "claude-test"}
+        for name, model in models.items():
+            _, plain = llm_brain._call_provider(name, "history-key", "Tool x returned: 1", None, {"model": model})
+            content, usage = llm_brain._call_provider(name, "history-key", "Tool x returned: 1", None,
+                                                      {"model": model, "history": history})
+            # The latest user message is still what gets answered
+            self.assertEqual(content, f"Mock {name} reply to: Tool x returned: 1", name)
+            self.assertGreaterEqual(usage["prompt_tokens"] - plain["prompt_tokens"], 200, name)
+
+
+class TestAgentLoopHistory(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, CORE_AVAILABLE=True)
+        self.agent = llm_brain.AgentLoop.__new__(llm_brain.AgentLoop)
+        self.agent.goal = "what's on my calendar this week?"
+        self.agent.memory = MagicMock(get_context=MagicMock(return_value={}))
+        results = (f"event {i}: " + "x" * 1600 for i in range(10))
+        self.agent.registry = ToolRegistry()
+        self.agent.registry.execute_tool = MagicMock(side_effect=lambda *a, **kw: next(results))
+
+    def run_agent(self, tool_steps):
+        replies = [('<tool_call>{"tool": "get_calendar_events", "args": {}}', {})] * tool_steps
+        provider = MagicMock(side_effect=replies + [("FINAL ANSWER: busy", {})])
+        with patch.object(llm_brain, "_call_provider", provider):
+            result = self.agent.run(max_steps=tool_steps + 1)
+        self.assertEqual(result, "busy")
+        return provider
+
+    def test_steps_send_structured_turns(self):
+        provider = self.run_agent(1)
+        first, second = provider.call_args_list
+        self.assertEqual(first.args[2], f"Goal: {self.agent.goal}")
+        self.assertNotIn("history", first.args[4])
+        self.assertTrue(second.args[2].startswith("Tool get_calendar_events returned: "))
+        self.assertEqual([m["role"] for m in second.args[4]["history"]], ["user", "assistant"])
+        # Every step is logged with its number
+        steps = [c.kwargs["agent_step"] for c in llm_brain.traffic_logger.log_traffic.call_args_list]
+        self.assertEqual(steps, [1, 2])
+
+    def test_long_runs_are_summarized(self):
+        summarize = MagicMock(return_value="calendar checked twice: busy all week")
+        with patch.object(llm_brain, "AGENT_HISTORY_TOKENS", 1000), \
+             patch.object(llm_brain, "_summarize_agent_turns", summarize):
+            provider = self.run_agent(4)
+
+        self.assertTrue(summarize.called)
+        sent = [sum(len(m["content"]) for m in c.args[4].get("history", [])) + len(c.args[2])
+                for c in provider.call_args_list]
+        # The last step carries the summary and the two most recent tool results,
+        # not all four (~8.5k chars)
+        self.assertLess(sent[-1], 5000)
+        self.assertIn("busy all week", provider.call_args_list[-1].args[4]["history"][0]["content"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.agent_services import AgentServices
+from core.memory_manager import MemoryManager
+from core.tool_registry import BaseTool, ToolRegistry, CalendarTool, create_default_registry
+
+
+class CountedTool(BaseTool):
+    name = "counted"
+    description = "Counts its instances"
+    instances = 0
+
+    def __init__(self):
+        CountedTool.instances += 1
+
+    def execute(self, **kwargs):
+        return "ok"
+
+
+class TestLazyTools(unittest.TestCase):
+    def setUp(self):
+        CountedTool.instances = 0
+
+    def test_tool_is_built_on_first_execution_only(self):
+        registry = ToolRegistry()
+        registry.register_tool_class(CountedTool)
+        self.assertEqual(registry.list_tools(), [{"name": "counted", "description": "Counts its instances"}])
+        self.assertEqual(CountedTool.instances, 0)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: registry.execute_tool("counted"), range(16)))
+        self.assertEqual(results, ["ok"] * 16)
+        self.assertEqual(CountedTool.instances, 1)
+        self.assertIn("counted", registry.get_stats()["built"])
+
+    def test_default_registry_does_not_build_tools(self):
+        with patch.object(CalendarTool, "__init__", MagicMock(return_value=None)) as init:
+            registry = create_default_registry()
+            self.assertEqual(len(registry.list_tools()), 4)
+            init.assert_not_called()
+            self.assertIsInstance(registry.get_tool("get_calendar_events"), CalendarTool)
+            init.assert_called_once()
+
+
+class TestAgentServices(unittest.TestCase):
+    def test_built_once_across_threads(self):
+        memory_factory = MagicMock(side_effect=lambda: object())
+        services = AgentServices(memory_factory, ToolRegistry)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: services.get(), range(16)))
+        memory_factory.assert_called_once()
+        self.assertTrue(all(r is results[0] for r in results))
+
+        stats = services.get_stats()
+        self.assertEqual(stats["uses"], 16)
+        self.assertEqual(set(stats["build_seconds"]), {"memory", "registry"})
+        self.assertAlmostEqual(stats["setup_seconds_saved"], stats["setup_seconds_per_request"] * 15, places=2)
+
+    def test_warm_then_every_use_is_saved(self):
+        services = AgentServices(MagicMock(), ToolRegistry)
+        services.warm()
+        self.assertEqual(services.get_stats()["uses"], 0)
+        services.get()
+        stats = services.get_stats()
+        self.assertTrue(stats["warmed"])
+        self.assertAlmostEqual(stats["setup_seconds_saved"], stats["setup_seconds_per_request"], places=3)
+
+    def test_shared_memory_reloads_edited_files(self):
+        memory_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, memory_dir)
+        services = AgentServices(lambda: MemoryManager(memory_dir, check_interval=0), ToolRegistry)
+        memory, _ = services.get()
+        memory.add_fact("likes coffee")
+
+        path = os.path.join(memory_dir, "user_context.json")
+        with open(path) as f:
+            context = json.load(f)
+        context["contacts"] = {"Sam": "15550100"}
+        with open(path, "w") as f:
+            json.dump(context, f)
+
+        memory, _ = services.get()
+        self.assertEqual(memory.get_context()["contacts"], {"Sam": "15550100"})
+        self.assertEqual(memory.get_context()["facts"], ["likes coffee"])
+
+    def test_agent_loops_share_services(self):
+        services = AgentServices(MagicMock(), ToolRegistry)
+        with patch.object(llm_brain, "agent_services", services), patch.object(llm_brain, "CORE_AVAILABLE", True):
+            first, second = llm_brain.AgentLoop("a"), llm_brain.AgentLoop("b")
+        self.assertIs(first.memory, second.memory)
+        self.assertIs(first.registry, second.registry)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from brain_fixtures import isolated_brain
+
+def _reply(text, delay=0.0, error=None):
+    async def call(api_key, prompt, system_instruction=None, config=None):
+        await asyncio.sleep(delay)
+        if error:
+            raise Exception(error)
+        return text, {"prompt_tokens": 10, "completion_tokens": 5}
+    return call
+
+class TestGenerateTextAsync(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self)
+        self.tier = llm_brain.CapabilityTier.PERSONA  # gemini, then openrouter
+
+    def _statuses(self):
+        return [c.kwargs["status"].split(":")[0] for c in llm_brain.traffic_logger.log_traffic.call_args_list]
+
+    def test_falls_back_on_error(self):
+        with patch('llm_brain._call_gemini_async', _reply(None, error="503")), \
+             patch('llm_brain._call_openrouter_async', _reply("from openrouter")):
+            result = asyncio.run(llm_brain.generate_text_async("Say hello", tier=self.tier))
+
+        self.assertEqual(result, "from openrouter")
+        self.assertEqual(self._statuses(), ["error", "success"])
+
+    def test_deadline_cancels_slow_provider_and_stops_fallback(self):
+        with patch('llm_brain._call_gemini_async', _reply("too late", delay=5)), \
+             patch('llm_brain._call_openrouter_async', _reply("from openrouter")):
+            result = asyncio.run(llm_brain.generate_text_async("Say hello", tier=self.tier, timeout=0.2))
+
+        self.assertTrue(result.startswith("Brain Failure"))
+        self.assertIn("deadline of 0.2s exceeded", result)
+        self.assertIn("timed out", result)
+        self.assertEqual(self._statuses(), [llm_brain.DEADLINE_STATUS])
+
+    def test_deadline_leaves_room_for_fallback(self):
+        with patch('llm_brain._call_gemini_async', _reply(None, delay=0.05, error="503")), \
+             patch('llm_brain._call_openrouter_async', _reply("from openrouter", delay=0.05)), \
+             patch('llm_brain.MIN_ATTEMPT_BUDGET', 0.5):
+            result = asyncio.run(llm_brain.generate_text_async("Say hello", tier=self.tier, timeout=1.0))
+
+        self.assertEqual(result, "from openrouter")
+
+    def test_cancellation_propagates(self):
+        async def scenario():
+            task = asyncio.create_task(llm_brain.generate_text_async("Say hello", tier=self.tier))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await task
+
+        with patch('llm_brain._call_gemini_async', _reply("too late", delay=5)):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(scenario())
+
+        self.assertEqual(llm_brain.traffic_logger.log_traffic.call_args.kwargs["status"], "error: cancelled")
+
+    def test_concurrent_requests_share_one_loop(self):
+        async def scenario():
+            return await asyncio.gather(*[
+                llm_brain.generate_text_async(f"Question {i}", tier=self.tier, bypass_cache=True)
+                for i in range(50)
+            ])
+
+        with patch('llm_brain._call_gemini_async', _reply("ok", delay=0.1)):
+            start = time.perf_counter()
+            results = asyncio.run(scenario())
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, ["ok"] * 50)
+        self.assertLess(elapsed, 2.0)  # run concurrently, not 50 x 0.1s
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.brain_context import BrainContextCache
+
+class TestBrainContextCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.brain_dir = self.tmp.name
+        self._write("SOUL.md", "soul v1")
+        self._write("USER.md", "user v1")
+        self.cache = BrainContextCache(self.brain_dir, check_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, content, mtime=None):
+        path = os.path.join(self.brain_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_context_matches_file_order(self):
+        context = self.cache.get_context()
+        self.assertEqual(context, "\n\n--- SOUL.md ---\nsoul v1\n\n\n--- USER.md ---\nuser v1")
+
+    def test_unchanged_files_are_not_reread(self):
+        self.cache.get_context()
+        self.cache.get_context()
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["rebuilds"], 1)
+        self.assertEqual(stats["section_reloads"], 2)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_only_changed_section_is_reloaded(self):
+        self.cache.get_context()
+        version = self.cache.version
+        self._write("USER.md", "user v2 (longer)", mtime=1_000_000)
+
+        context = self.cache.get_context()
+        self.assertIn("user v2 (longer)", context)
+        self.assertEqual(self.cache.get_stats()["section_reloads"], 3)
+        self.assertGreater(self.cache.version, version)
+
+    def test_system_instruction_is_memoized_per_version(self):
+        first = self.cache.get_system_instruction("Be brief")
+        second = self.cache.get_system_instruction("Be brief")
+        self.assertIs(first, second)
+        self.assertTrue(first.endswith("--- TASK INSTRUCTION ---\nBe brief"))
+        self.assertEqual(self.cache.get_stats()["instruction_hits"], 1)
+
+        self._write("SOUL.md", "soul v2 changed", mtime=1_000_000)
+        third = self.cache.get_system_instruction("Be brief")
+        self.assertIn("soul v2 changed", third)
+
+    def test_throttled_checks_skip_stat(self):
+        cache = BrainContextCache(self.brain_dir, check_interval=60)
+        cache.get_context()
+        self._write("SOUL.md", "soul v2 changed", mtime=1_000_000)
+        self.assertNotIn("soul v2", cache.get_context())
+        cache.invalidate()
+        self.assertIn("soul v2", cache.get_context())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,8 +8,19 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import llm_brain
+from core.response_cache import ResponseCache
 
 class TestBrainIntegration(unittest.TestCase):
+    def setUp(self):
+        # Keep provider calls observable: no cached responses from earlier runs
+        patcher = patch.object(llm_brain, 'response_cache', ResponseCache(db_path=None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # "Hello" is a UTILITY prompt; check the full context, not its trimmed profile
+        patcher = patch.object(llm_brain, 'CONTEXT_PROFILES_ENABLED', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_load_brain_context(self):
         """Test that load_brain_context reads files from the brain directory."""
         context = llm_brain.load_brain_context()
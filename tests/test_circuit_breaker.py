@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from brain_fixtures import isolated_brain
+
+def _state(breaker, provider, model):
+    return next(h for h in breaker.get_health() if h["provider"] == provider and h["model"] == model)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        for _ in range(3):
+            self.assertTrue(breaker.allow("gemini", "flash"))
+            breaker.record_failure("gemini", "flash", 1.0)
+        self.assertFalse(breaker.allow("gemini", "flash"))
+        self.assertEqual(_state(breaker, "gemini", "flash")["state"], OPEN)
+        self.assertTrue(breaker.allow("gemini", "pro"))  # tracked per model
+
+    def test_opens_on_error_rate(self):
+        breaker = CircuitBreaker(failure_threshold=100, min_calls=10, error_rate_threshold=0.5)
+        for i in range(10):
+            if i % 2:
+                breaker.record_failure("openrouter", "free")
+            else:
+                breaker.record_success("openrouter", "free", 0.5)
+        self.assertEqual(_state(breaker, "openrouter", "free")["state"], OPEN)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, probe_interval=10)
+        breaker.record_failure("gemini", "flash")
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow("gemini", "flash"))   # the probe
+        self.assertFalse(breaker.allow("gemini", "flash"))  # one probe per interval
+        self.assertEqual(_state(breaker, "gemini", "flash")["state"], HALF_OPEN)
+
+        breaker.record_failure("gemini", "flash")
+        self.assertEqual(_state(breaker, "gemini", "flash")["state"], OPEN)
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow("gemini", "flash"))
+        breaker.record_success("gemini", "flash", 0.3)
+        health = _state(breaker, "gemini", "flash")
+        self.assertEqual(health["state"], CLOSED)
+        self.assertEqual(health["error_rate"], 0.0)
+
+    def test_order_moves_unhealthy_providers_back(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+        chain = [("gemini", "k", True, {"model": "flash"}), ("openrouter", "k", True, {"model": "free"})]
+        self.assertEqual(breaker.order(chain), chain)
+
+        breaker.record_failure("gemini", "flash")
+        self.assertEqual([p[0] for p in breaker.order(chain)], ["openrouter", "gemini"])
+
+    def test_seed_replays_outcomes(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+        now = time.time()
+        count = breaker.seed([
+            ("gemini", "flash", True, 0.4, now - 30),
+            ("gemini", "flash", False, 2.0, now - 20),
+            ("gemini", "flash", False, 2.0, now - 10),
+        ])
+        self.assertEqual(count, 3)
+        health = _state(breaker, "gemini", "flash")
+        self.assertEqual(health["state"], OPEN)
+        self.assertAlmostEqual(health["retry_in"], 50, delta=1)
+
+class TestGenerateTextWithBreaker(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, circuit_breaker=CircuitBreaker(failure_threshold=2, cooldown=60))
+        self.tier = llm_brain.CapabilityTier.PERSONA  # gemini, then openrouter
+
+    def test_open_circuit_skips_failing_provider(self):
+        gemini = MagicMock(side_effect=Exception("503 Service Unavailable"))
+        openrouter = MagicMock(return_value=("from openrouter", {}))
+        with patch('llm_brain._call_gemini', gemini), patch('llm_brain._call_openrouter', openrouter):
+            for i in range(4):
+                self.assertEqual(llm_brain.generate_text(f"Say hello {i}", tier=self.tier), "from openrouter")
+
+        # Tripped after two failures; later requests go straight to openrouter
+        self.assertEqual(gemini.call_count, 2)
+        self.assertEqual(openrouter.call_count, 4)
+        self.assertEqual(openrouter.call_args_list[-1].args[3]["model"], llm_brain.OPENROUTER_FREE_CONFIG["model"])
+
+if __name__ == '__main__':
+    unittest.main()
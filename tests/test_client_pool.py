@@ -0,0 +1,40 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.client_pool import ProviderClientRegistry
+
+class TestProviderClientRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ProviderClientRegistry()
+        self.factory = MagicMock(side_effect=lambda key, registry: MagicMock(name=f"client-{key}"))
+        self.registry.register_factory("openrouter", self.factory)
+
+    def test_client_is_reused_for_same_key(self):
+        first = self.registry.get("openrouter", "key-a")
+        second = self.registry.get("openrouter", "key-a")
+        self.assertIs(first, second)
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertEqual(self.registry.get_stats()["reused"], 1)
+
+    def test_key_change_closes_stale_client(self):
+        old = self.registry.get("openrouter", "key-a")
+        new = self.registry.get("openrouter", "key-b")
+        self.assertIsNot(old, new)
+        old.close.assert_called_once()
+
+    def test_refresh_rebuilds_client(self):
+        old = self.registry.get("openrouter", "key-a")
+        self.registry.refresh("openrouter")
+        self.assertIsNot(self.registry.get("openrouter", "key-a"), old)
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_unknown_provider_raises(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("claude", "key-a")
+
+if __name__ == '__main__':
+    unittest.main()
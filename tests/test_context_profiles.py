@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.brain_context import BrainContextCache
+from core.context_profiles import ContextProfile, compact_sections, estimate_tokens, outline
+from brain_fixtures import isolated_brain
+
+SOUL = "# Soul\nYou are warm and direct.\nMore detail here.\n\n## Tone\nShort sentences.\nNo jargon.\n" + "Filler line.\n" * 200
+
+class TestCompaction(unittest.TestCase):
+    def test_outline_keeps_headings_and_first_lines(self):
+        self.assertEqual(outline(SOUL), "# Soul\nYou are warm and direct.\n## Tone\nShort sentences.")
+
+    def test_sections_fit_budget_in_priority_order(self):
+        sections = [("SOUL.md", SOUL), ("USER.md", "".join(f"## Contact {i}\nphone\n" for i in range(50))), ("AGENTS.md", "agents")]
+        texts, actions = compact_sections(sections, token_budget=60)
+
+        self.assertEqual(actions["SOUL.md"], "outline")
+        self.assertEqual(actions["USER.md"], "truncated")
+        self.assertEqual(actions["AGENTS.md"], "dropped")
+        self.assertLessEqual(sum(estimate_tokens(t) for t in texts), 62)
+
+    def test_no_budget_keeps_everything(self):
+        texts, actions = compact_sections([("SOUL.md", SOUL)], token_budget=None)
+        self.assertEqual(texts, [SOUL])
+        self.assertEqual(actions, {"SOUL.md": "full"})
+
+    def test_overrides_only_tighten(self):
+        profile = ContextProfile("persona", ["SOUL.md"], token_budget=2000, max_output_tokens=1024)
+        narrowed = profile.with_overrides("whatsapp", token_budget=5000, max_output_tokens=800)
+        self.assertEqual(narrowed.name, "persona+whatsapp")
+        self.assertEqual(narrowed.token_budget, 2000)
+        self.assertEqual(narrowed.max_output_tokens, 800)
+
+class TestProfiledInstruction(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name, content in [("SOUL.md", SOUL), ("USER.md", "Name: Sam"), ("AGENTS.md", "agent notes")]:
+            with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        self.cache = BrainContextCache(self.tmp.name, check_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_profile_selects_sections_and_reports_savings(self):
+        profile = ContextProfile("utility", ["USER.md"], token_budget=100)
+        instruction, saved = self.cache.get_profiled_instruction("Be brief.", profile)
+
+        self.assertIn("--- USER.md ---", instruction)
+        self.assertNotIn("SOUL.md", instruction)
+        self.assertTrue(instruction.endswith("--- TASK INSTRUCTION ---\nBe brief."))
+        self.assertGreater(saved, 500)
+
+        self.assertEqual(self.cache.get_profiled_instruction("Be brief.", profile), (instruction, saved))
+        self.assertEqual(self.cache.get_stats()["profiled_builds"], 1)
+
+    def test_no_profile_is_full_context(self):
+        instruction, saved = self.cache.get_profiled_instruction(None, None)
+        self.assertEqual(instruction, self.cache.get_context())
+        self.assertEqual(saved, 0)
+
+class TestProfilesInGenerateText(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmp.name, "SOUL.md"), "w", encoding="utf-8") as f:
+            f.write(SOUL)
+        with open(os.path.join(self.tmp.name, "USER.md"), "w", encoding="utf-8") as f:
+            f.write("Name: Sam")
+        isolated_brain(self, brain_context_cache=BrainContextCache(self.tmp.name, check_interval=0))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_utility_call_is_trimmed_and_capped(self):
+        openrouter = MagicMock(return_value=("pong", {}))
+        with patch('llm_brain._call_openrouter', openrouter):
+            llm_brain.generate_text("ping", tier=llm_brain.CapabilityTier.UTILITY, channel="whatsapp")
+
+        _, _, system_instruction, config = openrouter.call_args.args
+        self.assertNotIn("USER.md", system_instruction)
+        self.assertEqual(config["max_output_tokens"], 512)
+
+        log = llm_brain.traffic_logger.log_traffic.call_args.kwargs
+        self.assertEqual(log["context_profile"], "utility+whatsapp")
+        self.assertGreater(log["context_tokens_saved"], 0)
+
+    def test_task_instruction_keeps_provider_output_default(self):
+        gemini = MagicMock(return_value=("schedule", {}))
+        with patch('llm_brain._call_gemini', gemini):
+            llm_brain.generate_text("plan my day", tier=llm_brain.CapabilityTier.PERSONA,
+                                    system_instruction="Make a schedule.")
+        self.assertNotIn("max_output_tokens", gemini.call_args.args[3])
+
+if __name__ == '__main__':
+    unittest.main()
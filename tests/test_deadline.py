@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.deadline import Deadline, DeadlineExceeded
+from core.tool_registry import BaseTool, ToolRegistry
+from brain_fixtures import isolated_brain
+
+class SlowTool(BaseTool):
+    name = "slow"
+    description = "Sleeps"
+
+    def execute(self, seconds=0.0, **kwargs):
+        time.sleep(seconds)
+        return "done"
+
+class TestDeadline(unittest.TestCase):
+    def test_unbounded(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired())
+        self.assertTrue(deadline.allows(1e9))
+        self.assertEqual(deadline.timeout(30), 30)
+        deadline.check()
+
+    def test_budget_runs_out(self):
+        deadline = Deadline(0.05)
+        self.assertTrue(deadline.allows(0.01))
+        self.assertLessEqual(deadline.timeout(30), 0.05)
+        time.sleep(0.06)
+        self.assertTrue(deadline.expired())
+        self.assertEqual(deadline.remaining(), 0.0)
+        self.assertFalse(deadline.allows(0.01))
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+    def test_resolve_prefers_existing_deadline(self):
+        deadline = Deadline(5)
+        self.assertIs(Deadline.resolve(deadline, timeout=1), deadline)
+        self.assertEqual(Deadline.resolve(None, timeout=1).budget, 1)
+
+class TestToolDeadline(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry()
+        self.registry.register_tool(SlowTool())
+
+    def test_without_deadline_runs_inline(self):
+        self.assertEqual(self.registry.execute_tool("slow"), "done")
+
+    def test_gives_up_when_deadline_runs_out(self):
+        start = time.time()
+        result = self.registry.execute_tool("slow", deadline=Deadline(0.1), seconds=1.0)
+        self.assertIn("timed out", result)
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_expired_deadline_skips_tool(self):
+        deadline = Deadline(0)
+        self.assertIn("deadline exceeded", self.registry.execute_tool("slow", deadline=deadline))
+
+class TestGenerateTextDeadline(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self)
+        self.tier = llm_brain.CapabilityTier.PERSONA  # gemini, then openrouter
+
+    def _statuses(self):
+        return [c.kwargs["status"].split(":")[0] for c in llm_brain.traffic_logger.log_traffic.call_args_list]
+
+    def test_attempt_timeout_is_capped_by_remaining_budget(self):
+        with patch('llm_brain._call_gemini', return_value=("ok", {})) as gemini:
+            llm_brain.generate_text("Say hello", tier=self.tier, deadline=Deadline(10))
+        timeout = gemini.call_args.args[3]["timeout"]
+        self.assertLessEqual(timeout, 10)
+        self.assertGreater(timeout, 9)
+
+        with patch('llm_brain._call_gemini', return_value=("ok", {})) as gemini:
+            llm_brain.generate_text("Say hello again", tier=self.tier)
+        self.assertEqual(gemini.call_args.args[3]["timeout"], llm_brain.PROVIDER_TIMEOUTS["gemini"])
+
+    def test_no_fallback_without_enough_budget(self):
+        with patch('llm_brain._call_gemini', side_effect=Exception("503")), \
+             patch('llm_brain._call_openrouter', return_value=("from openrouter", {})) as openrouter:
+            result = llm_brain.generate_text("Say hello", tier=self.tier, deadline=Deadline(1.0))
+
+        openrouter.assert_not_called()
+        self.assertIn("deadline of 1.0s exceeded before trying openrouter", result)
+        self.assertEqual(self._statuses(), ["error", llm_brain.DEADLINE_STATUS])
+
+    def test_timeout_after_deadline_is_logged_as_deadline_status(self):
+        def slow_timeout(*args):
+            time.sleep(0.1)
+            raise Exception("Read timed out")
+
+        breaker = llm_brain.circuit_breaker
+        with patch('llm_brain._call_gemini', side_effect=slow_timeout), \
+             patch('llm_brain._call_openrouter') as openrouter:
+            result = llm_brain.generate_text("Say hello", tier=self.tier, deadline=Deadline(0.05))
+
+        self.assertTrue(result.startswith("Brain Failure"))
+        openrouter.assert_not_called()
+        self.assertEqual(self._statuses()[0], llm_brain.DEADLINE_STATUS)
+        # Cut short by our own budget: not held against the provider
+        self.assertTrue(all(h["calls"] == 0 for h in breaker.get_health()))
+
+    def test_expired_deadline_stops_agent_steps(self):
+        agent = llm_brain.AgentLoop.__new__(llm_brain.AgentLoop)
+        agent.goal = "check my calendar"
+        agent.memory = MagicMock(get_context=MagicMock(return_value={}))
+        agent.registry = MagicMock(list_tools=MagicMock(return_value=[]))
+        agent.history = []
+
+        with patch('llm_brain.CORE_AVAILABLE', True), \
+             patch('llm_brain.generate_text') as generate:
+            result = agent.run(max_steps=3, deadline=Deadline(0))
+
+        generate.assert_not_called()
+        self.assertIn("Deadline exceeded", result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.traffic_logger import TrafficLogger
+from brain_fixtures import isolated_brain
+
+def _reply(text, delay=0.0, error=None):
+    def call(api_key, prompt, system_instruction=None, config=None):
+        time.sleep(delay)
+        if error:
+            raise Exception(error)
+        return text, {"prompt_tokens": 10, "completion_tokens": 5}
+    return call
+
+def _reply_async(text, delay=0.0, error=None):
+    async def call(api_key, prompt, system_instruction=None, config=None):
+        await asyncio.sleep(delay)
+        if error:
+            raise Exception(error)
+        return text, {"prompt_tokens": 10, "completion_tokens": 5}
+    return call
+
+class TestLatencyPercentile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logger = TrafficLogger(os.path.join(self.tmp.name, "traffic.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_p90_over_successful_calls(self):
+        for i in range(1, 11):
+            self.logger.log_traffic("p", "r", "gemini", "m", latency=float(i))
+        self.logger.log_traffic("p", "", "gemini", "m", latency=99.0, status="error: boom")
+        self.logger.log_traffic("p", "r", "gemini", "m", latency=50.0, ttft=0.1)  # streams excluded
+        self.logger.log_traffic("p", "r", "gemini", "other", latency=70.0)
+
+        self.assertEqual(self.logger.get_latency_percentile("gemini", "m", 0.9, min_samples=5), 9.0)
+        self.assertIsNone(self.logger.get_latency_percentile("gemini", "m", 0.9, min_samples=20))
+
+class TestHedgedGeneration(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, hedge_delay=MagicMock(return_value=0.1), HEDGED_TIERS={llm_brain.CapabilityTier.PERSONA})
+        self.tier = llm_brain.CapabilityTier.PERSONA  # gemini, then openrouter
+
+    def _logs(self):
+        return {c.kwargs["provider"]: c.kwargs for c in llm_brain.traffic_logger.log_traffic.call_args_list}
+
+    def test_fast_primary_is_not_hedged(self):
+        with patch('llm_brain._call_gemini', _reply("from gemini")), \
+             patch('llm_brain._call_openrouter', MagicMock()) as openrouter:
+            result = llm_brain.generate_text("Say hello", tier=self.tier)
+
+        self.assertEqual(result, "from gemini")
+        openrouter.assert_not_called()
+        self.assertEqual(self._logs()["gemini"]["hedged"], 0)
+
+    def test_slow_primary_is_hedged_and_backup_wins(self):
+        with patch('llm_brain._call_gemini', _reply("from gemini", delay=0.5)), \
+             patch('llm_brain._call_openrouter', _reply("from openrouter")):
+            start = time.time()
+            result = llm_brain.generate_text("Say hello", tier=self.tier)
+            elapsed = time.time() - start
+            time.sleep(0.6)  # let the loser finish and log
+
+        self.assertEqual(result, "from openrouter")
+        self.assertLess(elapsed, 0.4)
+        logs = self._logs()
+        self.assertEqual(logs["openrouter"]["status"], "success")
+        self.assertEqual(logs["openrouter"]["hedged"], 1)
+        self.assertEqual(logs["gemini"]["status"], "hedge_lost")
+        self.assertEqual(logs["gemini"]["hedged"], 1)
+
+    def test_primary_failure_still_falls_back(self):
+        with patch('llm_brain._call_gemini', _reply(None, error="503")), \
+             patch('llm_brain._call_openrouter', _reply("from openrouter")):
+            result = llm_brain.generate_text("Say hello", tier=self.tier)
+
+        self.assertEqual(result, "from openrouter")
+        self.assertTrue(self._logs()["gemini"]["status"].startswith("error"))
+
+    def test_async_hedge_cancels_loser(self):
+        cancelled = []
+
+        async def slow_gemini(api_key, prompt, system_instruction=None, config=None):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        with patch('llm_brain._call_gemini_async', slow_gemini), \
+             patch('llm_brain._call_openrouter_async', _reply_async("from openrouter")):
+            async def scenario():
+                result = await llm_brain.generate_text_async("Say hello", tier=self.tier)
+                await asyncio.sleep(0)  # let the cancellation land
+                return result
+            result = asyncio.run(scenario())
+
+        self.assertEqual(result, "from openrouter")
+        self.assertEqual(cancelled, [True])
+        logs = self._logs()
+        self.assertEqual(logs["gemini"]["status"], "hedge_lost")
+        self.assertEqual(logs["openrouter"]["hedged"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import datetime
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.agent_services import AgentServices
+from core.intent_router import IntentRouter
+from core.tool_registry import BaseTool, CalendarTool, ToolRegistry
+from brain_fixtures import isolated_brain
+
+CONTACTS = {"Sam": "15550100"}
+
+
+class FakeCalendarTool(BaseTool):
+    name = "get_calendar_events"
+    description = "Calendar"
+
+    def __init__(self, result="Upcoming Events:\n- 10:00 to 11:00: Standup"):
+        self.result = result
+        self.calls = []
+
+    def execute(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.result
+
+
+class TestIntentRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = IntentRouter()
+
+    def match(self, prompt):
+        m = self.router.match(prompt, contacts=CONTACTS)
+        return m and (m.intent, m.tool, m.args)
+
+    def test_calendar_intents(self):
+        self.assertEqual(self.match("What's on my calendar today?"),
+                         ("calendar_today", "get_calendar_events", {"day": "today"}))
+        self.assertEqual(self.match("what do I have tomorrow"),
+                         ("calendar_tomorrow", "get_calendar_events", {"day": "tomorrow"}))
+        self.assertEqual(self.match("show my schedule"), ("calendar_today", "get_calendar_events", {"day": "today"}))
+
+    def test_other_days_and_impersonal_questions_go_to_the_agent(self):
+        for prompt in ["What is on my calendar on Friday?", "Do I have any meetings next week?",
+                       "my schedule for March 3", "list my appointments for next Monday",
+                       "what do I have the day after tomorrow", "show my calendar for 2026-03-03",
+                       "Any events in Boston this weekend?", "is my calendar connected?"]:
+            self.assertIsNone(self.match(prompt), prompt)
+        self.assertEqual(self.match("Do I have any meetings today?")[:2], ("calendar_today", "get_calendar_events"))
+
+    def test_contacts_are_only_loaded_for_whatsapp_names(self):
+        contacts = MagicMock(return_value=CONTACTS)
+        self.router.match("what's on my calendar today", contacts=contacts)
+        self.router.match("read whatsapp from +1 555 010 0199", contacts=contacts)
+        contacts.assert_not_called()
+        self.assertEqual(self.router.match("read whatsapp from Sam", contacts=contacts).args, {"to": "15550100"})
+        contacts.assert_called_once()
+
+    def test_whatsapp_history(self):
+        self.assertEqual(self.match("read my WhatsApp messages from Sam"),
+                         ("whatsapp_history", "read_whatsapp", {"to": "15550100"}))
+        self.assertEqual(self.match("last 10 whatsapp messages with +1 555 010 0199"),
+                         ("whatsapp_history", "read_whatsapp", {"to": "+15550100199", "limit": 10}))
+        # Unknown contact: the agent has to work it out
+        self.assertIsNone(self.match("read my whatsapp messages from Alex"))
+
+    def test_anything_beyond_one_lookup_is_left_to_the_agent(self):
+        for prompt in ["schedule a meeting tomorrow", "am I free tomorrow at 3pm?",
+                       "check my calendar and email Bob", "send a whatsapp to Sam",
+                       "what's on my calendar today and tomorrow", "hey how are you",
+                       "what do I have to buy today",
+                       "look at my calendar for today and find the best slot for a long call with the team"]:
+            self.assertIsNone(self.match(prompt), prompt)
+
+    def test_templates(self):
+        calendar = self.router.match("what's on my calendar today")
+        self.assertEqual(calendar.format("Upcoming Events:\n- 10:00 to 11:00: Standup"),
+                         "Here's your calendar today:\n- 10:00 to 11:00: Standup")
+        self.assertEqual(calendar.format("No upcoming events found."), "You have nothing on your calendar today.")
+
+        whatsapp = self.router.match("read whatsapp from Sam", contacts=CONTACTS)
+        history = json.dumps([{"from": "15550100@c.us", "body": "running late", "timestamp": None},
+                              {"from": "me@c.us", "body": "no problem", "timestamp": None}])
+        self.assertEqual(whatsapp.format(history),
+                         "Latest WhatsApp messages with Sam:\n- Sam: running late\n- You: no problem")
+        self.assertEqual(whatsapp.format("not json"), "not json")
+
+    def test_stats(self):
+        self.router.match("what's on my calendar today")
+        self.router.match("hello")
+        self.router.record("calendar_today", 0.02)
+        self.router.record("calendar_today", 0.5, ok=False)
+        stats = self.router.get_stats()
+        self.assertEqual((stats["checked"], stats["hits"], stats["hit_rate"]), (2, 1, 0.5))
+        self.assertEqual(stats["intents"]["calendar_today"],
+                         {"hits": 1, "fallbacks": 1, "avg_latency": 0.02, "p95_latency": 0.02})
+
+    def test_calendar_day_resolution(self):
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        self.assertEqual(CalendarTool.resolve_day("tomorrow"), tomorrow)
+        self.assertEqual(CalendarTool.resolve_day("2026-03-01"), datetime.date(2026, 3, 1))
+        self.assertIsNone(CalendarTool.resolve_day(None))
+
+
+class TestFastPath(unittest.TestCase):
+    def setUp(self):
+        self.tool = FakeCalendarTool()
+        registry = ToolRegistry()
+        registry.register_tool(self.tool)
+        memory = MagicMock(get_context=MagicMock(return_value={"contacts": CONTACTS}))
+        self.provider = MagicMock(return_value=("Just standup at 10.", {}))
+        isolated_brain(
+            self,
+            CORE_AVAILABLE=True,
+            FAST_PATH_ENABLED=True,
+            agent_services=AgentServices(lambda: memory, lambda: registry),
+            intent_router=IntentRouter(),
+            _call_provider=self.provider,
+        )
+
+    def test_template_answer_makes_no_model_call(self):
+        with patch.object(llm_brain, "_run_agent") as agent:
+            result = llm_brain.generate_text("what's on my calendar today?")
+        self.assertEqual(result, "Here's your calendar today:\n- 10:00 to 11:00: Standup")
+        self.assertEqual(self.tool.calls, [{"day": "today"}])
+        agent.assert_not_called()
+        self.provider.assert_not_called()
+        entry = llm_brain.traffic_logger.log_traffic.call_args.kwargs
+        self.assertEqual((entry["provider"], entry["model"]), ("fast_path", "calendar_today"))
+        self.assertEqual(llm_brain.intent_router.get_stats()["hits"], 1)
+
+    def test_model_format_is_one_utility_call(self):
+        with patch.object(llm_brain, "FAST_PATH_FORMAT", "model"):
+            result = llm_brain.generate_text("what do I have tomorrow")
+        self.assertEqual(result, "Just standup at 10.")
+        self.provider.assert_called_once()
+        self.assertIn("Standup", self.provider.call_args.args[2])
+        self.assertEqual(self.tool.calls, [{"day": "tomorrow"}])
+
+    def test_tool_failure_falls_back_to_agent(self):
+        self.tool.result = "Error: Calendar module not available."
+        with patch.object(llm_brain, "_run_agent", MagicMock(return_value="agent answer")) as agent:
+            result = llm_brain.generate_text("what's on my calendar today?")
+        self.assertEqual(result, "agent answer")
+        agent.assert_called_once()
+        self.assertEqual(llm_brain.intent_router.get_stats()["intents"]["calendar_today"]["fallbacks"], 1)
+
+    def test_fast_path_is_not_an_agent_run(self):
+        llm_brain.generate_text("hey, how are you?")
+        # Plain chat only runs the router's regexes: nothing is built or loaded
+        self.assertFalse(llm_brain.agent_services.get_stats()["built"])
+        llm_brain.generate_text("what's on my calendar today?")
+        stats = llm_brain.agent_services.get_stats()
+        self.assertTrue(stats["built"])
+        self.assertEqual(stats["uses"], 0)
+
+    def test_stream_and_system_instruction(self):
+        self.assertEqual(list(llm_brain.generate_text_stream("show my calendar for today")),
+                         ["Here's your calendar today:\n- 10:00 to 11:00: Standup"])
+        # Callers with their own instructions never take the fast path
+        llm_brain.generate_text("what's on my calendar today?", system_instruction="Reply in French")
+        self.assertEqual(len(self.tool.calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
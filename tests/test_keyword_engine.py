@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.keyword_engine import KeywordEngine, load_keyword_tables, DEFAULT_KEYWORD_TABLES
+
+class TestKeywordEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = KeywordEngine()
+
+    def test_whole_words_only(self):
+        self.assertNotIn("coding", self.engine.scan("give me a rapid summary"))
+        self.assertIn("coding", self.engine.scan("which API should I call?"))
+        self.assertNotIn("greeting", self.engine.scan("this"))
+
+    def test_prefix_keywords(self):
+        self.assertIn("coding", self.engine.scan("Debugging the webhook"))
+        self.assertIn("brain", self.engine.scan("reschedule? no, just scheduling"))
+        self.assertNotIn("brain", self.engine.scan("reschedule"))
+
+    def test_phrases(self):
+        self.assertIn("visuals", self.engine.scan("Please create   image of a cat"))
+        self.assertIn("coding", self.engine.scan("can you fix bug #12"))
+        self.assertNotIn("coding", self.engine.scan("fix the bugle"))
+
+    def test_overlapping_keywords(self):
+        self.assertEqual(self.engine.scan("create image"), {"visuals", "brain"})
+        self.assertEqual(self.engine.scan("(github)"), {"coding"})
+
+    def test_long_repetitive_text(self):
+        log = "INFO request handled in 12ms path=/v1/chat\n" * 2000
+        self.assertEqual(self.engine.scan(log), frozenset())
+        self.assertEqual(self.engine.scan(log + "upstream=calendar-sync: debugging"), {"brain", "agent", "coding"})
+
+    def test_keyword_in_several_groups(self):
+        self.assertEqual(self.engine.scan("am I free at 3?") & {"brain", "agent"}, {"brain", "agent"})
+
+    def test_last_scan_is_reused(self):
+        prompt = "check my calendar"
+        first = self.engine.scan(prompt)
+        with patch.object(KeywordEngine, "_vocabulary", side_effect=AssertionError("rescanned")):
+            self.assertIs(self.engine.scan(prompt), first)
+
+    def test_tables_from_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump({"coding": ["kubernetes", "k8s"]}, f)
+        self.addCleanup(os.remove, f.name)
+
+        tables = load_keyword_tables(f.name)
+        self.assertEqual(tables["coding"], ["kubernetes", "k8s"])
+        self.assertEqual(tables["brain"], DEFAULT_KEYWORD_TABLES["brain"])
+
+        engine = KeywordEngine.from_file(f.name)
+        self.assertIn("coding", engine.scan("restart the k8s pods"))
+        self.assertNotIn("coding", engine.scan("debug this"))
+
+    def test_invalid_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(["not", "a", "table"], f)
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaises(ValueError):
+            load_keyword_tables(f.name)
+
+class TestClassifyTier(unittest.TestCase):
+    def test_tiers(self):
+        Tier = llm_brain.CapabilityTier
+        cases = [
+            ("hey", Tier.UTILITY),
+            ("create image of a sunset", Tier.VISUALS),
+            ("refactor the scheduler", Tier.CODING),
+            ("analyze " + "the quarterly numbers and the market " * 4, Tier.APEX),
+            ("am I busy tomorrow?", Tier.BRAIN),
+            ("give me a rapid summary of the news", Tier.PERSONA),
+        ]
+        for prompt, tier in cases:
+            self.assertEqual(llm_brain.classify_tier(prompt), tier, prompt)
+        self.assertEqual(llm_brain.classify_tier("debug this", {"is_automated": True}), Tier.UTILITY)
+
+    def test_agent_upgrade(self):
+        with patch.object(llm_brain, "CORE_AVAILABLE", True):
+            self.assertTrue(llm_brain._should_use_agent("what's on my calendar"))
+            self.assertFalse(llm_brain._should_use_agent("what's on my calendar", system_instruction="x"))
+            self.assertFalse(llm_brain._should_use_agent("tell me about the profile page"))
+
+if __name__ == '__main__':
+    unittest.main()
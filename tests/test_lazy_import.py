@@ -0,0 +1,37 @@
+import unittest
+import os
+import subprocess
+import sys
+
+BRAIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BRAIN_DIR)
+
+from core.lazy_import import LazyModule, module_available
+
+class TestLazyModule(unittest.TestCase):
+    def test_imports_on_first_use(self):
+        module = LazyModule("json")
+        self.assertFalse(module.loaded)
+        self.assertEqual(module.dumps([1]), "[1]")
+        self.assertTrue(module.loaded)
+
+    def test_missing_module_fails_on_use(self):
+        module = LazyModule("clawbrain_missing_sdk")
+        with self.assertRaises(ImportError):
+            module.Client()
+
+    def test_module_available(self):
+        self.assertTrue(module_available("json"))
+        self.assertFalse(module_available("clawbrain_missing_sdk"))
+        self.assertFalse(module_available("clawbrain_missing_sdk.types"))
+
+class TestStartupImports(unittest.TestCase):
+    def test_llm_brain_does_not_import_heavy_modules(self):
+        code = ("import sys, llm_brain; "
+                "print(sorted(m for m in ('anthropic', 'google.genai', 'requests', 'googleapiclient', 'numpy') "
+                "if m in sys.modules))")
+        out = subprocess.run([sys.executable, "-c", code], cwd=BRAIN_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "[]")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import llm_brain
+from core.mock_provider import MockProviderServer, LatencyDistribution
+from core.tool_registry import BaseTool, ToolRegistry
+from brain_fixtures import isolated_brain
+
+class EchoTool(BaseTool):
+    name = "echo"
+    description = "Returns its argument"
+
+    def execute(self, text="", **kwargs):
+        return f"echo:{text}"
+
+class TestLatencyDistribution(unittest.TestCase):
+    def test_shapes(self):
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution(0.25).sample(rng), 0.25)
+        self.assertTrue(all(0.1 <= LatencyDistribution("uniform:0.1,0.2").sample(rng) <= 0.2 for _ in range(50)))
+        self.assertTrue(all(LatencyDistribution("normal:0,1").sample(rng) >= 0 for _ in range(50)))
+        samples = sorted(LatencyDistribution("lognormal:0.5,0.3").sample(rng) for _ in range(501))
+        self.assertAlmostEqual(samples[250], 0.5, delta=0.05)
+
+    def test_invalid_specs(self):
+        for spec in ("gamma:1,2", "uniform:0.1", "fixed:fast"):
+            with self.assertRaises(ValueError):
+                LatencyDistribution(spec)
+
+class TestMockProviderServer(unittest.TestCase):
+    def setUp(self):
+        self.server = MockProviderServer({"seed": 1, "default": {"latency": 0, "chunk_delay": 0}}).start()
+        self.addCleanup(self.server.stop)
+        self.url = f"{self.server.url}/api/v1/chat/completions"
+
+    def chat(self, **payload):
+        return requests.post(self.url, json=dict({"model": "m", "messages": [{"role": "user", "content": "hi"}]},
+                                                 **payload), timeout=5)
+
+    def test_completion_and_stream(self):
+        data = self.chat().json()
+        self.assertEqual(data["choices"][0]["message"]["content"], "Mock openrouter reply to: hi")
+        self.assertGreater(data["usage"]["completion_tokens"], 0)
+
+        with self.chat(stream=True, stream_options={"include_usage": True}) as response:
+            lines = [line for line in response.iter_lines(decode_unicode=True) if line.startswith("data:")]
+        self.assertEqual(lines[-1], "data: [DONE]")
+        self.assertIn("usage", json.loads(lines[-2][5:]))
+
+    def test_script_and_rate_limits(self):
+        self.server.enqueue({"status": 429, "retry_after": 3}, {"provider": "gemini", "text": "not for openrouter"},
+                            {"tool": "echo", "args": {"text": "x"}})
+        response = self.chat()
+        self.assertEqual((response.status_code, response.headers["Retry-After"]), (429, "3"))
+        self.assertEqual(json.loads(self.chat().json()["choices"][0]["message"]["content"]),
+                         {"tool": "echo", "args": {"text": "x"}})
+        self.assertEqual(self.server.get_stats()["script_remaining"], 1)
+
+    def test_error_rate_and_runtime_config(self):
+        requests.post(f"{self.server.url}/mock/config", json={"default": {"error_rate": 1.0}}, timeout=5)
+        self.assertEqual(self.chat().status_code, 503)
+        self.assertEqual(requests.post(f"{self.server.url}/mock/config", json={"default": {"latency": "bogus"}},
+                                       timeout=5).status_code, 400)
+        self.server.reset()
+        self.server.configure({"default": {"latency": 0}})
+        self.assertEqual(self.chat().status_code, 200)
+        self.assertEqual(self.server.get_stats()["by_status"], {"200": 1})
+
+    def test_max_tokens_truncates(self):
+        self.server.enqueue({"text": "word " * 100})
+        choice = self.chat(max_tokens=5).json()["choices"][0]
+        self.assertEqual(choice["finish_reason"], "length")
+        self.assertLessEqual(len(choice["message"]["content"]), 20)
+
+    def test_latency(self):
+        self.server.configure({"providers": {"openrouter": {"latency": "fixed:0.2"}}})
+        start = time.time()
+        self.chat()
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+class TestBrainAgainstMock(unittest.TestCase):
+    """The generate_text pipeline and AgentLoop end to end, over HTTP, without API keys."""
+
+    def setUp(self):
+        self.server = MockProviderServer({"default": {"latency": 0}}).start()
+        self.addCleanup(self.server.stop)
+        isolated_brain(
+            self,
+            MOCK_PROVIDER_URL=self.server.url,
+            OPENROUTER_URL=f"{self.server.url}/api/v1/chat/completions",
+            get_api_key=llm_brain.get_api_key,
+        )
+
+    def test_missing_keys_use_mock_key(self):
+        with patch.dict(os.environ, {"OPENROUTER_API_KEY": ""}):
+            self.assertEqual(llm_brain.get_api_key("OPENROUTER_API_KEY"), llm_brain.MOCK_API_KEY)
+            with patch.object(llm_brain, "MOCK_PROVIDER_URL", ""):
+                self.assertIsNone(llm_brain.get_api_key("OPENROUTER_API_KEY"))
+
+    def test_generate_text(self):
+        with patch.object(llm_brain, "get_api_key", MagicMock(return_value=llm_brain.MOCK_API_KEY)):
+            self.assertEqual(llm_brain.generate_text("hey"), "Mock openrouter reply to: hey")
+        self.assertEqual(self.server.get_stats()["by_provider"]["openrouter"], 1)
+
+    def test_agent_loop_with_scripted_tool_call(self):
+        self.server.enqueue({"tool": "echo", "args": {"text": "ping"}}, {"text": "FINAL ANSWER: pong"})
+        registry = ToolRegistry()
+        registry.register_tool(EchoTool())
+        agent = llm_brain.AgentLoop.__new__(llm_brain.AgentLoop)
+        agent.goal = "ping"
+        agent.memory = MagicMock(get_context=MagicMock(return_value={}))
+        agent.registry = registry
+        agent.history = []
+
+        with patch.object(llm_brain, "CORE_AVAILABLE", True), \
+             patch.object(llm_brain, "classify_tier", return_value=llm_brain.CapabilityTier.UTILITY), \
+             patch.object(llm_brain, "get_api_key", MagicMock(return_value=llm_brain.MOCK_API_KEY)):
+            result = agent.run(max_steps=3)
+
+        self.assertIn("pong", result)
+        self.assertIn({"role": "user", "content": "Tool echo returned: echo:ping\nContinue."}, agent.history.messages)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.mock_provider import MockProviderServer
+from core.tool_registry import ToolRegistry
+from brain_fixtures import isolated_brain, point_providers_at
+
+Tier = llm_brain.CapabilityTier
+
+class TestResolveOutputBudget(unittest.TestCase):
+    def test_tier_and_channel(self):
+        self.assertEqual(llm_brain.resolve_output_budget(Tier.CODING, "api"), 8192)
+        self.assertEqual(llm_brain.resolve_output_budget(Tier.CODING, "whatsapp"), 800)
+        self.assertEqual(llm_brain.resolve_output_budget(Tier.UTILITY, "whatsapp"), 512)
+        self.assertEqual(llm_brain.resolve_output_budget(Tier.PERSONA, "discord"), 1024)
+
+    def test_channel_budget_replaces_tier_cap(self):
+        self.assertIsNone(llm_brain.resolve_output_budget(Tier.PERSONA, "cli"))
+        with patch.dict(llm_brain.CHANNEL_OUTPUT_BUDGETS, {"whatsapp": 300}):
+            self.assertEqual(llm_brain.resolve_output_budget(Tier.CODING, "whatsapp"), 300)
+
+    def test_applies_without_context_profiles(self):
+        with patch.object(llm_brain, "CONTEXT_PROFILES_ENABLED", False):
+            request = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA, channel="whatsapp")
+        self.assertIsNone(request.context_profile)
+        self.assertEqual(request.max_output_tokens, 800)
+
+class TestPreparedRequestLimits(unittest.TestCase):
+    def test_limits_reach_every_provider(self):
+        request = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA, channel="whatsapp",
+                                            stop_sequences=["</tool_call>"])
+        for _, _, _, config in request.providers:
+            self.assertEqual(config["max_output_tokens"], 800)
+            self.assertEqual(config["stop_sequences"], ["</tool_call>"])
+
+    def test_stop_sequences_change_keys(self):
+        plain = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA)
+        stopped = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA, stop_sequences=["</tool_call>"])
+        self.assertNotEqual(plain.cache_key, stopped.cache_key)
+        self.assertNotEqual(plain.flight_key, stopped.flight_key)
+        self.assertEqual(plain.cache_key, llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA).cache_key)
+
+    def test_output_cap_changes_keys(self):
+        capped = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA, channel="whatsapp")
+        uncapped = llm_brain.PreparedRequest("hello there", tier=Tier.PERSONA, channel="cli")
+        self.assertNotEqual(capped.flight_key, uncapped.flight_key)
+
+class TestCappedRepliesAreNotShared(unittest.TestCase):
+    def setUp(self):
+        self.provider = MagicMock(return_value=("A short story.", {}))
+        isolated_brain(self, _call_provider=self.provider)
+
+    def test_whatsapp_reply_is_not_served_to_cli(self):
+        for channel in ("whatsapp", "cli", "cli"):
+            llm_brain.generate_text("Tell me a long story about dragons", tier=Tier.PERSONA, channel=channel)
+        self.assertEqual(self.provider.call_count, 2)
+        caps = [c.args[4].get("max_output_tokens") for c in self.provider.call_args_list]
+        self.assertEqual(caps, [800, None])
+
+class TestProviderLimits(unittest.TestCase):
+    """Each provider's request carries the cap and stop sequences (checked against the mock server)."""
+
+    def setUp(self):
+        self.server = MockProviderServer({"default": {"latency": 0}}).start()
+        self.addCleanup(self.server.stop)
+        point_providers_at(self, self.server)
+
+    def test_stop_sequence_and_cap(self):
+        models = {"openrouter": "openrouter/free", "gemini": "gemini-2.0-flash-001", "claude": "claude-test"}
+        for name, model in models.items():
+            self.server.enqueue({"text": 'Checking. <tool_call>{"tool": "x"}</tool_call> and then more text'})
+            content, _ = llm_brain._call_provider(name, "budget-test-key", "hi", None,
+                                                  {"model": model, "stop_sequences": ["</tool_call>"]})
+            self.assertEqual(content, 'Checking. <tool_call>{"tool": "x"}', name)
+
+            self.server.enqueue({"text": "word " * 200})
+            content, usage = llm_brain._call_provider(name, "budget-test-key", "hi", None,
+                                                      {"model": model, "max_output_tokens": 10})
+            self.assertLessEqual(usage["completion_tokens"], 10, name)
+
+class TestAgentStopPolicy(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, CORE_AVAILABLE=True)
+        self.agent = llm_brain.AgentLoop.__new__(llm_brain.AgentLoop)
+        self.agent.goal = "check my calendar"
+        self.agent.memory = MagicMock(get_context=MagicMock(return_value={}))
+        self.agent.registry = ToolRegistry()
+        self.agent.registry.execute_tool = MagicMock(return_value="nothing today")
+        self.agent.history = []
+
+    def run_agent(self):
+        provider = MagicMock(side_effect=[('<tool_call>{"tool": "get_calendar_events", "args": {}}', {}),
+                                          ("FINAL ANSWER: free all day", {})])
+        with patch.object(llm_brain, "_call_provider", provider):
+            result = self.agent.run(max_steps=3)
+        return result, provider
+
+    def test_tool_calls_stop_at_closing_tag(self):
+        result, provider = self.run_agent()
+        self.assertIn("free all day", result)
+        self.agent.registry.execute_tool.assert_called_once()
+        _, _, _, system_instruction, config = provider.call_args_list[0].args
+        self.assertEqual(config["stop_sequences"], [llm_brain.AGENT_TOOL_CALL_CLOSE])
+        self.assertIn(llm_brain.AGENT_TOOL_CALL_OPEN, system_instruction)
+        # Task instructions keep the provider's default reply length
+        self.assertNotIn("max_output_tokens", config)
+
+    def test_policy_can_be_disabled(self):
+        with patch.object(llm_brain, "AGENT_STOP_SEQUENCES_ENABLED", False):
+            _, provider = self.run_agent()
+        _, _, _, system_instruction, config = provider.call_args_list[0].args
+        self.assertNotIn("stop_sequences", config)
+        self.assertNotIn(llm_brain.AGENT_TOOL_CALL_OPEN, system_instruction)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.deadline import Deadline
+from core.tool_registry import BaseTool, ToolRegistry
+from brain_fixtures import isolated_brain
+
+
+class SleepTool(BaseTool):
+    def __init__(self, name, timeout=None):
+        self._name = name
+        self.timeout = timeout
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def description(self):
+        return "Sleeps, then echoes its args"
+
+    def execute(self, seconds=0.0, **kwargs):
+        time.sleep(seconds)
+        return f"{self._name} done {kwargs}"
+
+
+class TestExecuteTools(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry()
+        for tool in [SleepTool("a"), SleepTool("b"), SleepTool("hangs", timeout=0.1)]:
+            self.registry.register_tool(tool)
+
+    def test_calls_run_concurrently_in_call_order(self):
+        calls = [("a", {"seconds": 0.3, "n": 1}), ("b", {"seconds": 0.1}), ("a", {"seconds": 0.2, "n": 2})]
+        start = time.perf_counter()
+        results = self.registry.execute_tools(calls)
+        wall = time.perf_counter() - start
+
+        self.assertEqual([r["result"] for r in results],
+                         ["a done {'n': 1}", "b done {}", "a done {'n': 2}"])
+        self.assertEqual([r["args"] for r in results], [args for _, args in calls])
+        self.assertLess(wall, 0.5)
+        self.assertGreater(sum(r["seconds"] for r in results), 0.55)
+
+    def test_per_tool_timeout(self):
+        start = time.perf_counter()
+        slow, fast = self.registry.execute_tools([("hangs", {"seconds": 1.0}), ("a", {})])
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIn("timed out after 0.1s (tool timeout)", slow["result"])
+        self.assertEqual(fast["result"], "a done {}")
+
+    def test_deadline_caps_every_call(self):
+        results = self.registry.execute_tools([("a", {"seconds": 1.0}), ("missing", {})], deadline=Deadline(0.1))
+        self.assertIn("(request deadline)", results[0]["result"])
+        self.assertEqual(results[1]["result"], "Error: Tool 'missing' not found.")
+
+    def test_hung_calls_do_not_block_later_ones(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        hung = SleepTool("hung", timeout=0.05)
+        hung.execute = lambda **kwargs: release.wait(10)
+        self.registry.register_tool(hung)
+        self.registry.register_tool(SleepTool("quick", timeout=1.0))
+
+        for _ in range(2):
+            results = self.registry.execute_tools([("hung", {})] * 6)
+            self.assertTrue(all("timed out" in r["result"] for r in results))
+        start = time.perf_counter()
+        self.assertEqual(self.registry.execute_tool("quick"), "quick done {}")
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+class TestAgentToolCalls(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, CORE_AVAILABLE=True)
+        self.agent = llm_brain.AgentLoop.__new__(llm_brain.AgentLoop)
+        self.agent.goal = "what's on today and did Sam write?"
+        self.agent.memory = MagicMock(get_context=MagicMock(return_value={}))
+        self.agent.registry = ToolRegistry()
+        self.agent.registry.register_tool(SleepTool("a"))
+        self.agent.registry.register_tool(SleepTool("b"))
+
+    def test_parse_tool_calls(self):
+        parse = llm_brain.AgentLoop._parse_tool_calls
+        self.assertEqual(parse('<tool_call>{"tool": "a", "args": {"x": 1}}'), [("a", {"x": 1})])
+        self.assertEqual(parse('Checking both. <tool_call>[{"tool": "a"}, {"tool": "b", "args": {"to": "Sam"}}]'),
+                         [("a", {}), ("b", {"to": "Sam"})])
+        self.assertEqual(parse('I have {no} tool to call'), [])
+        self.assertEqual(parse('FINAL ANSWER: {"summary": 1}'), [])
+
+    def test_step_runs_list_and_merges_results_in_order(self):
+        replies = [('<tool_call>[{"tool": "a", "args": {"seconds": 0.2}}, {"tool": "b", "args": {"n": 1}}]', {}),
+                   ("FINAL ANSWER: free, and Sam wrote", {})]
+        provider = MagicMock(side_effect=replies)
+        start = time.perf_counter()
+        with patch.object(llm_brain, "_call_provider", provider):
+            result = self.agent.run(max_steps=2)
+
+        self.assertEqual(result, "free, and Sam wrote")
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(provider.call_args_list[1].args[2],
+                         "Tool a returned: a done {}\n\nTool b returned: b done {'n': 1}\nContinue.")
+
+    def test_calls_past_the_cap_are_dropped(self):
+        calls = ", ".join('{"tool": "b", "args": {"n": %d}}' % n for n in range(6))
+        provider = MagicMock(side_effect=[(f"<tool_call>[{calls}]", {}), ("FINAL ANSWER: ok", {})])
+        with patch.object(llm_brain, "_call_provider", provider), \
+             patch.object(llm_brain, "AGENT_MAX_TOOL_CALLS", 2):
+            self.agent.run(max_steps=2)
+        self.assertEqual(provider.call_args_list[1].args[2].count("returned:"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
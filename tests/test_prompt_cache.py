@@ -0,0 +1,132 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from types import SimpleNamespace
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.brain_context import TASK_INSTRUCTION_MARKER, split_system_instruction
+from core.circuit_breaker import CircuitBreaker
+from core.prompt_cache import GeminiPromptCache
+from core.response_cache import ResponseCache
+
+BRAIN = "--- SOUL.md ---\n" + "You are the brain.\n" * 400
+
+def _fake_client():
+    client = MagicMock()
+    names = iter(f"cachedContents/{i}" for i in range(100))
+    client.caches.create.side_effect = lambda model, config: SimpleNamespace(name=next(names))
+    return client
+
+class TestGeminiPromptCache(unittest.TestCase):
+    def test_created_once_per_version_and_stale_deleted(self):
+        cache = GeminiPromptCache(min_tokens=100)
+        client = _fake_client()
+
+        first = cache.get(client, "key", "gemini-2.0-flash-001", BRAIN, version=1)
+        self.assertEqual(cache.get(client, "key", "gemini-2.0-flash-001", BRAIN, version=1), first)
+        self.assertEqual(client.caches.create.call_count, 1)
+        self.assertEqual(client.caches.create.call_args.kwargs["config"]["system_instruction"], BRAIN)
+
+        # Brain files changed: old cached content is deleted, a new one created
+        second = cache.get(client, "key", "gemini-2.0-flash-001", BRAIN + "new fact", version=2)
+        self.assertNotEqual(second, first)
+        client.caches.delete.assert_called_once_with(name=first)
+        self.assertEqual(cache.get_stats()["entries"], 1)
+
+    def test_ttl_is_extended_before_expiry(self):
+        cache = GeminiPromptCache(ttl=100, refresh_margin=200, min_tokens=100)
+        client = _fake_client()
+        name = cache.get(client, "key", "m", BRAIN)
+        self.assertEqual(cache.get(client, "key", "m", BRAIN), name)
+        client.caches.update.assert_called_once_with(name=name, config={"ttl": "100s"})
+
+    def test_small_or_failing_instructions_are_sent_inline(self):
+        cache = GeminiPromptCache(min_tokens=100)
+        client = _fake_client()
+        self.assertIsNone(cache.get(client, "key", "m", "short"))
+
+        client.caches.create.side_effect = Exception("400 below minimum token count")
+        self.assertIsNone(cache.get(client, "key", "m", BRAIN))
+        self.assertIsNone(cache.get(client, "key", "m", BRAIN))
+        self.assertEqual(client.caches.create.call_count, 1)  # not retried right away
+        self.assertEqual(cache.get_stats()["failures"], 1)
+
+    def test_api_calls_run_outside_the_lock_once_per_key(self):
+        cache = GeminiPromptCache(min_tokens=100)
+        client = _fake_client()
+        creating, release = threading.Event(), threading.Event()
+        create = client.caches.create.side_effect
+
+        def slow_create(model, config):
+            if model == "slow":
+                creating.set()
+                release.wait(5)
+            return create(model, config)
+
+        client.caches.create.side_effect = slow_create
+        results = []
+        worker = threading.Thread(target=lambda: results.append(cache.get(client, "key", "slow", BRAIN)))
+        worker.start()
+        self.assertTrue(creating.wait(5))
+        # Other keys are served while the create call is in flight, the same key goes inline
+        self.assertIsNotNone(cache.get(client, "key", "fast", BRAIN))
+        self.assertIsNone(cache.get(client, "key", "slow", BRAIN))
+        release.set()
+        worker.join(5)
+
+        self.assertIsNotNone(results[0])
+        self.assertEqual(cache.get(client, "key", "slow", BRAIN), results[0])
+        self.assertEqual(client.caches.create.call_count, 2)
+        self.assertEqual(cache.get_stats()["in_flight"], 1)
+
+class TestProviderCaching(unittest.TestCase):
+    def test_split_system_instruction(self):
+        self.assertEqual(split_system_instruction(BRAIN), (BRAIN, ""))
+        context, task = split_system_instruction(f"{BRAIN}{TASK_INSTRUCTION_MARKER}Be brief.")
+        self.assertEqual(context, BRAIN)
+        self.assertEqual(task, "--- TASK INSTRUCTION ---\nBe brief.")
+
+    def test_claude_breakpoint_after_brain_context(self):
+        blocks = llm_brain._claude_system(f"{BRAIN}{TASK_INSTRUCTION_MARKER}Be brief.")
+        self.assertEqual(blocks[0], {"type": "text", "text": BRAIN, "cache_control": {"type": "ephemeral"}})
+        self.assertEqual(blocks[1], {"type": "text", "text": "--- TASK INSTRUCTION ---\nBe brief."})
+
+    def test_usage_is_normalized(self):
+        gemini = SimpleNamespace(prompt_token_count=1200, cached_content_token_count=1000, candidates_token_count=50)
+        self.assertEqual(llm_brain._gemini_usage(gemini),
+                         {"prompt_tokens": 200, "completion_tokens": 50, "cache_read_tokens": 1000})
+
+        claude = SimpleNamespace(input_tokens=20, output_tokens=50, cache_read_input_tokens=1000,
+                                 cache_creation_input_tokens=None)
+        self.assertEqual(llm_brain._claude_usage(claude),
+                         {"prompt_tokens": 20, "completion_tokens": 50, "cache_read_tokens": 1000, "cache_write_tokens": 0})
+
+    def test_cached_tokens_are_discounted(self):
+        full = llm_brain.estimate_cost("claude-3-opus", 1000, 0)
+        self.assertAlmostEqual(llm_brain.estimate_cost("claude-3-opus", 0, 0, cache_read_tokens=1000), full * 0.10)
+        self.assertAlmostEqual(llm_brain.estimate_cost("claude-3-opus", 0, 0, cache_write_tokens=1000), full * 1.25)
+        full = llm_brain.estimate_cost("gemini-2.0-flash-001", 1000, 0)
+        self.assertAlmostEqual(llm_brain.estimate_cost("gemini-2.0-flash-001", 0, 0, cache_read_tokens=1000), full * 0.25)
+
+    def test_cache_reads_are_logged(self):
+        usage = {"prompt_tokens": 200, "completion_tokens": 50, "cache_read_tokens": 1000}
+        with patch.object(llm_brain, 'response_cache', ResponseCache(db_path=None)), \
+             patch.object(llm_brain, 'traffic_logger', MagicMock()), \
+             patch.object(llm_brain, 'TRAFFIC_LOGGING_AVAILABLE', True), \
+             patch.object(llm_brain, 'get_api_key', MagicMock(return_value="fake_key")), \
+             patch.object(llm_brain, 'ADAPTIVE_ROUTING_ENABLED', False), \
+             patch.object(llm_brain, 'circuit_breaker', CircuitBreaker()), \
+             patch('llm_brain._call_gemini', MagicMock(return_value=("hi", usage))):
+            llm_brain.generate_text("tell me a story", tier=llm_brain.CapabilityTier.PERSONA)
+            log = llm_brain.traffic_logger.log_traffic.call_args.kwargs
+
+        self.assertEqual(log["tokens_in"], 1200)
+        self.assertEqual(log["cache_read_tokens"], 1000)
+        self.assertAlmostEqual(log["cost"], llm_brain.estimate_cost("gemini-2.5-flash-lite", 200, 50, 1000))
+
+if __name__ == '__main__':
+    unittest.main()
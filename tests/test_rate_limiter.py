@@ -0,0 +1,182 @@
+import random
+import unittest
+from email.utils import formatdate
+from types import SimpleNamespace
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.deadline import Deadline
+from core.mock_provider import MockProviderServer
+from core.rate_limiter import (RateLimited, RateLimiter, RateLimitExceeded, backoff_delay, parse_retry_after,
+                               rate_limit_info)
+from brain_fixtures import isolated_brain, point_providers_at
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter({"gemini": {"rpm": 6, "tpm": 600}}, {"fast-model": {"rpm": 600}},
+                                   clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_paced_in_arrival_order(self):
+        waits = [self.limiter.reserve("gemini", "m", "key") for _ in range(8)]
+        self.assertEqual(waits[:6], [0.0] * 6)
+        # 6 rpm refills one request every 10s; queued callers are spaced out
+        self.assertAlmostEqual(waits[6], 10.0)
+        self.assertAlmostEqual(waits[7], 20.0)
+
+    def test_tokens_per_minute(self):
+        self.assertEqual(self.limiter.reserve("gemini", "m", "key", tokens=500), 0.0)
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key", tokens=200), 10.0)
+
+    def test_max_wait_rejects_without_reserving(self):
+        for _ in range(6):
+            self.limiter.reserve("gemini", "m", "key")
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            self.limiter.reserve("gemini", "m", "key", max_wait=5)
+        self.assertAlmostEqual(ctx.exception.wait, 10.0)
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key", max_wait=10), 10.0)
+
+    def test_keys_models_and_providers_are_separate(self):
+        for _ in range(6):
+            self.limiter.reserve("gemini", "m", "key-a")
+        self.assertEqual(self.limiter.reserve("gemini", "m", "key-b"), 0.0)
+        self.assertEqual(self.limiter.reserve("gemini", "other", "key-a"), 0.0)
+        self.assertEqual(self.limiter.reserve("openrouter", "m", "key-a"), 0.0)  # no limits configured
+        stats = self.limiter.get_stats()
+        self.assertEqual(stats[f"gemini:m:{RateLimiter._fingerprint('key-a')[:8]}"]["rpm"], 6)
+        self.assertNotIn("key-a", str(stats))
+
+    def test_model_limits_override_provider(self):
+        waits = [self.limiter.reserve("gemini", "fast-model", "key") for _ in range(20)]
+        self.assertEqual(waits, [0.0] * 20)
+
+    def test_acquire_sleeps(self):
+        for _ in range(6):
+            self.limiter.acquire("gemini", "m", "key")
+        self.assertEqual(self.clock.now, 1000.0)
+        self.assertAlmostEqual(self.limiter.acquire("gemini", "m", "key"), 10.0)
+        self.assertAlmostEqual(self.clock.now, 1010.0)
+
+    def test_penalize_pauses_key_then_paces(self):
+        self.limiter.penalize("gemini", "m", "key", 30)
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key"), 30.0)
+        # No burst when the pause ends: later callers are paced at the refill rate
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key"), 40.0)
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key"), 50.0)
+        # Providers without configured limits are paused too
+        self.limiter.penalize("openrouter", "m", "key", 5)
+        self.assertAlmostEqual(self.limiter.reserve("openrouter", "m", "key"), 5.0)
+
+    def test_settle_corrects_token_estimate(self):
+        self.limiter.reserve("gemini", "m", "key", tokens=100)
+        self.limiter.settle("gemini", "m", "key", 500)  # the call used 600
+        self.assertAlmostEqual(self.limiter.reserve("gemini", "m", "key", tokens=100), 10.0)
+        self.limiter.settle("gemini", "m", "key", -700)
+        self.assertEqual(self.limiter.reserve("gemini", "m", "key", tokens=100), 0.0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertEqual(parse_retry_after(0.5), 0.5)
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 30, usegmt=True)), 30, delta=2)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_rate_limit_info(self):
+        self.assertEqual(rate_limit_info(RateLimited("429", 3.0)), (True, 3.0))
+        sdk_error = Exception("rate_limit_error")
+        sdk_error.status_code = 429
+        sdk_error.response = SimpleNamespace(headers={"retry-after": "4"})
+        self.assertEqual(rate_limit_info(sdk_error), (True, 4.0))
+        gemini_error = Exception("429 RESOURCE_EXHAUSTED. {'details': [{'retryDelay': '21s'}]}")
+        gemini_error.code = 429
+        self.assertEqual(rate_limit_info(gemini_error), (True, 21.0))
+        server_error = Exception("overloaded")
+        server_error.status_code = 529
+        self.assertEqual(rate_limit_info(server_error), (False, None))
+        self.assertEqual(rate_limit_info(ValueError("bad")), (False, None))
+
+    def test_backoff_delay(self):
+        rng = random.Random(0)
+        for attempt in range(6):
+            delay = backoff_delay(attempt, base=0.5, cap=4.0, rng=rng)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(4.0, 0.5 * 2 ** attempt))
+        delay = backoff_delay(0, retry_after=20, rng=rng)
+        self.assertGreaterEqual(delay, 20)
+        self.assertLessEqual(delay, 21)
+
+
+class TestProviderRateLimits(unittest.TestCase):
+    """429s from each provider (mock server) are recognized, retried and logged with the wait."""
+
+    def setUp(self):
+        self.server = MockProviderServer({"default": {"latency": 0}}).start()
+        self.addCleanup(self.server.stop)
+        point_providers_at(self, self.server)
+        isolated_brain(self, rate_limiter=RateLimiter(llm_brain.PROVIDER_RATE_LIMITS, llm_brain.MODEL_RATE_LIMITS))
+
+    def test_paid_accounts_are_not_throttled_by_default(self):
+        if os.environ.get("CLAWBRAIN_RATE_LIMITS_PRESET") or os.environ.get("CLAWBRAIN_GEMINI_RPM"):
+            self.skipTest("rate limits configured in the environment")
+        limiter = RateLimiter(llm_brain.PROVIDER_RATE_LIMITS, llm_brain.MODEL_RATE_LIMITS)
+        waits = [limiter.reserve("gemini", "gemini-2.0-flash-001", "key") for _ in range(100)]
+        self.assertEqual(max(waits), 0.0)
+        self.assertEqual(llm_brain.RATE_LIMIT_PRESETS["free-tier"]["gemini"]["rpm"], 15)
+
+    def test_every_provider_reports_retry_after(self):
+        models = {"openrouter": "openrouter/free", "gemini": "gemini-2.0-flash-001", "claude": "claude-test"}
+        for name, model in models.items():
+            # A single 429: an SDK retrying on its own would get the default reply instead
+            self.server.enqueue({"status": 429, "retry_after": 3})
+            with self.assertRaises(Exception) as ctx:
+                llm_brain._call_provider(name, "limit-test-key", "hi", None, {"model": model})
+            self.assertEqual(rate_limit_info(ctx.exception), (True, 3.0), name)
+
+    def test_429_retries_same_provider_after_retry_after(self):
+        self.server.enqueue({"status": 429, "retry_after": 0.3}, {"text": "answer after the pause"})
+        result = llm_brain.generate_text("hey", tier=llm_brain.CapabilityTier.UTILITY, deadline=Deadline(10))
+
+        self.assertEqual(result, "answer after the pause")
+        log = llm_brain.traffic_logger.log_traffic
+        log.assert_called_once()
+        entry = log.call_args.kwargs
+        self.assertEqual((entry["provider"], entry["status"]), ("openrouter", "success"))
+        self.assertGreaterEqual(entry["rate_limit_wait"], 0.3)
+        self.assertLess(entry["latency"], 0.3)  # queueing is not provider latency
+
+    def test_wait_beyond_deadline_falls_back(self):
+        model = llm_brain.TIER_MODELS[llm_brain.CapabilityTier.UTILITY]["config"]["model"]
+        llm_brain.rate_limiter.penalize("openrouter", model, "fake_key", 60)
+        self.server.enqueue({"text": "answer from the fallback"})
+        result = llm_brain.generate_text("hey", tier=llm_brain.CapabilityTier.UTILITY, deadline=Deadline(10))
+
+        self.assertEqual(result, "answer from the fallback")
+        first, second = [c.kwargs for c in llm_brain.traffic_logger.log_traffic.call_args_list]
+        self.assertEqual((first["provider"], first["status"]), ("openrouter", llm_brain.RATE_LIMITED_STATUS))
+        self.assertNotEqual(second["provider"], "openrouter")
+        self.assertEqual(second["status"], "success")
+        # Queueing says nothing about the provider's health
+        health = {(h["provider"], h["model"]): h for h in llm_brain.circuit_breaker.get_health()}
+        self.assertEqual(health[("openrouter", model)]["calls"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.request_timing import RequestTimings, parse_server_timing, timed, track_request
+from brain_fixtures import isolated_brain
+
+class TestRequestTimings(unittest.TestCase):
+    def test_nested_phases_are_exclusive(self):
+        timings = RequestTimings()
+        with timings.phase("provider"):
+            time.sleep(0.02)
+            with timings.phase("logging"):
+                time.sleep(0.02)
+        timings.finish()
+        ms = timings.as_ms()
+        self.assertAlmostEqual(ms["provider"], 20, delta=10)
+        self.assertAlmostEqual(ms["logging"], 20, delta=10)
+        self.assertAlmostEqual(ms["provider"] + ms["logging"] + ms["other"], ms["total"], delta=0.01)
+
+    def test_server_timing_round_trip(self):
+        timings = RequestTimings()
+        with timings.phase("classify"):
+            pass
+        parsed = parse_server_timing(timings.server_timing())
+        self.assertEqual(set(parsed), {"classify", "context", "cache", "provider", "tool", "logging", "other", "total"})
+        self.assertEqual(parse_server_timing('db;dur=5.5, miss, total;desc="x";dur=7'), {"db": 5.5})
+        self.assertEqual(parse_server_timing(None), {})
+
+    def test_timed_outside_request_is_noop(self):
+        with timed("provider"):
+            pass
+        with track_request() as timings:
+            with timed("tool"):
+                pass
+        self.assertIn("tool", timings.phases)
+
+class TestGenerateTextTimings(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self)
+
+    def test_phases_recorded(self):
+        def slow_provider(*args):
+            time.sleep(0.03)
+            return "hello", {}
+
+        with patch.object(llm_brain, "_call_provider", side_effect=slow_provider), track_request() as timings:
+            self.assertEqual(llm_brain.generate_text("write a caption for the listing"), "hello")
+        for phase in ("classify", "context", "provider", "logging"):
+            self.assertIn(phase, timings.phases)
+        self.assertGreaterEqual(timings.phases["provider"], 0.03)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.response_cache import ResponseCache
+from brain_fixtures import isolated_brain
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_model_system_and_prompt(self):
+        key = ResponseCache.make_key("m", "sys", "hi")
+        self.assertEqual(key, ResponseCache.make_key("m", "sys", "hi"))
+        self.assertNotEqual(key, ResponseCache.make_key("m2", "sys", "hi"))
+        self.assertNotEqual(key, ResponseCache.make_key("m", "sys2", "hi"))
+        self.assertNotEqual(key, ResponseCache.make_key("m", "sys", "hi!"))
+
+    def test_persistent_tier_survives_new_instance(self):
+        ResponseCache(self.db_path).set("k", "hello", ttl=60, model="m", cost=0.01)
+        entry = ResponseCache(self.db_path).get("k")
+        self.assertEqual(entry["response"], "hello")
+        self.assertAlmostEqual(entry["cost"], 0.01)
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(self.db_path)
+        cache.set("k", "hello", ttl=60)
+        with patch("core.response_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.get_stats()["expired"], 1)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(db_path=None, max_entries=2)
+        cache.set("a", "1", ttl=60)
+        cache.set("b", "2", ttl=60)
+        cache.get("a")
+        cache.set("c", "3", ttl=60)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+
+class TestGenerateTextCaching(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self)
+
+    @patch('llm_brain._call_gemini', return_value=("Hi Chris", {"prompt_tokens": 1000, "completion_tokens": 100}))
+    def test_repeat_prompt_is_served_from_cache(self, mock_gemini):
+        tier = llm_brain.CapabilityTier.PERSONA
+        first = llm_brain.generate_text("Tell me a joke", tier=tier)
+        second = llm_brain.generate_text("Tell me a joke", tier=tier)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_gemini.call_count, 1)
+
+        cache_log = llm_brain.traffic_logger.log_traffic.call_args_list[-1].kwargs
+        self.assertEqual(cache_log["provider"], "cache")
+        self.assertEqual(cache_log["cost"], 0)
+        self.assertGreater(cache_log["cost_saved"], 0)
+
+    @patch('llm_brain._call_gemini', return_value=("Hi Chris", {}))
+    def test_bypass_flag_skips_cache(self, mock_gemini):
+        tier = llm_brain.CapabilityTier.PERSONA
+        llm_brain.generate_text("Tell me a joke", tier=tier)
+        llm_brain.generate_text("Tell me a joke", tier=tier, bypass_cache=True)
+        self.assertEqual(mock_gemini.call_count, 2)
+
+    @patch('llm_brain._call_gemini', return_value=("Hi Chris", {}))
+    def test_zero_ttl_tier_is_not_cached(self, mock_gemini):
+        with patch.dict(llm_brain.RESPONSE_CACHE_TTLS, {llm_brain.CapabilityTier.PERSONA: 0}):
+            llm_brain.generate_text("Tell me a joke", tier=llm_brain.CapabilityTier.PERSONA)
+            llm_brain.generate_text("Tell me a joke", tier=llm_brain.CapabilityTier.PERSONA)
+        self.assertEqual(mock_gemini.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.semantic_cache import SemanticCache
+from brain_fixtures import isolated_brain
+
+class TestSemanticCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(capacity=8)
+
+    def test_near_duplicate_hits(self):
+        self.cache.add("ns", "what's on my calendar today", "3 meetings", ttl=60)
+        hit = self.cache.lookup("ns", "What is on my calendar today?", threshold=0.9)
+        self.assertEqual(hit["response"], "3 meetings")
+        self.assertGreaterEqual(hit["similarity"], 0.9)
+
+    def test_different_day_misses(self):
+        self.cache.add("ns", "am I free this afternoon", "yes", ttl=60)
+        self.assertIsNone(self.cache.lookup("ns", "am I free tomorrow afternoon", threshold=0.9))
+
+    def test_namespaces_are_isolated(self):
+        self.cache.add("ns-a", "status", "all good", ttl=60)
+        self.assertIsNone(self.cache.lookup("ns-b", "status", threshold=0.9))
+
+    def test_max_age_limits_freshness(self):
+        self.cache.add("ns", "status", "all good", ttl=600)
+        later = time.time() + 120
+        with patch("core.semantic_cache.time.time", return_value=later):
+            self.assertIsNotNone(self.cache.lookup("ns", "status", threshold=0.9))
+            self.assertIsNone(self.cache.lookup("ns", "status", threshold=0.9, max_age=60))
+
+    def test_ring_buffer_evicts_oldest(self):
+        cache = SemanticCache(capacity=2)
+        cache.add("ns", "first prompt", "1", ttl=60)
+        cache.add("ns", "second prompt", "2", ttl=60)
+        cache.add("ns", "third prompt", "3", ttl=60)
+        self.assertIsNone(cache.lookup("ns", "first prompt", threshold=0.99))
+
+
+class TestGenerateTextSemanticCache(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, semantic_cache=SemanticCache(capacity=16), TRAFFIC_LOGGING_AVAILABLE=False)
+
+    @patch('llm_brain._call_gemini', return_value=("Here's one", {}))
+    def test_paraphrase_served_from_semantic_cache(self, mock_gemini):
+        tier = llm_brain.CapabilityTier.PERSONA
+        llm_brain.generate_text("Tell me a joke please", tier=tier)
+        self.assertEqual(llm_brain.generate_text("tell me a joke!", tier=tier), "Here's one")
+        self.assertEqual(mock_gemini.call_count, 1)
+
+    @patch('llm_brain._call_gemini', return_value=("Here's one", {}))
+    def test_tool_dependent_tier_without_window_is_excluded(self, mock_gemini):
+        tier = llm_brain.CapabilityTier.PERSONA
+        with patch.object(llm_brain, 'TOOL_DEPENDENT_TIERS', {tier}), \
+             patch.dict(llm_brain.SEMANTIC_CACHE_FRESHNESS, {}, clear=True):
+            llm_brain.generate_text("Tell me a joke please", tier=tier)
+            llm_brain.generate_text("tell me a joke!", tier=tier)
+        self.assertEqual(mock_gemini.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.deadline import Deadline
+from core.single_flight import SingleFlight
+from brain_fixtures import isolated_brain
+
+def _run_concurrently(fn, n):
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return "answer"
+
+        results = _run_concurrently(lambda: flight.do("k", slow), 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        self.assertTrue(all(result == "answer" for result, _ in results))
+        self.assertEqual(flight.get_stats(), {"leaders": 1, "coalesced": 4, "wait_timeouts": 0, "in_flight": 0})
+
+    def test_exception_is_shared_and_key_released(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        errors = []
+        def follower():
+            started.wait()
+            try:
+                flight.do("k", failing)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        thread = threading.Thread(target=follower)
+        thread.start()
+        with self.assertRaises(RuntimeError):
+            flight.do("k", failing)
+        thread.join()
+
+        self.assertEqual(errors, ["boom"])
+        self.assertEqual(flight.do("k", lambda: "fresh"), ("fresh", False))
+
+    def test_follower_stops_waiting_on_a_hung_leader(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def hung():
+            started.set()
+            release.wait()
+            return "late"
+
+        leader = threading.Thread(target=flight.do, args=("k", hung))
+        leader.start()
+        started.wait()
+        try:
+            self.assertEqual(flight.do("k", lambda: "own", timeout=0.05), ("own", False))
+            self.assertEqual(flight.get_stats()["wait_timeouts"], 1)
+        finally:
+            release.set()
+            leader.join()
+
+class TestGenerateTextCoalescing(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self, single_flight=SingleFlight())
+        self.tier = llm_brain.CapabilityTier.PERSONA
+
+    def test_double_send_makes_one_provider_call(self):
+        def slow_gemini(*args):
+            time.sleep(0.2)
+            return "hello there", {}
+        gemini = MagicMock(side_effect=slow_gemini)
+
+        with patch('llm_brain._call_gemini', gemini):
+            results = _run_concurrently(
+                lambda: llm_brain.generate_text("note to self: buy milk", tier=self.tier, bypass_cache=True), 3)
+
+        self.assertEqual(results, ["hello there"] * 3)
+        self.assertEqual(gemini.call_count, 1)
+        self.assertEqual(llm_brain.single_flight.get_stats()["coalesced"], 2)
+
+    def test_wait_is_bounded_by_the_deadline(self):
+        started, release = threading.Event(), threading.Event()
+
+        def gemini(*args):
+            if not started.is_set():
+                started.set()
+                release.wait()
+                return "late", {}
+            return "fresh", {}
+
+        with patch('llm_brain._call_gemini', MagicMock(side_effect=gemini)) as mock_gemini:
+            leader = threading.Thread(target=llm_brain.generate_text, args=("note to self: buy milk",),
+                                      kwargs={"tier": self.tier, "bypass_cache": True})
+            leader.start()
+            started.wait()
+            try:
+                start = time.monotonic()
+                content = llm_brain.generate_text("note to self: buy milk", tier=self.tier, bypass_cache=True,
+                                                  deadline=Deadline(llm_brain.MIN_ATTEMPT_BUDGET + 0.1))
+                waited = time.monotonic() - start
+            finally:
+                release.set()
+                leader.join()
+
+        self.assertEqual(content, "fresh")
+        self.assertLess(waited, 1.0)
+        self.assertEqual(mock_gemini.call_count, 2)
+
+    def test_different_prompts_are_not_coalesced(self):
+        gemini = MagicMock(return_value=("ok", {}))
+        with patch('llm_brain._call_gemini', gemini):
+            llm_brain.generate_text("first", tier=self.tier)
+            llm_brain.generate_text("second", tier=self.tier)
+        self.assertEqual(gemini.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
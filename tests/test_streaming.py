@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from brain_fixtures import isolated_brain
+
+def _stream(*chunks, fail_after=None):
+    def gen(api_key, prompt, system_instruction=None, config=None, usage=None):
+        for i, chunk in enumerate(chunks):
+            if fail_after is not None and i == fail_after:
+                raise Exception("connection reset")
+            yield chunk
+        if fail_after is not None and fail_after >= len(chunks):
+            raise Exception("connection reset")
+        usage.update({"prompt_tokens": 10, "completion_tokens": len(chunks)})
+    return gen
+
+class TestGenerateTextStream(unittest.TestCase):
+    def setUp(self):
+        isolated_brain(self)
+        self.tier = llm_brain.CapabilityTier.PERSONA  # gemini, then openrouter
+
+    def test_chunks_are_yielded_and_ttft_logged(self):
+        with patch('llm_brain._stream_gemini', _stream("Hel", "lo")):
+            chunks = list(llm_brain.generate_text_stream("Say hello", tier=self.tier))
+        self.assertEqual(chunks, ["Hel", "lo"])
+
+        log = llm_brain.traffic_logger.log_traffic.call_args.kwargs
+        self.assertEqual(log["status"], "success")
+        self.assertEqual(log["response"], "Hello")
+        self.assertIsNotNone(log["ttft"])
+
+    def test_falls_back_when_failing_before_first_token(self):
+        with patch('llm_brain._stream_gemini', _stream("never", fail_after=0)), \
+             patch('llm_brain._stream_openrouter', _stream("from ", "fallback")):
+            chunks = list(llm_brain.generate_text_stream("Say hello", tier=self.tier))
+        self.assertEqual("".join(chunks), "from fallback")
+
+    def test_no_fallback_after_first_token(self):
+        fallback = MagicMock()
+        with patch('llm_brain._stream_gemini', _stream("partial", fail_after=1)), \
+             patch('llm_brain._stream_openrouter', fallback):
+            chunks = list(llm_brain.generate_text_stream("Say hello", tier=self.tier))
+        self.assertEqual(chunks, ["partial"])
+        fallback.assert_not_called()
+
+    def test_streamed_response_is_cached(self):
+        with patch('llm_brain._stream_gemini', _stream("Hel", "lo")):
+            list(llm_brain.generate_text_stream("Say hello", tier=self.tier))
+        with patch('llm_brain._stream_gemini', _stream("different")):
+            self.assertEqual(list(llm_brain.generate_text_stream("Say hello", tier=self.tier)), ["Hello"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_brain
+from core.tier_classifier import TierClassifier, examples_from_traffic, load_labeled_examples, split_examples
+from core.traffic_logger import TrafficLogger
+
+EXAMPLES = [
+    ("the deploy pipeline fails on the migration step", "coding"),
+    ("stack trace from the webhook handler", "coding"),
+    ("write a unit test for the parser", "coding"),
+    ("how was your weekend", "persona"),
+    ("tell me something funny", "persona"),
+    ("good morning, how are you", "persona"),
+    ("when is my dentist appointment", "brain"),
+    ("add lunch with Sam to my calendar", "brain"),
+]
+
+class TestTierClassifier(unittest.TestCase):
+    def setUp(self):
+        texts, labels = zip(*EXAMPLES)
+        self.model = TierClassifier(dim=2 ** 12).fit(texts, labels)
+
+    def test_predicts_seen_vocabulary(self):
+        self.assertEqual(self.model.predict("the webhook test fails")[0], "coding")
+        self.assertEqual(self.model.predict("lunch appointment on my calendar")[0], "brain")
+        label, confidence = self.model.predict("how are you this morning")
+        self.assertEqual(label, "persona")
+        self.assertGreater(confidence, 0.5)
+
+    def test_no_words(self):
+        self.assertEqual(self.model.predict("?!"), (None, 0.0))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            self.model.save(path)
+            loaded = TierClassifier.load(path)
+        self.assertEqual(loaded.labels, self.model.labels)
+        self.assertEqual(loaded.predict("stack trace in the parser"), self.model.predict("stack trace in the parser"))
+
+    def test_evaluate(self):
+        texts, labels = zip(*EXAMPLES)
+        report = self.model.evaluate(texts, labels)
+        self.assertEqual(report["examples"], len(EXAMPLES))
+        self.assertEqual(report["coverage"], 1.0)
+        self.assertEqual(report["labels"]["coding"]["support"], 3)
+
+        abstaining = self.model.evaluate(texts, labels, threshold=1.01)
+        self.assertEqual(abstaining["coverage"], 0.0)
+        self.assertIsNone(abstaining["accuracy"])
+
+    def test_split_is_deterministic(self):
+        self.assertEqual(split_examples(EXAMPLES, 0.25), split_examples(EXAMPLES, 0.25))
+        train, test = split_examples(EXAMPLES, 0.25)
+        self.assertEqual((len(train), len(test)), (6, 2))
+
+class TestTrainingData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logger = TrafficLogger(os.path.join(self.tmp.name, "traffic.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_labels_come_from_escalations(self):
+        # Routed once and answered: the router's own choice, not a label
+        self.logger.log_traffic("hey", "hi", "openrouter", "openrouter/free", 1.0, tier="utility")
+        self.logger.log_traffic("old row", "ok", "gemini", "lite", 1.0, context_profile="persona+whatsapp")
+        self.logger.log_traffic("no tier", "ok", "openrouter", "grok-code", 1.0)
+        # Failed at persona, re-sent and answered at coding
+        self.logger.log_traffic("fix it", "", "gemini", "lite", 1.0, status="error: 503", tier="persona")
+        self.logger.log_traffic("fix it", "ok", "openrouter", "grok-code", 1.0, tier="coding")
+        # Answered at persona, then escalated to apex by the caller
+        self.logger.log_traffic("plan it", "meh", "gemini", "lite", 1.0, context_profile="persona+cli")
+        self.logger.log_traffic("plan it", "ok", "gemini", "pro", 1.0, tier="apex")
+        # Escalated but never answered
+        self.logger.log_traffic("never worked", "", "gemini", "lite", 1.0, status="error: 503", tier="persona")
+        self.logger.log_traffic("never worked", "", "gemini", "pro", 1.0, status="error: 503", tier="apex")
+        self.logger.log_traffic("cached", "ok", "cache", "flash", 0.0, tier="apex")
+
+        rows = self.logger.get_prompt_outcomes()
+        self.assertEqual(sorted(examples_from_traffic(rows)), [("fix it", "coding"), ("plan it", "apex")])
+
+    def test_hand_labels(self):
+        path = os.path.join(self.tmp.name, "labels.jsonl")
+        with open(path, "w") as f:
+            f.write(json.dumps({"prompt": "draft a reply", "tier": "persona"}) + "\n\n")
+        self.assertEqual(load_labeled_examples(path), [("draft a reply", "persona")])
+
+        with open(path, "a") as f:
+            f.write('{"prompt": "missing tier"}\n')
+        with self.assertRaises(ValueError):
+            load_labeled_examples(path)
+
+class TestClassifyTierWithModel(unittest.TestCase):
+    def setUp(self):
+        texts, labels = zip(*EXAMPLES)
+        patcher = patch.object(llm_brain, "tier_classifier", TierClassifier(dim=2 ** 12).fit(texts, labels))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_confident_prediction_wins(self):
+        # No keyword matches, so the rules alone would say PERSONA
+        with patch.object(llm_brain, "TIER_CLASSIFIER_THRESHOLD", 0.5):
+            self.assertEqual(llm_brain.classify_tier("stack trace from the webhook handler"),
+                             llm_brain.CapabilityTier.CODING)
+
+    def test_unsure_prediction_uses_rules(self):
+        with patch.object(llm_brain, "TIER_CLASSIFIER_THRESHOLD", 1.01):
+            self.assertEqual(llm_brain.classify_tier("stack trace from the webhook handler"),
+                             llm_brain.CapabilityTier.PERSONA)
+
+    def test_automated_requests_skip_model(self):
+        with patch.object(llm_brain, "TIER_CLASSIFIER_THRESHOLD", 0.0):
+            self.assertEqual(llm_brain.classify_tier("how was your weekend", {"is_automated": True}),
+                             llm_brain.CapabilityTier.UTILITY)
+
+if __name__ == '__main__':
+    unittest.main()
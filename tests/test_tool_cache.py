@@ -0,0 +1,142 @@
+import datetime
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.tool_cache import ToolResultCache
+from core.tool_registry import BaseTool, CalendarTool, ToolRegistry, WhatsAppReadTool, WhatsAppSendTool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingTool(BaseTool):
+    name = "lookup"
+    description = "Counts its calls"
+    cache_ttl = 60.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, query: str, limit: int = 5, **kwargs):
+        self.calls += 1
+        if query == "broken":
+            return "Error: lookup failed"
+        return f"{query} #{self.calls}"
+
+
+class WritingTool(BaseTool):
+    name = "write"
+    description = "Changes what lookup returns for a query"
+
+    def invalidates(self, query: str = "", **kwargs):
+        return [("lookup", {"query": query})]
+
+    def execute(self, query: str, **kwargs):
+        return "written"
+
+
+class TestToolResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ToolResultCache(clock=self.clock)
+
+    def test_ttl_and_per_tool_stats(self):
+        self.assertIs(self.cache.get("a", {"x": 1}), ToolResultCache.MISS)
+        self.cache.put("a", {"x": 1}, "one", ttl=10)
+        self.assertEqual(self.cache.get("a", {"x": 1}), "one")
+        self.clock.now += 11
+        self.assertIs(self.cache.get("a", {"x": 1}), ToolResultCache.MISS)
+
+        stats = self.cache.get_stats()["tools"]["a"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["expired"]), (1, 2, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.333)
+
+    def test_invalidate_matching_args(self):
+        self.cache.put("read", {"to": "1", "limit": 5}, "chat 1", ttl=60)
+        self.cache.put("read", {"to": "1", "limit": 10}, "chat 1 long", ttl=60)
+        self.cache.put("read", {"to": "2", "limit": 5}, "chat 2", ttl=60)
+        self.assertEqual(self.cache.invalidate("read", {"to": "1"}), 2)
+        self.assertEqual(self.cache.get("read", {"to": "2", "limit": 5}), "chat 2")
+        self.assertEqual(self.cache.get_stats()["tools"]["read"]["invalidated"], 2)
+
+    def test_result_from_before_invalidation_is_not_stored(self):
+        generation = self.cache.generation("read")
+        self.cache.invalidate("read", {"to": "1"})
+        self.cache.put("read", {"to": "1"}, "stale", ttl=60, generation=generation)
+        self.assertIs(self.cache.get("read", {"to": "1"}), ToolResultCache.MISS)
+
+
+class TestRegistryCache(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry(cache=ToolResultCache())
+        self.tool = CountingTool()
+        self.registry.register_tool(self.tool)
+
+    def test_defaults_are_part_of_the_key(self):
+        self.assertEqual(self.registry.execute_tool("lookup", query="q"), "q #1")
+        self.assertEqual(self.registry.execute_tool("lookup", query="q", limit=5), "q #1")
+        self.assertEqual(self.registry.execute_tool("lookup", query="q", limit=6), "q #2")
+        stats = self.registry.cache.get_stats()["tools"]["lookup"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_errors_are_not_cached(self):
+        self.registry.execute_tool("lookup", query="broken")
+        self.registry.execute_tool("lookup", query="broken")
+        self.assertEqual(self.tool.calls, 2)
+
+    def test_uncached_registry_always_runs(self):
+        registry = ToolRegistry()
+        registry.register_tool(self.tool)
+        registry.execute_tool("lookup", query="q")
+        registry.execute_tool("lookup", query="q")
+        self.assertEqual(self.tool.calls, 2)
+
+    def test_write_invalidates_matching_reads(self):
+        self.registry.register_tool(WritingTool())
+        first = self.registry.execute_tool("lookup", query="q")
+        other = self.registry.execute_tool("lookup", query="other")
+        self.registry.execute_tool("write", query="q")
+        self.assertNotEqual(self.registry.execute_tool("lookup", query="q"), first)
+        self.assertEqual(self.registry.execute_tool("lookup", query="other"), other)
+
+    def test_send_whatsapp_invalidates_that_chat(self):
+        self.registry.register_tool(WhatsAppReadTool())
+        self.registry.register_tool(WhatsAppSendTool())
+        history = MagicMock(side_effect=lambda to, limit: f"history of {to} ({history.call_count})")
+        with patch("skills.wacli.wacli.get_history", history), \
+             patch("skills.wacli.wacli.send_message", MagicMock(return_value="sent")):
+            first = self.registry.execute_tool("read_whatsapp", to="+1 555-0100")
+            # Same chat written differently, default limit spelled out
+            self.assertEqual(self.registry.execute_tool("read_whatsapp", to="15550100@c.us", limit="5"), first)
+            other = self.registry.execute_tool("read_whatsapp", to="15550199")
+
+            self.registry.execute_tool("send_whatsapp", to="15550100", message="on my way")
+            # Back to the bridge for that chat only
+            self.assertNotEqual(self.registry.execute_tool("read_whatsapp", to="15550100"), first)
+            self.assertEqual(self.registry.execute_tool("read_whatsapp", to="15550199"), other)
+        self.assertEqual(history.call_count, 3)
+
+    def test_calendar_entries_do_not_outlive_the_day(self):
+        tool = CalendarTool.__new__(CalendarTool)
+        today = datetime.date(2026, 3, 1)
+        with patch("core.tool_registry.datetime.date", wraps=datetime.date) as date:
+            date.today.return_value = today
+            before = tool.cache_args(day="today"), tool.cache_args()
+            date.today.return_value = today + datetime.timedelta(days=1)
+            after = tool.cache_args(day="today"), tool.cache_args()
+        self.assertEqual(before[0]["day"], "2026-03-01")
+        self.assertEqual(after[0]["day"], "2026-03-02")
+        self.assertNotEqual(before[1], after[1])
+        self.assertLessEqual(CalendarTool.cache_ttl, 60)
+
+if __name__ == '__main__':
+    unittest.main()
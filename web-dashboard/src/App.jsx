@@ -72,6 +72,10 @@ const Dashboard = () => {
           <div className="stat-value">${stats.cost_distribution.reduce((acc, curr) => acc + (curr.total_cost || 0), 0).toFixed(4)}</div>
           <div className="stat-label">Total Estimated Cost</div>
         </div>
+        <div className="glass-panel stat-card">
+          <div className="stat-value">${(stats.cache_savings?.cost_saved || 0).toFixed(4)}</div>
+          <div className="stat-label">Saved by Cache ({(stats.cache_savings?.hits || 0).toLocaleString()} hits)</div>
+        </div>
       </div>
 
       {/* Charts Row 1 */}